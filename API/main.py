@@ -1,11 +1,83 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from src.db import SupabaseDB
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, model_validator
+from src.db import AsyncSupabaseDB
+from src import analytics, profit
+from src.bulk import FORMATS
+from src.idempotency import DEFAULT_STORE_SIZE, DEFAULT_STORE_TTL, IdempotencyStore, KeyReused
+from src.metrics import REGISTRY, MetricsMiddleware
+from src.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from src.search import DEFAULT_LIMIT as DEFAULT_SEARCH_LIMIT
 from fastapi.middleware.cors import CORSMiddleware
+import os
+import tempfile
 import uuid
 
-app = FastAPI(title="Flash Inventory System API")
-db = SupabaseDB()
+@asynccontextmanager
+async def lifespan(app):
+    # One pooled, non-blocking database client shared by every request
+    app.state.db = await AsyncSupabaseDB.connect()
+    # Responses of write requests sent with an Idempotency-Key, replayed to retries
+    app.state.idempotency = IdempotencyStore(
+        int(os.getenv("IDEMPOTENCY_STORE_SIZE", DEFAULT_STORE_SIZE)),
+        float(os.getenv("IDEMPOTENCY_TTL", DEFAULT_STORE_TTL)),
+    )
+    unregister = [REGISTRY.collector(app.state.db.gauges), REGISTRY.collector(idempotency_gauges)]
+    try:
+        yield
+    finally:
+        for remove in unregister:
+            remove()
+        await app.state.db.close()
+
+app = FastAPI(title="Flash Inventory System API", lifespan=lifespan)
+
+def idempotency_gauges():
+    stats = app.state.idempotency.stats()
+    return [
+        (f"idempotency_{key}", f"Idempotency-Key store {key.replace('_', ' ')}", {}, stats[key])
+        for key in ("size", "hits", "misses", "evictions")
+    ]
+
+def get_db(request: Request) -> AsyncSupabaseDB:
+    return request.app.state.db
+
+def versioned(*tables):
+    """
+    Conditional GET for a read of ``tables``: the ETag is built from the
+    tables' write counters (read before the data, so it can only be older
+    than what is sent), and a matching If-None-Match gets an empty 304.
+    """
+    async def check(request: Request, response: Response, db: AsyncSupabaseDB = Depends(get_db)):
+        versions = await db.table_versions()
+        if versions is None:
+            return None
+        etag = 'W/"' + "-".join(str(versions[table]) for table in tables) + '"'
+        sent = request.headers.get("if-none-match", "")
+        if sent.strip() == "*" or etag in (tag.strip() for tag in sent.split(",")):
+            raise HTTPException(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"  # may be stored, but revalidate every time
+        return etag
+
+    return Depends(check)
+
+async def idempotent(request: Request, response: Response, key: Optional[str], body: BaseModel, call):
+    """
+    Run a write once per Idempotency-Key: a retry with the same key and body
+    gets the first response back (marked Idempotent-Replayed) without
+    touching the database; the same key with a different body is a 422.
+    """
+    scope = f"{request.method} {request.url.path}"
+    try:
+        result, replayed = await request.app.state.idempotency.run(scope, key, body.model_dump_json(), call)
+    except KeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -14,7 +86,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Idempotent-Replayed", "Server-Timing"],
 )
+# Route latency, payload sizes and database round trips per request (GET /metrics)
+app.add_middleware(MetricsMiddleware)
 
 # ---------------- Pydantic Models ----------------
 
@@ -23,34 +98,275 @@ class ProductCreate(BaseModel):
     sku: str
     price: float
     stock_quantity: int
+    cost_price: Optional[float] = Field(None, ge=0)
+
+class StockChange(BaseModel):
+    # Exactly one of delta (received +N / written off -N) and stock_quantity (a count)
+    delta: Optional[int] = None
+    stock_quantity: Optional[int] = Field(None, ge=0)
+    # Compare-and-set: only write if the product's updated_at is still this value
+    expected_updated_at: Optional[str] = None
+
+    @model_validator(mode="after")
+    def one_change(self):
+        if (self.delta is None) == (self.stock_quantity is None):
+            raise ValueError("send exactly one of delta and stock_quantity")
+        return self
 
 class SaleCreate(BaseModel):
     product_id: uuid.UUID
-    quantity: int
+    quantity: int = Field(..., gt=0)
     sale_price: float
 
+# Uploads larger than this are spooled to a temporary file instead of memory
+IMPORT_SPOOL_BYTES = 8 * 1024 * 1024
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# POS terminals sync hundreds of sales at a time; cap a single request
+MAX_SALE_BATCH = 5000
+
+class SaleBatch(BaseModel):
+    sales: List[SaleCreate] = Field(..., min_length=1, max_length=MAX_SALE_BATCH)
+
+class OrderLine(BaseModel):
+    product_id: uuid.UUID
+    quantity: int = Field(..., gt=0)
+    # The listed price when omitted
+    sale_price: Optional[float] = None
+
+# An order is one customer's basket; all its products are locked together
+MAX_ORDER_LINES = 500
+
+class OrderCreate(BaseModel):
+    lines: List[OrderLine] = Field(..., min_length=1, max_length=MAX_ORDER_LINES)
+
+class FlashSaleStart(BaseModel):
+    product_id: uuid.UUID
+    # Units taken out of the product's stock for the sale; all of it when omitted
+    units: Optional[int] = Field(None, gt=0)
+
 # ---------------- Routes ----------------
 
 @app.get("/")
-def root():
+async def root():
     return {"message": "Flash Inventory API is running"}
 
 @app.post("/products/")
-def add_product(product: ProductCreate):
-    return db.create_product(product.name, product.sku, product.price, product.stock_quantity)
+async def add_product(
+    product: ProductCreate,
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSupabaseDB = Depends(get_db),
+):
+    return await idempotent(request, response, idempotency_key, product, lambda: db.create_product(
+        product.name, product.sku, product.price, product.stock_quantity, product.cost_price
+    ))
+
+@app.get("/products/", dependencies=[versioned("products")])
+async def list_products(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    db: AsyncSupabaseDB = Depends(get_db),
+):
+    return await db.get_products(limit, cursor)
+
+@app.post("/products/import")
+async def import_products(
+    request: Request,
+    fmt: str = Query("csv", alias="format"),
+    db: AsyncSupabaseDB = Depends(get_db),
+):
+    if fmt not in FORMATS:
+        return {"success": False, "error": f"format must be one of: {', '.join(FORMATS)}"}
+    # Body is streamed to a spooled file, then parsed and upserted chunk by chunk
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        return await db.import_products(spool, fmt)
+
+@app.get("/products/export")
+async def export_products(
+    fmt: str = Query("csv", alias="format"),
+    etag: str = versioned("products"),
+    db: AsyncSupabaseDB = Depends(get_db),
+):
+    if fmt not in FORMATS:
+        return {"success": False, "error": f"format must be one of: {', '.join(FORMATS)}"}
+    headers = {"Content-Disposition": f'attachment; filename="products.{fmt}"'}
+    if etag:
+        # A returned Response does not pick up headers set by dependencies
+        headers.update({"ETag": etag, "Cache-Control": "no-cache"})
+    return StreamingResponse(db.export_products(fmt), media_type=EXPORT_MEDIA_TYPES[fmt], headers=headers)
 
-@app.get("/products/")
-def list_products():
-    return db.get_products()
+@app.get("/products/low-stock", dependencies=[versioned("products")])
+async def low_stock_products(db: AsyncSupabaseDB = Depends(get_db)):
+    # Products below min_stock_level, lowest first; read through a partial index
+    return await db.get_low_stock_products()
+
+@app.get("/products/search")
+async def search_products(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=100),
+    db: AsyncSupabaseDB = Depends(get_db),
+):
+    # Ranked name/SKU/category matches from the in-process index (prefix and typo tolerant)
+    return db.search_products(q, limit)
+
+@app.get("/products/sku/{sku}")
+async def get_product_by_sku(sku: str, db: AsyncSupabaseDB = Depends(get_db)):
+    # Barcode lookups at the till; served from the catalog cache when warm
+    return await db.get_product_by_sku(sku)
+
+@app.get("/products/{product_id}")
+async def get_product(product_id: uuid.UUID, db: AsyncSupabaseDB = Depends(get_db)):
+    return await db.get_product(product_id)
+
+@app.get("/products/{product_id}/forecast", dependencies=[versioned("products", "sales")])
+async def product_forecast(product_id: uuid.UUID, db: AsyncSupabaseDB = Depends(get_db)):
+    # Daily demand forecast, safety stock and reorder point from the forecasting job
+    return await db.get_product_forecast(product_id)
 
 @app.put("/products/{product_id}/stock")
-def update_stock(product_id: uuid.UUID, new_stock: int):
-    return db.update_product_stock(product_id, new_stock)
+async def update_stock(product_id: uuid.UUID, new_stock: int, db: AsyncSupabaseDB = Depends(get_db)):
+    return await db.update_product_stock(product_id, new_stock)
+
+@app.patch("/products/{product_id}/stock")
+async def change_stock(product_id: uuid.UUID, change: StockChange, db: AsyncSupabaseDB = Depends(get_db)):
+    # One conditional write; a failed precondition or a delta below zero is a 409 carrying the current row
+    result = await db.adjust_product_stock(product_id, change.delta, change.stock_quantity, change.expected_updated_at)
+    if result.get("conflict"):
+        return JSONResponse(status_code=409, content=result)
+    return result
 
 @app.post("/sales/")
-def record_sale(sale: SaleCreate):
-    return db.create_sale(str(sale.product_id), sale.quantity, sale.sale_price)
+async def record_sale(
+    sale: SaleCreate,
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSupabaseDB = Depends(get_db),
+):
+    result = await idempotent(request, response, idempotency_key, sale, lambda: db.create_sale(
+        str(sale.product_id), sale.quantity, sale.sale_price
+    ))
+    if result.get("invalid"):
+        return JSONResponse(status_code=400, content=result)
+    return result
+
+@app.post("/sales/batch")
+async def record_sales_batch(
+    batch: SaleBatch,
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSupabaseDB = Depends(get_db),
+):
+    lines = [
+        {"product_id": str(sale.product_id), "quantity": sale.quantity, "sale_price": sale.sale_price}
+        for sale in batch.sales
+    ]
+    return await idempotent(request, response, idempotency_key, batch, lambda: db.create_sales_batch(lines))
+
+@app.post("/orders/")
+async def create_order(
+    order: OrderCreate,
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSupabaseDB = Depends(get_db),
+):
+    # Every line is recorded or none is, in one transaction; per-line results either way
+    lines = [
+        {"product_id": str(line.product_id), "quantity": line.quantity, "sale_price": line.sale_price}
+        for line in order.lines
+    ]
+    return await idempotent(request, response, idempotency_key, order, lambda: db.create_order(lines))
+
+@app.get("/orders/{order_id}")
+async def get_order(order_id: uuid.UUID, db: AsyncSupabaseDB = Depends(get_db)):
+    # The order with its sales
+    return await db.get_order(order_id)
+
+@app.get("/sales/journal")
+async def sales_journal(db: AsyncSupabaseDB = Depends(get_db)):
+    # Write-behind backlog: sales acknowledged but not yet in the database
+    return db.sales_journal_stats()
+
+@app.post("/flash-sales/")
+async def start_flash_sale(flash_sale: FlashSaleStart, db: AsyncSupabaseDB = Depends(get_db)):
+    # Moves the units into an in-memory counter; POST /sales/ for the product is then admitted from it
+    result = await db.start_flash_sale(flash_sale.product_id, flash_sale.units)
+    if result.get("conflict"):
+        return JSONResponse(status_code=409, content=result)
+    return result
+
+@app.get("/flash-sales/")
+async def flash_sales(db: AsyncSupabaseDB = Depends(get_db)):
+    return db.flash_sale_stats()
+
+@app.delete("/flash-sales/{product_id}")
+async def end_flash_sale(product_id: uuid.UUID, db: AsyncSupabaseDB = Depends(get_db)):
+    # Unsold units go back to the product's stock
+    return await db.end_flash_sale(product_id)
+
+@app.get("/sales/", dependencies=[versioned("sales")])
+async def list_sales(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    db: AsyncSupabaseDB = Depends(get_db),
+):
+    return await db.get_sales(limit, cursor)
+
+@app.get("/sales/report", dependencies=[versioned("sales")])
+async def sales_report(
+    days: int = Query(30, ge=1, le=3660),
+    top: int = Query(0, ge=0, le=100),
+    db: AsyncSupabaseDB = Depends(get_db),
+):
+    # Answered from the daily rollup tables: one row per day, not per sale
+    return await db.get_sales_report(days, top)
+
+@app.get("/dashboard/summary", dependencies=[versioned("products", "sales")])
+async def dashboard_summary(db: AsyncSupabaseDB = Depends(get_db)):
+    # Product, low-stock and 7-day sales counters from one snapshot; cached until the next write
+    return await db.get_dashboard_summary()
+
+@app.get("/analytics/revenue", dependencies=[versioned("sales")])
+async def revenue_series(
+    bucket: str = Query("day", pattern="^(hour|day|week|month)$"),
+    days: int = Query(30, ge=1, le=3660),
+    db: AsyncSupabaseDB = Depends(get_db),
+):
+    # Revenue, units and sale count per bucket, zero-filled; a few hundred points at most
+    return await db.get_revenue_series(days, bucket)
+
+@app.get("/analytics/top-products", dependencies=[versioned("sales")])
+async def top_products(
+    days: int = Query(30, ge=1, le=3660),
+    n: int = Query(analytics.DEFAULT_TOP_N, ge=1, le=100),
+    by: str = Query("revenue", pattern="^(revenue|units)$"),
+    db: AsyncSupabaseDB = Depends(get_db),
+):
+    return await db.get_top_products(days, n, by)
+
+@app.get("/analytics/profit", dependencies=[versioned("products", "sales")])
+async def profit_report(
+    group: str = Query("product", pattern="^(product|category|hour|day|week|month)$"),
+    days: int = Query(30, ge=1, le=3660),
+    n: int = Query(profit.DEFAULT_LIMIT, ge=1, le=500),
+    by: str = Query("gross_profit", pattern="^(gross_profit|margin|roi|revenue)$"),
+    db: AsyncSupabaseDB = Depends(get_db),
+):
+    # Gross profit, margin and ROI per product, category or time bucket, from the cost-aware rollups
+    return await db.get_profit_report(days, group, n, by)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
-@app.get("/sales/")
-def list_sales():
-    return db.get_sales()
+@app.get("/cache/stats")
+async def cache_stats(db: AsyncSupabaseDB = Depends(get_db)):
+    return db.cache_stats()
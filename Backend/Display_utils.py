@@ -2,17 +2,14 @@ class DisplayUtils:
     """Handles all display formatting"""
     
     @staticmethod
-    def display_products(products, title="PRODUCT INVENTORY"):
-        """Display products in formatted table"""
-        if not products:
-            print(f"\n📭 No products found")
-            return
-        
+    def _print_products_header(title):
         print(f"\n📦 {title}")
         print("=" * 80)
         print(f"{'Status':<4} {'Name':<20} {'Price':<10} {'Stock':<8} {'Category':<12} SKU")
         print("=" * 80)
-        
+    
+    @staticmethod
+    def _print_product_rows(products):
         for product in products:
             stock = product.get('stock_quantity', 0)
             min_stock = product.get('min_stock_level', 5)
@@ -27,14 +24,57 @@ class DisplayUtils:
             
             name = product.get('name', 'Unknown')[:19]
             price = product.get('price', 0)
-            category = product.get('category', 'General')[:11]
+            category = (product.get('category') or 'General')[:11]
             sku = product.get('sku', 'N/A')
             
             print(f"{status:<4} {name:<20} ${price:<9.2f} {stock:<8} {category:<12} {sku}")
+    
+    @staticmethod
+    def display_products(products, title="PRODUCT INVENTORY"):
+        """Display products in formatted table"""
+        if not products:
+            print(f"\n📭 No products found")
+            return
         
+        DisplayUtils._print_products_header(title)
+        DisplayUtils._print_product_rows(products)
         print("=" * 80)
         print(f"Total products: {len(products)}")
     
+    @staticmethod
+    def display_product_pages(pages, title="PRODUCT INVENTORY"):
+        """Display products page by page from an iterator of (products, error)"""
+        shown = 0
+        pages = iter(pages)
+        current = next(pages, None)
+        while current:
+            products, error = current
+            if error:
+                print(f"❌ {error}")
+                return
+            if not products:
+                break
+            if shown == 0:
+                DisplayUtils._print_products_header(title)
+            DisplayUtils._print_product_rows(products)
+            shown += len(products)
+            
+            # Fetch the next page before asking, so it is ready when the user is
+            current = next(pages, None)
+            if current and current[0]:
+                try:
+                    more = input(f"-- {shown} shown. Enter for more, 'q' to stop: ").strip().lower()
+                except KeyboardInterrupt:
+                    more = "q"
+                if more == "q":
+                    break
+        
+        if shown == 0:
+            print(f"\n📭 No products found")
+            return
+        print("=" * 80)
+        print(f"Products shown: {shown}")
+    
     @staticmethod
     def display_sales(sales, title="SALES HISTORY"):
         """Display sales in formatted table"""
@@ -69,7 +109,7 @@ class DisplayUtils:
         print(f"Total transactions: {len(sales)}")
     
     @staticmethod
-    def display_sales_report(report):
+    def display_sales_report(report, top_products=None, categories=None):
         """Display sales report"""
         print("\n📊 SALES REPORT")
         print("=" * 50)
@@ -78,6 +118,19 @@ class DisplayUtils:
         print(f"Items Sold: {report['total_items_sold']} units")
         print(f"Total Revenue: ${report['total_revenue']:.2f}")
         print(f"Average Sale: ${report['average_sale_value']:.2f}")
+        if report.get('gross_margin') is not None:
+            print(f"Gross Profit: ${report['gross_profit']:.2f} ({report['gross_margin']:.1%} margin)")
+        if top_products:
+            print("-" * 50)
+            print("Top Products:")
+            for entry in top_products:
+                print(f"  {entry['name'][:28]:<28} {entry['units']:>6} units  ${entry['revenue']:>10.2f}")
+        if categories:
+            print("-" * 50)
+            print("Most Profitable Categories:")
+            for entry in categories:
+                margin = f"{entry['margin']:.1%}" if entry['margin'] is not None else "n/a"
+                print(f"  {entry['category'][:24]:<24} ${entry['gross_profit']:>10.2f}  {margin:>7} margin")
         print("=" * 50)
     
     @staticmethod
@@ -101,9 +154,10 @@ class DisplayUtils:
         print("💰 SALES MANAGEMENT")
         print("="*40)
         print("1. 💳 Record Sale")
-        print("2. 📊 Sales Report")
-        print("3. 📈 Recent Sales")
-        print("4. ↩️  Back to Main Menu")
+        print("2. 🧾 Record Order (several products)")
+        print("3. 📊 Sales Report")
+        print("4. 📈 Recent Sales")
+        print("5. ↩️  Back to Main Menu")
         print("="*40)
     
     @staticmethod
@@ -128,6 +182,14 @@ class DisplayUtils:
             except ValueError:
                 return None, "Please enter a valid price"
             
+            try:
+                cost = input("Cost price (press Enter to skip): $").strip()
+                cost_price = float(cost) if cost else None
+                if cost_price is not None and cost_price < 0:
+                    return None, "Cost price cannot be negative"
+            except ValueError:
+                return None, "Please enter a valid cost price"
+            
             try:
                 initial_stock = int(input("Initial stock quantity: ").strip())
                 if initial_stock < 0:
@@ -135,6 +197,14 @@ class DisplayUtils:
             except ValueError:
                 return None, "Please enter a valid stock quantity"
             
+            try:
+                min_level = input("Minimum stock level (press Enter for 5): ").strip()
+                min_stock_level = int(min_level) if min_level else 5
+                if min_stock_level < 0:
+                    return None, "Minimum stock level cannot be negative"
+            except ValueError:
+                return None, "Please enter a valid minimum stock level"
+            
             category = input("Category (press Enter for 'General'): ").strip()
             category = category if category else "General"
             
@@ -144,7 +214,9 @@ class DisplayUtils:
                 'name': name,
                 'sku': sku,
                 'price': price,
+                'cost_price': cost_price,
                 'initial_stock': initial_stock,
+                'min_stock_level': min_stock_level,
                 'category': category,
                 'description': description
             }, None
@@ -187,6 +259,48 @@ class DisplayUtils:
         except KeyboardInterrupt:
             return None, "Input cancelled"
     
+    @staticmethod
+    def get_order_input():
+        """Get order lines from user until an empty SKU"""
+        try:
+            print("\n🧾 RECORD AN ORDER")
+            print("-" * 30)
+            print("Enter one product per line; press Enter on an empty SKU to finish.")
+            
+            lines = []
+            while True:
+                product_sku = input(f"Line {len(lines) + 1} - Product SKU: ").strip()
+                if not product_sku:
+                    break
+                
+                try:
+                    quantity = int(input("  Quantity: ").strip())
+                    if quantity <= 0:
+                        return None, "Quantity must be greater than 0"
+                except ValueError:
+                    return None, "Please enter a valid quantity"
+                
+                try:
+                    custom_price = input("  Sale price (press Enter for listed price): ").strip()
+                    sale_price = float(custom_price) if custom_price else None
+                    if sale_price and sale_price <= 0:
+                        return None, "Sale price must be greater than 0"
+                except ValueError:
+                    return None, "Please enter a valid price"
+                
+                lines.append({
+                    'product_sku': product_sku,
+                    'quantity': quantity,
+                    'sale_price': sale_price
+                })
+            
+            if not lines:
+                return None, "An order needs at least one line"
+            return lines, None
+            
+        except KeyboardInterrupt:
+            return None, "Input cancelled"
+    
     @staticmethod
     def press_enter_to_continue():
         """Wait for user to press Enter"""
@@ -1,15 +1,49 @@
+import threading
+
+from database import Database
 from product_manager import ProductManager
 from sales_manager import SalesManager
 from Display_utils import DisplayUtils
+from src import reports
+from src.low_stock import LowStockMonitor
+from src.storage import engine_source
 
 class InventorySystem:
     """Main system controller"""
     
     def __init__(self):
-        self.product_manager = ProductManager()
-        self.sales_manager = SalesManager()
+        # One engine for both managers, so sales keep the product search index current
+        db = Database()
+        self.product_manager = ProductManager(db)
+        self.sales_manager = SalesManager(db)
         self.display_utils = DisplayUtils()
         self.running = True
+        
+        # The dashboard is redrawn on every menu loop; reuse it until something changes
+        self.db = db
+        self.summary_cache = reports.SummaryCache()
+        self.saved_summary = reports.SavedSummary.from_env(engine_source())
+        self.low_stock_monitor = None
+        
+        # Connect while the first menu is on screen; it is drawn from the last saved summary
+        self.connected = threading.Event()
+        threading.Thread(target=self.connect, name="connect", daemon=True).start()
+    
+    def connect(self):
+        """Create the engine, start low-stock tracking and load a fresh dashboard summary"""
+        try:
+            # Warn as soon as a sale or stock update takes a product below its minimum
+            low_stock, _ = self.product_manager.get_low_stock_products()
+            monitor = LowStockMonitor(lookup=self.db.engine.get_product).seed(low_stock or [])
+            monitor.on_low_stock(self.low_stock_alert)
+            self.db.engine.subscribe(monitor)
+            self.low_stock_monitor = monitor
+            self.db.engine.subscribe(self.summary_cache)
+            self.dashboard_summary()
+        except Exception:
+            pass  # the dashboard reports the error on its next draw
+        finally:
+            self.connected.set()
     
     def run(self):
         """Main application loop"""
@@ -22,26 +56,47 @@ class InventorySystem:
             self.display_utils.display_main_menu()
             self.handle_main_menu()
     
+    def dashboard_summary(self):
+        """Dashboard counters from one snapshot, cached until a write or the TTL"""
+        summary = self.summary_cache.get()
+        if summary is None:
+            generation = self.summary_cache.generation
+            since, _ = reports.report_window(reports.DASHBOARD_DAYS)
+            counts, error = self.db.get_dashboard_summary(since)
+            if error:
+                return None, error
+            summary = reports.dashboard_summary(counts, since=since)
+            self.summary_cache.put(summary, generation)
+            self.saved_summary.save(summary)
+        return summary, None
+    
     def show_dashboard(self):
         """Show dashboard summary"""
-        try:
-            products, _ = self.product_manager.get_all_products()
-            low_stock, _ = self.product_manager.get_low_stock_products()
-            sales_report, _ = self.sales_manager.get_sales_report(7)
-            
+        if not self.connected.is_set():
+            summary, saved_at = self.saved_summary.load()
+            if summary is None:
+                print("\n⏳ Connecting to the database...")
+                return
+            print(f"\n📊 DASHBOARD SUMMARY (as of {saved_at}, refreshing...)")
+        else:
+            summary, error = self.dashboard_summary()
+            if error:
+                print(f"❌ Error loading dashboard: {error}")
+                return
             print(f"\n📊 DASHBOARD SUMMARY")
-            print(f"   Total Products: {len(products) if products else 0}")
-            print(f"   Low Stock Items: {len(low_stock) if low_stock else 0}")
-            print(f"   Recent Sales (7 days): {sales_report.get('total_sales', 0)}")
-            print(f"   Recent Revenue: ${sales_report.get('total_revenue', 0):.2f}")
-            print("=" * 50)
-            
-        except Exception as e:
-            print(f"❌ Error loading dashboard: {e}")
+        
+        print(f"   Total Products: {summary['total_products']}")
+        print(f"   Low Stock Items: {summary['low_stock_count']}")
+        print(f"   Recent Sales ({summary['period_days']} days): {summary['recent_sales']}")
+        print(f"   Recent Revenue: ${summary['recent_revenue']:.2f}")
+        print("=" * 50)
     
     def handle_main_menu(self):
         """Handle main menu selection"""
         choice = input("\nChoose an option (1-6): ").strip()
+        if choice != '6':
+            # Writes must reach the low-stock monitor, which is subscribed once connected
+            self.connected.wait()
         
         if choice == '1':
             self.add_product_flow()
@@ -76,11 +131,8 @@ class InventorySystem:
     
     def view_all_products_flow(self):
         """Display all products"""
-        products, error = self.product_manager.get_all_products()
-        if error:
-            print(f"❌ {error}")
-        else:
-            self.display_utils.display_products(products, "ALL PRODUCTS")
+        pages = self.product_manager.iter_product_pages()
+        self.display_utils.display_product_pages(pages, "ALL PRODUCTS")
         self.display_utils.press_enter_to_continue()
     
     def view_low_stock_flow(self):
@@ -117,18 +169,20 @@ class InventorySystem:
         """Sales management menu"""
         while True:
             self.display_utils.display_sales_menu()
-            choice = input("\nChoose sales option (1-4): ").strip()
+            choice = input("\nChoose sales option (1-5): ").strip()
             
             if choice == '1':
                 self.record_sale_flow()
             elif choice == '2':
-                self.view_sales_report_flow()
+                self.record_order_flow()
             elif choice == '3':
-                self.view_recent_sales_flow()
+                self.view_sales_report_flow()
             elif choice == '4':
+                self.view_recent_sales_flow()
+            elif choice == '5':
                 break
             else:
-                print("❌ Invalid choice. Please enter 1-4.")
+                print("❌ Invalid choice. Please enter 1-5.")
                 self.display_utils.press_enter_to_continue()
     
     def record_sale_flow(self):
@@ -143,30 +197,52 @@ class InventorySystem:
             if error or not product:
                 print("❌ Product not found! Please check the SKU.")
             else:
-                # Check stock
-                if product['stock_quantity'] < sale_data['quantity']:
-                    print(f"❌ Not enough stock! Available: {product['stock_quantity']}")
+                # Stock check, sale insert and stock decrement happen atomically
+                result, error = self.sales_manager.record_sale(
+                    product['id'], 
+                    sale_data['quantity'], 
+                    sale_data['sale_price']
+                )
+                
+                if error:
+                    print(f"❌ {error}")
                 else:
-                    # Record sale
-                    sale, error = self.sales_manager.record_sale(
-                        product['id'], 
-                        sale_data['quantity'], 
-                        sale_data['sale_price']
-                    )
-                    
-                    if error:
-                        print(f"❌ {error}")
-                    else:
-                        # Update stock
-                        new_stock = product['stock_quantity'] - sale_data['quantity']
-                        _, error = self.product_manager.update_stock(product['id'], new_stock)
-                        
-                        if error:
-                            print(f"✅ Sale recorded but stock update failed: {error}")
-                        else:
-                            total = sale_data['quantity'] * (sale_data['sale_price'] or product['price'])
-                            print(f"✅ Sale recorded! Total: ${total:.2f}")
-                            print(f"📦 New stock level: {new_stock}")
+                    total = sale_data['quantity'] * result['sale']['sale_price']
+                    print(f"✅ Sale recorded! Total: ${total:.2f}")
+                    print(f"📦 New stock level: {result['stock_quantity']}")
+        
+        self.display_utils.press_enter_to_continue()
+    
+    def record_order_flow(self):
+        """Record several products sold together, all or nothing"""
+        order_lines, error = self.display_utils.get_order_input()
+        
+        if error:
+            print(f"❌ {error}")
+            self.display_utils.press_enter_to_continue()
+            return
+        
+        lines = []
+        for line in order_lines:
+            product, error = self.product_manager.get_product_by_sku(line['product_sku'])
+            if error or not product:
+                print(f"❌ Product {line['product_sku']} not found! Nothing was recorded.")
+                self.display_utils.press_enter_to_continue()
+                return
+            lines.append({**line, 'product_id': product['id']})
+        
+        # Stock of every line is checked and decremented in one transaction
+        result, error = self.sales_manager.record_order(lines)
+        if error:
+            print(f"❌ {error}")
+        if result:
+            for line, outcome in zip(lines, result['lines']):
+                if outcome['success']:
+                    print(f"  ✅ {line['product_sku']} x{line['quantity']} - stock left: {outcome['stock_quantity']}")
+                else:
+                    print(f"  ❌ {line['product_sku']} x{line['quantity']} - {outcome['error']}")
+            if result['order']:
+                print(f"✅ Order recorded! {result['order']['units']} units, total: ${float(result['order']['total']):.2f}")
         
         self.display_utils.press_enter_to_continue()
     
@@ -178,7 +254,9 @@ class InventorySystem:
             if error:
                 print(f"❌ {error}")
             else:
-                self.display_utils.display_sales_report(report)
+                top_products, _ = self.sales_manager.get_top_products(days)
+                categories, _ = self.sales_manager.get_profit_report(days, "category")
+                self.display_utils.display_sales_report(report, top_products, categories and categories["rows"])
         except ValueError:
             print("❌ Please enter a valid number of days.")
         
@@ -198,6 +276,12 @@ class InventorySystem:
         
         self.display_utils.press_enter_to_continue()
     
+    def low_stock_alert(self, product_id, stock_quantity, min_stock_level):
+        """Called once when a product drops below its minimum stock level"""
+        product, _ = self.product_manager.db.get_product_by_id(product_id)
+        name = product['name'] if product else product_id
+        print(f"⚠️  LOW STOCK: {name} is down to {stock_quantity} (minimum {min_stock_level})")
+    
     def exit_flow(self):
         """Handle application exit"""
         print("\n👋 Thank you for using FlashInventory!")
@@ -1,99 +1,151 @@
 import os
-from supabase import create_client
+import sys
 from dotenv import load_dotenv
 
+# The CLI runs from the Backend directory; make the shared src package importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.db import SupabaseDB
+from src.pagination import DEFAULT_PAGE_SIZE
+
 load_dotenv()
 
+def _unpack(result):
+    """(data, error) from a data-layer result; a missing product is (None, None)"""
+    if result["success"]:
+        return result["data"], None
+    if result.get("not_found"):
+        return None, None
+    return None, result["error"]
+
 class Database:
     """
-    Handles all database operations - the connection layer to Supabase
+    The CLI's handle on the shared data layer (SupabaseDB in src/db.py, also used
+    by FlashInventory), with results unpacked into (data, error) tuples. By default
+    every Database in the process uses the same engine (STORAGE_ENGINE: Supabase
+    or the embedded SQLite engine), created on first use, so the managers share one client.
     """
     
-    def __init__(self):
-        self.supabase = create_client(
-            os.getenv('SUPABASE_URL'),
-            os.getenv('SUPABASE_KEY')
-        )
-        print("🔌 Database connection initialized!")
+    def __init__(self, engine=None):
+        # Nothing connects until the first call that needs the database
+        self.repository = SupabaseDB(engine)
+    
+    @property
+    def engine(self):
+        return self.repository.engine
     
     def test_connection(self):
         """Test database connection"""
-        try:
-            response = self.supabase.table('products').select('*').limit(1).execute()
+        result = self.repository.test_connection()
+        if result["success"]:
             return True, "✅ Database connection successful!"
-        except Exception as e:
-            return False, f"❌ Database connection failed: {e}"
+        return False, f"❌ Database connection failed: {result['error']}"
     
     # PRODUCTS TABLE OPERATIONS
     def insert_product(self, product_data):
         """Insert a new product"""
-        try:
-            response = self.supabase.table('products').insert(product_data).execute()
-            return response.data, None
-        except Exception as e:
-            return None, f"Error inserting product: {e}"
+        return _unpack(self.repository.insert_product(product_data))
     
     def get_all_products(self):
         """Get all products"""
-        try:
-            response = self.supabase.table('products').select('*').order('name').execute()
-            return response.data, None
-        except Exception as e:
-            return None, f"Error fetching products: {e}"
+        return _unpack(self.repository.get_all_products())
+    
+    def get_low_stock_products(self):
+        """Get products below their minimum stock level, lowest stock first"""
+        return _unpack(self.repository.get_low_stock_products())
+    
+    def get_products_page(self, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """Get one page of products ordered by name; returns ((products, next_cursor), error)"""
+        result = self.repository.get_products(limit, cursor)
+        if not result["success"]:
+            return None, result["error"]
+        return (result["data"], result["next_cursor"]), None
     
     def get_product_by_id(self, product_id):
         """Get product by ID"""
-        try:
-            response = self.supabase.table('products').select('*').eq('id', product_id).execute()
-            return response.data[0] if response.data else None, None
-        except Exception as e:
-            return None, f"Error fetching product: {e}"
+        return _unpack(self.repository.get_product(product_id))
     
     def get_product_by_sku(self, sku):
         """Get product by SKU"""
-        try:
-            response = self.supabase.table('products').select('*').eq('sku', sku).execute()
-            return response.data[0] if response.data else None, None
-        except Exception as e:
-            return None, f"Error fetching product by SKU: {e}"
+        return _unpack(self.repository.get_product_by_sku(sku))
+    
+    def get_products_by_ids(self, product_ids):
+        """Get many products by id in batched queries"""
+        return _unpack(self.repository.get_products_by_ids(product_ids))
     
     def update_product_stock(self, product_id, new_stock):
         """Update product stock quantity"""
-        try:
-            response = self.supabase.table('products').update({'stock_quantity': new_stock}).eq('id', product_id).execute()
-            return response.data, None
-        except Exception as e:
-            return None, f"Error updating stock: {e}"
+        return _unpack(self.repository.update_product_stock(product_id, new_stock))
+    
+    def adjust_product_stock(self, product_id, delta=None, new_stock=None, expected_updated_at=None):
+        """Add a delta to stock (or set it) in one conditional write, optionally only if updated_at is unchanged"""
+        result = self.repository.adjust_product_stock(product_id, delta, new_stock, expected_updated_at)
+        if not result["success"]:
+            return None, result["error"]
+        return result["data"], None
     
     # SALES TABLE OPERATIONS
     def insert_sale(self, sale_data):
         """Record a new sale"""
-        try:
-            response = self.supabase.table('sales').insert(sale_data).execute()
-            return response.data, None
-        except Exception as e:
-            return None, f"Error recording sale: {e}"
+        return _unpack(self.repository.insert_sale(sale_data))
+    
+    def record_sale(self, product_id, quantity_sold, sale_price=None):
+        """Atomically decrement stock and record the sale in one round trip"""
+        result = self.repository.create_sale(product_id, quantity_sold, sale_price)
+        if not result["success"]:
+            return None, result["error"]
+        return {"sale": result["data"][0], "stock_quantity": result["stock_quantity"]}, None
+    
+    def record_order(self, lines):
+        """
+        Record an order's lines all or nothing in one transaction; returns
+        ({"order", "lines"}, error), with the per-line results also when the
+        order was refused
+        """
+        result = self.repository.create_order(lines)
+        if "lines" not in result:
+            return None, result["error"]
+        order = {"order": result.get("data"), "lines": result["lines"]}
+        return order, None if result["success"] else result["error"]
     
     def get_all_sales(self):
         """Get all sales with product information"""
-        try:
-            response = self.supabase.table('sales').select('*, products(name, sku)').order('sale_date', desc=True).execute()
-            return response.data, None
-        except Exception as e:
-            return None, f"Error fetching sales: {e}"
+        return _unpack(self.repository.get_all_sales())
+    
+    def get_sales_page(self, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """Get one page of sales, newest first; returns ((sales, next_cursor), error)"""
+        result = self.repository.get_sales(limit, cursor)
+        if not result["success"]:
+            return None, result["error"]
+        return (result["data"], result["next_cursor"]), None
     
     def get_sales_by_product(self, product_id):
         """Get sales for a specific product"""
-        try:
-            response = self.supabase.table('sales').select('*').eq('product_id', product_id).execute()
-            return response.data, None
-        except Exception as e:
-            return None, f"Error fetching product sales: {e}"
+        return _unpack(self.repository.get_sales_by_product(product_id))
     
     def get_recent_sales(self, limit=10):
         """Get recent sales"""
-        try:
-            response = self.supabase.table('sales').select('*, products(name, sku)').order('sale_date', desc=True).limit(limit).execute()
-            return response.data, None
-        except Exception as e:
-            return None, f"Error fetching recent sales: {e}"
\ No newline at end of file
+        return _unpack(self.repository.get_recent_sales(limit))
+    
+    # DASHBOARD
+    def get_dashboard_summary(self, since):
+        """Product count, low-stock count and sales totals since a date, from one snapshot"""
+        return _unpack(self.repository.get_dashboard_counts(since))
+    
+    # SALES ROLLUPS
+    def get_daily_sales(self, since=None, until=None):
+        """Per-day sale count, units and revenue from the rollup table"""
+        return _unpack(self.repository.get_daily_sales(since, until))
+    
+    def get_daily_product_sales(self, since=None, until=None, product_id=None):
+        """Per-day, per-product sale count, units and revenue from the rollup table"""
+        return _unpack(self.repository.get_daily_product_sales(since, until, product_id))
+    
+    # FORECASTS
+    def get_forecast(self, product_id):
+        """Stored demand forecast and reorder point for a product"""
+        return _unpack(self.repository.get_stored_forecast(product_id))
+    
+    def rebuild_sales_rollups(self):
+        """Recompute the rollups from the full sales history"""
+        return _unpack(self.repository.rebuild_sales_rollups())
@@ -1,15 +1,108 @@
 #!/usr/bin/env python3
 """
 FlashInventory - Complete Inventory Management System
+
+Run without arguments for the interactive menu, or use a bulk command:
+    python main.py import-products catalog.csv
+    python main.py export-products catalog.ndjson
+    python main.py compact-sales [--dir sales_snapshot] [--rebuild]
+    python main.py forecast [--history-days 84] [--lead-time 7] [--workers N] [--no-update-min-stock | --dry-run]
 """
 
+import argparse
+
 from Inventory_system import InventorySystem
+from product_manager import ProductManager
+from sales_manager import SalesManager
+
+def run_compact_sales(args):
+    """Bring the columnar sales snapshot up to date"""
+    stats, error = SalesManager().compact_sales(args.dir, args.rebuild)
+    if error:
+        print(f"❌ {error}")
+        return
+    print(f"✅ {stats['added']} sales appended to {stats['directory']} "
+          f"({stats['rows']} sales, {stats['products']} products, "
+          f"{stats['first_sale'] or '-'} to {stats['last_sale'] or '-'})")
+
+def run_forecast(args):
+    """Forecast demand per product and update reorder points"""
+    stats, error = ProductManager().run_forecast(
+        args.history_days, args.lead_time, args.workers, not args.no_update_min_stock, args.dry_run
+    )
+    if error:
+        print(f"❌ {error}")
+        return
+    if args.dry_run:
+        print(f"{'SKU':<20} {'Daily demand':>12} {'Safety stock':>12} {'Reorder point':>13} {'Min stock now':>13}")
+        for item in sorted(stats["forecasts"], key=lambda f: f["sku"] or ""):
+            print(f"{item['sku'] or item['product_id']:<20} {item['daily_demand']:>12} {item['safety_stock']:>12} "
+                  f"{item['reorder_point']:>13} {item['min_stock_level'] if item['min_stock_level'] is not None else '-':>13}")
+        changed = f"{stats['thresholds_changed']} minimum stock levels would change (dry run, nothing saved)"
+    elif args.no_update_min_stock:
+        changed = "minimum stock levels left unchanged"
+    else:
+        changed = f"{stats['thresholds_changed']} minimum stock levels updated"
+    print(f"✅ Forecast {stats['products']} products in {stats['seconds']}s, {changed}")
+
+def run_bulk_command(args):
+    """Run a non-interactive bulk command"""
+    if args.command == "compact-sales":
+        run_compact_sales(args)
+        return
+    if args.command == "forecast":
+        run_forecast(args)
+        return
+    product_manager = ProductManager()
+    if args.command == "import-products":
+        summary, error = product_manager.import_products(args.path, args.format)
+        if error:
+            print(f"❌ {error}")
+            return
+        print(f"✅ Processed {summary['processed']} records: "
+              f"{summary['inserted']} inserted, {summary['updated']} updated, "
+              f"{summary['error_count']} rejected")
+        for item in summary["errors"]:
+            print(f"   line {item['line']}: {item['error']}")
+    else:
+        path, error = product_manager.export_products(args.path, args.format)
+        if error:
+            print(f"❌ {error}")
+        else:
+            print(f"✅ Catalog exported to {path}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="FlashInventory management system")
+    commands = parser.add_subparsers(dest="command")
+    for name, help_text in (
+        ("import-products", "bulk upsert products from a CSV or NDJSON file"),
+        ("export-products", "export the catalog to a CSV or NDJSON file"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("path")
+        command.add_argument("--format", choices=["csv", "ndjson"],
+                             help="file format (default: from the file extension)")
+    compact = commands.add_parser("compact-sales", help="append new sales to the columnar analytics snapshot")
+    compact.add_argument("--dir", help="snapshot directory (default: SALES_SNAPSHOT_DIR or sales_snapshot)")
+    compact.add_argument("--rebuild", action="store_true", help="rebuild the snapshot from the full history")
+    forecast = commands.add_parser("forecast", help="forecast demand per product and set reorder points")
+    forecast.add_argument("--history-days", type=int, default=84, help="days of sales history to fit (default 84)")
+    forecast.add_argument("--lead-time", type=int, default=7, help="restocking lead time in days (default 7)")
+    forecast.add_argument("--workers", type=int, help="worker processes (default: FORECAST_WORKERS or CPU count)")
+    mode = forecast.add_mutually_exclusive_group()
+    mode.add_argument("--no-update-min-stock", action="store_true", help="store forecasts but keep min_stock_level as is")
+    mode.add_argument("--dry-run", action="store_true", help="print the forecasts without writing anything")
+    return parser.parse_args()
 
 def main():
     """Main application entry point"""
+    args = parse_args()
     try:
-        inventory_system = InventorySystem()
-        inventory_system.run()
+        if args.command:
+            run_bulk_command(args)
+        else:
+            inventory_system = InventorySystem()
+            inventory_system.run()
     except KeyboardInterrupt:
         print("\n\n⏹️  Application interrupted by user.")
     except Exception as e:
@@ -19,4 +112,4 @@ def main():
         print("👋 FlashInventory has been shut down.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
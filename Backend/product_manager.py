@@ -1,12 +1,17 @@
 from database import Database
+from src import bulk
+from src.low_stock import DEFAULT_MIN_STOCK_LEVEL
+from src.search import ProductSearchIndex
 
 class ProductManager:
     """Manages product-related operations"""
     
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, db=None):
+        self.db = db or Database()
+        self._search_index = None
     
-    def add_product(self, name, price, sku, initial_stock=0, category="General", description=""):
+    def add_product(self, name, price, sku, initial_stock=0, category="General", description="", cost_price=None,
+                    min_stock_level=DEFAULT_MIN_STOCK_LEVEL):
         """Add a new product to inventory"""
         # Validate input
         if not name or not sku:
@@ -18,12 +23,11 @@ class ProductManager:
         if initial_stock < 0:
             return None, "Stock quantity cannot be negative"
         
-        # Check if SKU already exists
-        existing_product, error = self.db.get_product_by_sku(sku)
-        if error:
-            return None, error
-        if existing_product:
-            return None, f"SKU '{sku}' already exists"
+        if cost_price is not None and cost_price < 0:
+            return None, "Cost price cannot be negative"
+        
+        if min_stock_level < 0:
+            return None, "Minimum stock level cannot be negative"
         
         # Prepare product data
         product_data = {
@@ -31,12 +35,14 @@ class ProductManager:
             "description": description,
             "sku": sku,
             "price": float(price),
+            "cost_price": float(cost_price) if cost_price is not None else None,
             "stock_quantity": int(initial_stock),
-            "min_stock_level": 5,
+            "min_stock_level": int(min_stock_level),
             "category": category
         }
         
-        # Insert into database
+        # Insert into database (the unique constraint on sku rejects duplicates,
+        # so no separate lookup round trip is needed)
         result, error = self.db.insert_product(product_data)
         if error:
             return None, error
@@ -47,34 +53,47 @@ class ProductManager:
         """Get all products"""
         return self.db.get_all_products()
     
+    def iter_product_pages(self, page_size=20):
+        """Yield (products, error) one page at a time, ordered by name"""
+        cursor = None
+        while True:
+            page, error = self.db.get_products_page(page_size, cursor)
+            if error:
+                yield [], error
+                return
+            products, cursor = page
+            yield products, None
+            if not cursor:
+                return
+    
     def get_product_by_sku(self, sku):
         """Get product by SKU"""
         return self.db.get_product_by_sku(sku)
     
-    def search_products(self, search_term):
-        """Search products by name or SKU"""
-        products, error = self.db.get_all_products()
-        if error:
-            return [], error
-        
+    def search_products(self, search_term, limit=20):
+        """Ranked search by name, SKU or category; tolerates prefixes and typos"""
         if not search_term:
-            return products, None
-        
-        matching_products = []
-        for product in products:
-            if (search_term.lower() in product['name'].lower() or 
-                search_term.lower() in product['sku'].lower()):
-                matching_products.append(product)
-        
-        return matching_products, None
+            return [], None
+        try:
+            version = self.db.engine.table_versions().get("products")
+            if self._search_index is None:
+                # Built on first use, then kept current by the engine's write events
+                index = ProductSearchIndex()
+                self.db.engine.subscribe(index)
+                index.load(self.db.engine.iter_products(), version)
+                self._search_index = index
+            elif self._search_index.stale(version):
+                # Written by another process (the API, an import) since the index was built
+                self._search_index.load(self.db.engine.iter_products(), version)
+            return self._search_index.search(search_term, limit), None
+        except Exception as e:
+            return [], f"Error searching products: {e}"
     
     def get_low_stock_products(self):
-        """Get products with low stock"""
-        products, error = self.db.get_all_products()
+        """Get products with low stock (indexed query, no catalog scan)"""
+        low_stock, error = self.db.get_low_stock_products()
         if error:
             return [], error
-        
-        low_stock = [p for p in products if p['stock_quantity'] < p['min_stock_level']]
         return low_stock, None
     
     def update_stock(self, product_id, new_stock):
@@ -82,4 +101,41 @@ class ProductManager:
         if new_stock < 0:
             return None, "Stock cannot be negative"
         
-        return self.db.update_product_stock(product_id, new_stock)
\ No newline at end of file
+        return self.db.update_product_stock(product_id, new_stock)
+    
+    def adjust_stock(self, product_id, delta, expected_updated_at=None):
+        """Receive (+N) or write off (-N) stock without overwriting concurrent sales"""
+        if delta == 0:
+            return None, "Stock change cannot be zero"
+        
+        return self.db.adjust_product_stock(product_id, delta, expected_updated_at=expected_updated_at)
+    
+    def import_products(self, path, fmt=None):
+        """Bulk upsert products from a CSV or NDJSON file, streaming it in chunks"""
+        fmt = fmt or bulk.format_from_path(path)
+        try:
+            with open(path, "rb") as f:
+                return bulk.import_products(self.db.engine, f, fmt), None
+        except Exception as e:
+            return None, f"Error importing products: {e}"
+    
+    def export_products(self, path, fmt=None):
+        """Stream the whole catalog to a CSV or NDJSON file"""
+        fmt = fmt or bulk.format_from_path(path)
+        try:
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                for chunk in bulk.export_products(self.db.engine, fmt):
+                    f.write(chunk)
+            return path, None
+        except Exception as e:
+            return None, f"Error exporting products: {e}"
+    
+    def run_forecast(self, history_days=None, lead_time=None, workers=None, apply=True, dry_run=False):
+        """Forecast demand for every selling product and move min_stock_level to the reorder point"""
+        from src import forecast
+        history_days = history_days or forecast.HISTORY_DAYS
+        lead_time = lead_time or forecast.DEFAULT_LEAD_TIME_DAYS
+        try:
+            return forecast.run(self.db.engine, history_days, lead_time, workers, apply, dry_run=dry_run), None
+        except Exception as e:
+            return None, f"Error running forecast: {e}"
@@ -1,31 +1,47 @@
 from database import Database
-from datetime import datetime, timedelta
+import os
+
+from src import reports
 
 class SalesManager:
     """Manages sales-related operations"""
     
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, db=None):
+        self.db = db or Database()
     
     def record_sale(self, product_id, quantity_sold, sale_price=None):
-        """Record a new sale"""
+        """Record a new sale and decrement stock in one atomic operation"""
         # Validate input
         if quantity_sold <= 0:
             return None, "Quantity must be greater than 0"
         
-        # Prepare sale data
-        sale_data = {
-            "product_id": product_id,
-            "quantity_sold": quantity_sold,
-            "sale_price": float(sale_price) if sale_price else None
-        }
-        
-        # Record sale
-        result, error = self.db.insert_sale(sale_data)
+        # Record sale (sale price defaults to the listed price)
+        result, error = self.db.record_sale(
+            product_id,
+            quantity_sold,
+            float(sale_price) if sale_price else None
+        )
         if error:
             return None, error
         
-        return result[0] if result else None, None
+        return result, None
+    
+    def record_order(self, lines):
+        """Record several sale lines as one order: all of them are sold, or none"""
+        if not lines:
+            return None, "An order needs at least one line"
+        for line in lines:
+            if line['quantity'] <= 0:
+                return None, "Quantity must be greater than 0"
+        
+        return self.db.record_order([
+            {
+                'product_id': line['product_id'],
+                'quantity': line['quantity'],
+                'sale_price': float(line['sale_price']) if line.get('sale_price') else None
+            }
+            for line in lines
+        ])
     
     def get_all_sales(self):
         """Get all sales"""
@@ -36,31 +52,74 @@ class SalesManager:
         return self.db.get_recent_sales(limit)
     
     def get_sales_report(self, days=30):
-        """Generate sales report for specified period"""
-        all_sales, error = self.db.get_all_sales()
+        """Generate sales report for the last ``days`` days (today included) from the daily rollups"""
+        try:
+            since, until = reports.report_window(days)
+        except ValueError as e:
+            return {}, str(e)
+        daily, error = self.db.get_daily_sales(since, until)
         if error:
             return {}, error
-        
-        # Calculate cutoff date
-        cutoff_date = datetime.now() - timedelta(days=days)
-        
-        # Filter recent sales
-        recent_sales = []
-        for sale in all_sales:
-            sale_date = datetime.fromisoformat(sale['sale_date'].replace('Z', '+00:00'))
-            if sale_date > cutoff_date:
-                recent_sales.append(sale)
-        
-        # Calculate metrics
-        total_revenue = sum(sale['sale_price'] * sale['quantity_sold'] for sale in recent_sales)
-        total_items_sold = sum(sale['quantity_sold'] for sale in recent_sales)
-        
-        report = {
-            "period_days": days,
-            "total_sales": len(recent_sales),
-            "total_revenue": total_revenue,
-            "total_items_sold": total_items_sold,
-            "average_sale_value": total_revenue / len(recent_sales) if recent_sales else 0
-        }
-        
-        return report, None
\ No newline at end of file
+        return reports.sales_report(days, daily, since), None
+    
+    def get_top_products(self, days=30, limit=5):
+        """Best-selling products by revenue over the last ``days`` days"""
+        try:
+            since, until = reports.report_window(days)
+        except ValueError as e:
+            return [], str(e)
+        rows, error = self.db.get_daily_product_sales(since, until)
+        if error:
+            return [], error
+        top = reports.product_totals(rows, limit)
+        for entry in top:
+            product, _ = self.db.get_product_by_id(entry["product_id"])
+            entry["name"] = product["name"] if product else "Unknown"
+        return top, None
+    
+    def get_profit_report(self, days=30, group="category", limit=5, by="gross_profit"):
+        """Gross profit, margin and ROI per product, category or time bucket from the rollups"""
+        # pandas is only loaded once a profit report is asked for
+        from src import analytics, profit
+        try:
+            rows_from = profit.source(group)
+            since, until, end = analytics.window(days, group if group in analytics.BUCKETS else "day")
+        except ValueError as e:
+            return None, str(e)
+        products = None
+        if rows_from == "sales":
+            try:
+                frame = analytics.sales_frame(self.db.engine.iter_sales(since, end))
+            except Exception as e:
+                return None, f"Error fetching sales: {e}"
+        else:
+            if rows_from == "daily":
+                rows, error = self.db.get_daily_sales(since, until)
+            else:
+                rows, error = self.db.get_daily_product_sales(since, until)
+            if error:
+                return None, error
+            frame = analytics.rollup_frame(rows)
+            if rows_from == "daily_product":
+                products, error = self.db.get_products_by_ids(profit.sold_products(frame))
+                if error:
+                    return None, error
+        try:
+            return profit.profit_report(frame, group, products, limit, by, since, end), None
+        except ValueError as e:
+            return None, str(e)
+    
+    def rebuild_rollups(self):
+        """Recompute the sales rollups from history"""
+        return self.db.rebuild_sales_rollups()
+    
+    def compact_sales(self, directory=None, rebuild=False):
+        """Append new sales to the columnar analytics snapshot (or rebuild it); returns its stats"""
+        from src.snapshot import DEFAULT_DIRECTORY, SalesSnapshot
+        directory = directory or os.getenv("SALES_SNAPSHOT_DIR") or DEFAULT_DIRECTORY
+        try:
+            snapshot = SalesSnapshot(directory)
+            added = snapshot.rebuild(self.db.engine) if rebuild else snapshot.append(self.db.engine)
+            return {"directory": directory, "added": added, **snapshot.stats()}, None
+        except Exception as e:
+            return None, f"Error compacting sales: {e}"
@@ -5,34 +5,99 @@ import plotly.express as px
 
 # ---------------- Configuration ----------------
 BACKEND_URL = "http://localhost:8000"
+PAGE_SIZE = 50
+ETAG_CACHE_SIZE = 256   # cached responses kept for revalidation
 
 st.set_page_config(page_title="📦 Flash Inventory System", layout="wide")
 
 # ---------------- Helper Functions ----------------
 
-def fetch_products():
+@st.cache_resource
+def http():
+    """One pooled HTTP session per server process, shared by every rerun"""
+    return requests.Session()
+
+@st.cache_resource
+def etag_cache():
+    """(path, params) -> (etag, body) for conditional GETs"""
+    return {}
+
+def get_json(path, params=None):
+    """GET an API endpoint, revalidating with If-None-Match; a 304 reuses the cached body"""
+    params = {key: value for key, value in (params or {}).items() if value is not None}
+    key = (path, tuple(sorted(params.items())))
+    cache = etag_cache()
+    cached = cache.get(key)
+    headers = {"If-None-Match": cached[0]} if cached else {}
+    res = http().get(f"{BACKEND_URL}{path}", params=params, headers=headers)
+    if res.status_code == 304 and cached:
+        return cached[1]
+    data = res.json()
+    etag = res.headers.get("ETag")
+    if etag:
+        cache.pop(key, None)
+        cache[key] = (etag, data)
+        while len(cache) > ETAG_CACHE_SIZE:
+            cache.pop(next(iter(cache)))
+    return data
+
+def fetch_products(cursor=None, limit=PAGE_SIZE):
+    """One page of products; returns (products, next_cursor)"""
     try:
-        res = requests.get(f"{BACKEND_URL}/products/")
-        data = res.json()
-        return data.get("data", [])
+        data = get_json("/products/", {"limit": limit, "cursor": cursor})
+        return data.get("data", []), data.get("next_cursor")
     except Exception as e:
         st.error(f"Failed to fetch products: {e}")
-        return []
+        return [], None
 
-def fetch_sales():
+def fetch_sales(cursor=None, limit=PAGE_SIZE):
+    """One page of sales, newest first; returns (sales, next_cursor)"""
     try:
-        res = requests.get(f"{BACKEND_URL}/sales/")
-        data = res.json()
+        data = get_json("/sales/", {"limit": limit, "cursor": cursor})
         if data.get("success"):
-            return data.get("data", [])
-        return []
+            return data.get("data", []), data.get("next_cursor")
+        return [], None
     except Exception as e:
         st.error(f"Failed to fetch sales: {e}")
-        return []
+        return [], None
+
+def paged(fetch, key):
+    """Render Previous/Next controls and return the current page of a list endpoint"""
+    cursors = st.session_state.setdefault(f"{key}_cursors", [None])
+    items, next_cursor = fetch(cursor=cursors[-1])
+    prev_col, info_col, next_col = st.columns([1, 2, 1])
+    if prev_col.button("⬅️ Previous", key=f"{key}_prev", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    info_col.caption(f"Page {len(cursors)}")
+    if next_col.button("Next ➡️", key=f"{key}_next", disabled=not next_cursor):
+        cursors.append(next_cursor)
+        st.rerun()
+    return items
+
+def fetch_dashboard_summary():
+    """Product, low-stock and 7-day sales counters in one cached call"""
+    try:
+        data = get_json("/dashboard/summary")
+        return data.get("data") if data.get("success") else None
+    except Exception as e:
+        st.error(f"Failed to fetch dashboard summary: {e}")
+        return None
+
+def fetch_analytics(path, params):
+    """Server-side aggregate (report, time series or ranking); None on failure"""
+    try:
+        data = get_json(path, params)
+        if data.get("success"):
+            return data.get("data")
+        st.error(f"❌ {data.get('error')}")
+    except Exception as e:
+        st.error(f"Failed to fetch {path}: {e}")
+    return None
 
 def record_sale(product_id, quantity, sale_price):
     try:
-        res = requests.post(f"{BACKEND_URL}/sales/", json={
+        res = http().post(f"{BACKEND_URL}/sales/", json={
             "product_id": str(product_id),
             "quantity": quantity,
             "sale_price": sale_price
@@ -51,10 +116,17 @@ st.title("📦 Flash Inventory System")
 # ---------------- Dashboard ----------------
 if page == "Dashboard":
     st.header("📊 Inventory Overview")
-    products = fetch_products()
+    summary = fetch_dashboard_summary()
+    if summary:
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Total Products", summary["total_products"])
+        col2.metric("Low Stock Items", summary["low_stock_count"])
+        col3.metric(f"Sales ({summary['period_days']} days)", summary["recent_sales"])
+        col4.metric("Revenue", f"${summary['recent_revenue']:.2f}")
+    products = paged(fetch_products, "dashboard_products")
     if products:
         df_products = pd.DataFrame(products)
-        st.metric("Total Products", len(df_products))
+        st.metric("Products on this page", len(df_products))
         st.dataframe(df_products[["name", "sku", "price", "stock_quantity"]])
     else:
         st.info("No products found.")
@@ -66,11 +138,13 @@ elif page == "Add Product":
         name = st.text_input("Product Name")
         sku = st.text_input("SKU")
         price = st.number_input("Price", min_value=0.0, format="%.2f")
+        cost_price = st.number_input("Cost Price (0 if unknown)", min_value=0.0, format="%.2f")
         stock = st.number_input("Stock Quantity", min_value=0)
         submitted = st.form_submit_button("Add Product")
         if submitted:
-            res = requests.post(f"{BACKEND_URL}/products/", json={
-                "name": name, "sku": sku, "price": price, "stock_quantity": stock
+            res = http().post(f"{BACKEND_URL}/products/", json={
+                "name": name, "sku": sku, "price": price, "stock_quantity": stock,
+                "cost_price": cost_price or None
             })
             data = res.json()
             if data.get("success"):
@@ -81,15 +155,24 @@ elif page == "Add Product":
 # ---------------- Update Product ----------------
 elif page == "Update Products":
     st.header("🔄 Update Product Stock")
-    products = fetch_products()
+    products = paged(fetch_products, "update_products")
     if products:
         product = st.selectbox("Select Product", products, format_func=lambda x: f"{x['name']} (Stock: {x['stock_quantity']})")
-        new_stock = st.number_input("New Stock Quantity", min_value=0)
+        mode = st.radio("Change", ["Receive / write off", "Set count"], horizontal=True)
+        if mode == "Set count":
+            change = {"stock_quantity": st.number_input("New Stock Quantity", min_value=0)}
+        else:
+            change = {"delta": st.number_input("Units to add (negative to remove)", value=0, step=1)}
         if st.button("Update Stock"):
-            res = requests.put(f"{BACKEND_URL}/products/{product['id']}/stock", params={"new_stock": new_stock})
+            # Only applied if nobody changed the product since this page read it
+            change["expected_updated_at"] = product.get("updated_at")
+            res = http().patch(f"{BACKEND_URL}/products/{product['id']}/stock", json=change)
             data = res.json()
             if data.get("success"):
-                st.success("✅ Stock updated successfully!")
+                st.success(f"✅ Stock updated to {data['data'][0]['stock_quantity']}!")
+            elif res.status_code == 409:
+                current = data["data"][0]["stock_quantity"]
+                st.error(f"❌ {data.get('error')} (stock is now {current}); reload and try again")
             else:
                 st.error(f"❌ {data.get('error')}")
     else:
@@ -98,7 +181,7 @@ elif page == "Update Products":
 # ---------------- Record Sale ----------------
 elif page == "Record Sale":
     st.header("🧾 Record Sale")
-    products = fetch_products()
+    products = paged(fetch_products, "sale_products")
     if products:
         product = st.selectbox("Select Product", products, format_func=lambda x: f"{x['name']} (Stock: {x['stock_quantity']})")
         quantity = st.number_input("Quantity", min_value=1)
@@ -117,41 +200,55 @@ elif page == "Record Sale":
 # ---------------- View Sales ----------------
 elif page == "View Sales":
     st.header("📄 Sales History")
-    sales = fetch_sales()
+    sales = paged(fetch_sales, "sales")
     if sales:
-        sales_list = []
-        for sale in sales:
-            product_name = sale.get('products', {}).get('name', 'Unknown')
-            quantity = sale.get('quantity', 0)
-            price = sale.get('sale_price', 0)
-            date = sale.get('sale_date', '')
-            sales_list.append({
-                "Product": product_name,
-                "Quantity": quantity,
-                "Price": price,
-                "Total": quantity * price,
-                "Date": pd.to_datetime(date)
-            })
-        df_sales = pd.DataFrame(sales_list)
-        st.dataframe(df_sales.sort_values("Date", ascending=False))
+        df_sales = pd.DataFrame(sales)
+        df_sales["Product"] = [(s.get("products") or {}).get("name", "Unknown") for s in sales]
+        df_sales["Date"] = pd.to_datetime(df_sales["sale_date"], format="ISO8601")
+        df_sales["Total"] = df_sales["quantity"] * df_sales["sale_price"]
+        st.dataframe(df_sales.rename(columns={"quantity": "Quantity", "sale_price": "Price"})[
+            ["Product", "Quantity", "Price", "Total", "Date"]
+        ])
+
+        # Aggregates are computed by the API; only the summarised points are downloaded
+        days = st.selectbox("Period", [7, 30, 90, 365], index=1, format_func=lambda d: f"Last {d} days")
 
         # Summary metrics
         st.subheader("Sales Summary")
-        total_revenue = df_sales["Total"].sum()
-        total_items = df_sales["Quantity"].sum()
-        st.metric("Total Revenue (₹)", f"{total_revenue:,.2f}")
-        st.metric("Total Items Sold", total_items)
+        report = fetch_analytics("/sales/report", {"days": days})
+        if report:
+            st.metric("Total Revenue (₹)", f"{report['total_revenue']:,.2f}")
+            st.metric("Total Items Sold", report["total_items_sold"])
+            if report.get("gross_margin") is not None:
+                st.metric("Gross Profit (₹)", f"{report['gross_profit']:,.2f}", f"{report['gross_margin']:.1%} margin")
 
         # Revenue over time
         st.subheader("Revenue Over Time")
-        df_time = df_sales.groupby("Date")[["Total"]].sum().reset_index()
-        fig_time = px.line(df_time, x="Date", y="Total", title="Revenue Over Time")
-        st.plotly_chart(fig_time, use_container_width=True)
+        buckets = ["hour", "day", "week", "month"] if days <= 31 else ["day", "week", "month"]
+        bucket = st.radio("Bucket", buckets, index=1 if days <= 31 else 0, horizontal=True)
+        series = fetch_analytics("/analytics/revenue", {"bucket": bucket, "days": days})
+        if series:
+            df_time = pd.DataFrame(series).rename(columns={"bucket": "Date", "revenue": "Total"})
+            fig_time = px.line(df_time, x="Date", y="Total", title="Revenue Over Time")
+            st.plotly_chart(fig_time, use_container_width=True)
 
         # Top-selling products
         st.subheader("Top Selling Products")
-        df_top = df_sales.groupby("Product")[["Total", "Quantity"]].sum().sort_values("Total", ascending=False).reset_index()
-        fig_top = px.bar(df_top, x="Product", y="Total", title="Top Selling Products", color="Total")
-        st.plotly_chart(fig_top, use_container_width=True)
+        by = st.radio("Rank by", ["revenue", "units"], horizontal=True)
+        top = fetch_analytics("/analytics/top-products", {"days": days, "n": 10, "by": by})
+        if top:
+            df_top = pd.DataFrame(top).rename(columns={"name": "Product", "revenue": "Total", "units": "Quantity"})
+            y = "Total" if by == "revenue" else "Quantity"
+            fig_top = px.bar(df_top, x="Product", y=y, title="Top Selling Products", color=y)
+            st.plotly_chart(fig_top, use_container_width=True)
+
+        # Profit by category (only sales of products with a cost price count)
+        st.subheader("Most Profitable Categories")
+        profit = fetch_analytics("/analytics/profit", {"group": "category", "days": days, "n": 10})
+        if profit and profit["rows"]:
+            df_profit = pd.DataFrame(profit["rows"]).rename(columns={"category": "Category", "gross_profit": "Gross Profit"})
+            fig_profit = px.bar(df_profit, x="Category", y="Gross Profit", hover_data=["margin", "roi"],
+                                title="Gross Profit by Category", color="Gross Profit")
+            st.plotly_chart(fig_profit, use_container_width=True)
     else:
         st.info("No sales recorded yet.")
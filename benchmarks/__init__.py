@@ -0,0 +1,7 @@
+"""
+Benchmarks for the API and the CLI managers on synthetic SQLite datasets.
+
+    python -m benchmarks.run --sizes 10k,100k,1m
+
+See benchmarks/run.py for the options and benchmarks/compare.py to diff two runs.
+"""
@@ -0,0 +1,118 @@
+"""
+Load test of API/main.py in-process over ASGI (httpx.ASGITransport).
+
+No sockets are involved, so the numbers cover the app, its in-process views
+and the storage engine (SQLite standing in for Supabase), not the network.
+Each scenario sends ``requests`` requests from ``concurrency`` concurrent
+clients after a short warm-up and reports latency percentiles and
+throughput. Conditional-GET headers are never sent, so every read does its
+full work. flash_sale records sales of one product while a flash sale holds
+its stock in memory (src/flash_sale.py); order records three-line orders.
+"""
+import asyncio
+import os
+import random
+import time
+
+import httpx
+
+from benchmarks.seed import SEARCH_TERMS
+from benchmarks.stats import summarize
+
+SCENARIOS = ("list_products", "sku_lookup", "record_sale", "flash_sale", "order", "search", "sales_report")
+ORDER_LINES = 3
+PAGES = 20  # product list cursors sampled for list_products
+
+
+def _request_maker(name, sample, cursors, rng):
+    """function(i) -> (method, url, kwargs) for one scenario"""
+    if name == "list_products":
+        return lambda i: ("GET", "/products/", {"params": {"limit": 50, **({"cursor": rng.choice(cursors)} if cursors else {})}})
+    if name == "sku_lookup":
+        return lambda i: ("GET", f"/products/sku/{rng.choice(sample['skus'])}", {})
+    if name == "record_sale":
+        return lambda i: ("POST", "/sales/", {"json": {
+            "product_id": rng.choice(sample["ids"]), "quantity": 1, "sale_price": round(rng.uniform(2, 400), 2),
+        }})
+    if name == "flash_sale":
+        return lambda i: ("POST", "/sales/", {"json": {"product_id": sample["ids"][0], "quantity": 1, "sale_price": 9.99}})
+    if name == "order":
+        return lambda i: ("POST", "/orders/", {"json": {"lines": [
+            {"product_id": product_id, "quantity": 1} for product_id in rng.sample(sample["ids"], ORDER_LINES)
+        ]}})
+    if name == "search":
+        return lambda i: ("GET", "/products/search", {"params": {"q": rng.choice(SEARCH_TERMS), "limit": 20}})
+    if name == "sales_report":
+        return lambda i: ("GET", "/sales/report", {"params": {"days": 30, "top": 10}})
+    raise ValueError(f"unknown scenario '{name}' (expected one of: {', '.join(SCENARIOS)})")
+
+
+def _failed(response):
+    if response.status_code >= 400:
+        return True
+    return response.headers.get("content-type", "").startswith("application/json") and response.json().get("success") is False
+
+
+async def _drive(client, make, requests, concurrency, warmup):
+    for i in range(warmup):
+        method, url, kwargs = make(i)
+        await client.request(method, url, **kwargs)
+
+    latencies = []
+    errors = 0
+    work = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in work:
+            method, url, kwargs = make(i)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            errors += _failed(response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def _cursors(client):
+    cursors, cursor = [], None
+    for _ in range(PAGES):
+        page = (await client.get("/products/", params={"limit": 50, **({"cursor": cursor} if cursor else {})})).json()
+        cursor = page.get("next_cursor")
+        if not cursor:
+            break
+        cursors.append(cursor)
+    return cursors
+
+
+async def run(db_path, sample, requests=1000, concurrency=16, scenarios=SCENARIOS, seed=0):
+    """{scenario: summary} for the API serving the SQLite database at ``db_path``"""
+    os.environ.update(STORAGE_ENGINE="sqlite", SQLITE_PATH=db_path)
+    for name in ("SALES_JOURNAL", "SALES_SNAPSHOT_DIR", "SERVER_TIMING"):
+        os.environ.pop(name, None)
+    from API.main import app
+
+    rng = random.Random(seed)
+    results = {}
+    async with app.router.lifespan_context(app):
+        db = app.state.db
+        started = time.perf_counter()
+        if db._index_task is not None:
+            await db._index_task  # search index and low-stock view loaded from the catalog
+        results["startup_views_s"] = round(time.perf_counter() - started, 3)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            cursors = await _cursors(client)
+            for name in scenarios:
+                make = _request_maker(name, sample, cursors, rng)
+                if name == "flash_sale":
+                    await client.post("/flash-sales/", json={"product_id": sample["ids"][0]})
+                try:
+                    results[name] = await _drive(client, make, requests, concurrency, warmup=min(50, requests // 10))
+                finally:
+                    if name == "flash_sale":
+                        await client.delete(f"/flash-sales/{sample['ids'][0]}")
+    return results
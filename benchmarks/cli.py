@@ -0,0 +1,50 @@
+"""
+Microbenchmarks of the CLI managers in Backend/ on the same datasets:
+ProductManager.search_products, SalesManager.get_sales_report and
+DisplayUtils.display_products (printing to /dev/null).
+"""
+import contextlib
+import os
+import sys
+import time
+
+from benchmarks.seed import SEARCH_TERMS
+from benchmarks.stats import repeat
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backend"))
+
+DISPLAY_ROWS = 10_000  # the table a "view all products" screen prints, capped
+
+
+def run(db_path, iterations=200):
+    """{benchmark: summary} for the CLI managers on the SQLite database at ``db_path``"""
+    from Display_utils import DisplayUtils
+    from database import Database
+    from product_manager import ProductManager
+    from sales_manager import SalesManager
+    from src.storage import create_engine
+
+    db = Database(create_engine("sqlite", path=db_path))
+    products = ProductManager(db)
+    sales = SalesManager(db)
+    results = {}
+    try:
+        started = time.perf_counter()
+        products.search_products(SEARCH_TERMS[0])  # the first search loads the index
+        results["search_index_build_s"] = round(time.perf_counter() - started, 3)
+        results["search_products"] = repeat(
+            lambda i: products.search_products(SEARCH_TERMS[i % len(SEARCH_TERMS)]), iterations)
+        results["get_sales_report"] = repeat(lambda i: sales.get_sales_report(30), iterations)
+
+        rows = []
+        for page, _ in products.iter_product_pages(page_size=1000):
+            rows.extend(page)
+            if len(rows) >= DISPLAY_ROWS:
+                break
+        rows = rows[:DISPLAY_ROWS]
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            results["display_products"] = repeat(lambda i: DisplayUtils.display_products(rows), max(iterations // 10, 5))
+        results["display_products"]["rows"] = len(rows)
+    finally:
+        db.engine.close()
+    return results
@@ -0,0 +1,68 @@
+"""
+Compare two benchmark result files.
+
+    python -m benchmarks.compare benchmarks/results/abc123.json benchmarks/results/def456.json [--threshold 10]
+
+Prints p50/p95/p99 and throughput side by side for every benchmark present in
+both, and exits with status 1 if any latency grew (or throughput fell) by more
+than ``threshold`` percent, so it can gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+LATENCIES = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def _benchmarks(results):
+    for size, entry in results["sizes"].items():
+        for suite in ("api", "cli", "sync_async"):
+            for name, summary in (entry.get(suite) or {}).items():
+                if isinstance(summary, dict):
+                    yield (size, suite, name), summary
+
+
+def _change(old, new):
+    if not old or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def compare(old, new, threshold):
+    """[(key, metric, old, new, change %, regressed)] for the benchmarks both runs have"""
+    before = dict(_benchmarks(old))
+    rows = []
+    for key, summary in _benchmarks(new):
+        if key not in before:
+            continue
+        for metric in (*LATENCIES, "throughput"):
+            change = _change(before[key].get(metric), summary.get(metric))
+            worse = change is not None and (change > threshold if metric in LATENCIES else change < -threshold)
+            rows.append((key, metric, before[key].get(metric), summary.get(metric), change, worse))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+    args = parser.parse_args()
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"{old['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    rows = compare(old, new, args.threshold)
+    for (size, suite, name), metric, before, after, change, worse in rows:
+        change_text = f"{change:+.1f}%" if change is not None else "n/a"
+        print(f"  {size:>5} {suite:<4} {name:<22} {metric:<11} {before!s:>10} -> {after!s:>10}  {change_text:>8}"
+              f"{'  REGRESSION' if worse else ''}")
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"{regressions} regression(s) beyond {args.threshold:g}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
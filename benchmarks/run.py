@@ -0,0 +1,110 @@
+"""
+Run the benchmark suite and save the results as JSON.
+
+    python -m benchmarks.run                                  # 10k rows, API and CLI
+    python -m benchmarks.run --sizes 10k,100k,1m --requests 2000 --concurrency 32
+    python -m benchmarks.run --only api --scenarios sku_lookup,record_sale --out before.json
+    python -m benchmarks.run --only startup --launches 20   # CLI time to first menu
+    python -m benchmarks.run --only sync_async --db-latency-ms 20   # async API against sync handlers
+
+Datasets are built on first use and cached in benchmarks/.data/ (1m takes a
+few minutes). Results go to benchmarks/results/<commit>.json unless --out is
+given; compare two runs with ``python -m benchmarks.compare old.json new.json``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from benchmarks import api, cli, seed, startup, sync_async
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _meta(args):
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+    }
+
+
+def _print_table(label, suite, results):
+    for name, summary in results.items():
+        if not isinstance(summary, dict):
+            print(f"  {label:>5} {suite:<7} {name:<22} {summary}")
+            continue
+        print(
+            f"  {label:>5} {suite:<7} {name:<22} p50 {summary['p50_ms']:>9} ms  p95 {summary['p95_ms']:>9} ms  "
+            f"p99 {summary['p99_ms']:>9} ms  {summary['throughput']:>9}/s  errors {summary['errors']}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API and the CLI managers on synthetic data")
+    parser.add_argument("--sizes", default="10k", help="comma-separated dataset sizes (products and sales), e.g. 10k,100k,1m")
+    parser.add_argument("--only", choices=("api", "cli", "startup", "sync_async"), help="run one suite only")
+    parser.add_argument("--scenarios", default=",".join(api.SCENARIOS), help="API scenarios to run")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per API scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent API clients")
+    parser.add_argument("--iterations", type=int, default=200, help="calls per CLI microbenchmark")
+    parser.add_argument("--launches", type=int, default=10, help="timed CLI starts for the startup benchmark")
+    parser.add_argument(
+        "--db-latency-ms", type=float, default=sync_async.DEFAULT_LATENCY * 1000,
+        help="simulated database round trip for the sync_async suite",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="results file (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    output = {"meta": _meta(args), "sizes": {}}
+    for size in map(seed.parse_size, args.sizes.split(",")):
+        label = seed.label(size)
+        started = time.perf_counter()
+        path = seed.dataset(size, args.seed)
+        entry = output["sizes"][label] = {"rows": size, "dataset_s": round(time.perf_counter() - started, 2)}
+        try:
+            if args.only in (None, "api"):
+                sample = seed.sample(path, seed=args.seed)
+                entry["api"] = asyncio.run(api.run(path, sample, args.requests, args.concurrency, scenarios, args.seed))
+                _print_table(label, "api", entry["api"])
+            if args.only in (None, "cli"):
+                entry["cli"] = cli.run(path, args.iterations)
+                _print_table(label, "cli", entry["cli"])
+            if args.only in (None, "startup"):
+                entry["startup"] = startup.run(path, args.launches)
+                _print_table(label, "startup", entry["startup"])
+            if args.only in (None, "sync_async"):
+                sample = seed.sample(path, seed=args.seed)
+                entry["sync_async"] = asyncio.run(sync_async.run(
+                    path, sample, args.requests, seed=args.seed, latency=args.db_latency_ms / 1000,
+                ))
+                _print_table(label, "sync_async", entry["sync_async"])
+        finally:
+            seed.discard(path)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{output['meta']['commit'] or 'results'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
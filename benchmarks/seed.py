@@ -0,0 +1,152 @@
+"""
+Synthetic datasets for the benchmarks: ``size`` products and ``size`` sales
+spread over the last HISTORY_DAYS days, in an SQLite file built once per
+size and seed under benchmarks/.data/ and copied for every run (the runs
+record sales, so each starts from the same state).
+
+Rows are written straight into the engine's tables in one transaction; the
+rollup triggers fill sales_daily and sales_daily_product as they would for
+real sales.
+"""
+import os
+import random
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from src.storage.sqlite_engine import PRODUCT_COLUMNS, SALE_COLUMNS, SQLiteEngine
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data")
+HISTORY_DAYS = 90
+STOCK = 1_000_000  # enough that no benchmark sale runs out
+CHUNK = 50_000
+
+INSERT_PRODUCTS = f"INSERT INTO products ({', '.join(PRODUCT_COLUMNS)}) VALUES ({', '.join('?' for _ in PRODUCT_COLUMNS)})"
+INSERT_SALES = f"INSERT INTO sales ({', '.join(SALE_COLUMNS)}) VALUES ({', '.join('?' for _ in SALE_COLUMNS)})"
+
+ADJECTIVES = [
+    "Classic", "Wireless", "Organic", "Compact", "Premium", "Smart", "Vintage", "Portable", "Ergonomic", "Deluxe",
+    "Eco", "Ultra", "Mini", "Heavy", "Silent", "Rapid", "Cozy", "Solar", "Rustic", "Modern",
+]
+NOUNS = [
+    "Keyboard", "Blender", "Backpack", "Lamp", "Headphones", "Kettle", "Notebook", "Charger", "Sneakers", "Mug",
+    "Monitor", "Jacket", "Speaker", "Bottle", "Drill", "Pillow", "Router", "Camera", "Toaster", "Wallet",
+]
+CATEGORIES = ["Electronics", "Kitchen", "Office", "Outdoor", "Apparel", "Home", "Tools", "Sports"]
+
+# Search terms: whole words, prefixes and one-letter typos
+SEARCH_TERMS = ["wireless", "keyb", "blendr", "lamp", "head", "organic mug", "charg", "SKU-0001", "smart spekr", "kitchen"]
+
+
+def parse_size(text):
+    """'10k' -> 10000, '1m' -> 1000000"""
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def label(size):
+    for unit, scale in (("m", 1_000_000), ("k", 1_000)):
+        if size >= scale and size % scale == 0:
+            return f"{size // scale}{unit}"
+    return str(size)
+
+
+def _products(size, rng, now):
+    for i in range(size):
+        price = round(rng.uniform(2, 400), 2)
+        yield (
+            str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}",
+            None,
+            f"SKU-{i:07d}",
+            price,
+            round(price * rng.uniform(0.4, 0.8), 2),
+            STOCK,
+            5,
+            rng.choice(CATEGORIES),
+            now,
+            now,
+        )
+
+
+def _sales(size, product_ids, rng):
+    start = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=HISTORY_DAYS)
+    span = HISTORY_DAYS * 86400
+    for _ in range(size):
+        sale_date = start + timedelta(seconds=rng.uniform(0, span))
+        price = round(rng.uniform(2, 400), 2)
+        yield (
+            str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            rng.choice(product_ids),
+            rng.randint(1, 5),
+            price,
+            round(price * 0.6, 2),
+            sale_date.isoformat(timespec="microseconds"),
+        )
+
+
+def build(path, size, seed=0):
+    """Write a dataset of ``size`` products and sales to a new SQLite file"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(tzinfo=None).isoformat(timespec="microseconds")
+    engine = SQLiteEngine(path)
+    try:
+        with engine.transaction() as conn:
+            product_ids = []
+            rows = []
+            for row in _products(size, rng, now):
+                product_ids.append(row[0])
+                rows.append(row)
+                if len(rows) == CHUNK:
+                    conn.executemany(INSERT_PRODUCTS, rows)
+                    rows = []
+            conn.executemany(INSERT_PRODUCTS, rows)
+            rows = []
+            for row in _sales(size, product_ids, rng):
+                rows.append(row)
+                if len(rows) == CHUNK:
+                    conn.executemany(INSERT_SALES, rows)
+                    rows = []
+            conn.executemany(INSERT_SALES, rows)
+        engine.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        engine.close()
+
+
+def dataset(size, seed=0):
+    """Path of a fresh copy of the cached dataset for ``size`` (built on first use)"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    cached = os.path.join(DATA_DIR, f"inventory-{label(size)}-{seed}.db")
+    if not os.path.exists(cached):
+        partial = cached + ".partial"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(partial + suffix):
+                os.remove(partial + suffix)
+        build(partial, size, seed)
+        os.replace(partial, cached)
+    fd, copy = tempfile.mkstemp(prefix=f"bench-{label(size)}-", suffix=".db")
+    os.close(fd)
+    shutil.copyfile(cached, copy)
+    return copy
+
+
+def discard(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def sample(path, n=1000, seed=0):
+    """{"ids", "skus"} of ``n`` products picked at random (the same ones for the same seed)"""
+    engine = SQLiteEngine(path)
+    try:
+        total = engine._query("SELECT max(rowid) AS n FROM products")[0]["n"] or 0
+        rowids = random.Random(seed).sample(range(1, total + 1), min(n, total))
+        marks = ", ".join("?" for _ in rowids)
+        rows = {row["rowid"]: row for row in engine._query(f"SELECT rowid, id, sku FROM products WHERE rowid IN ({marks})", rowids)}
+    finally:
+        engine.close()
+    picked = [rows[rowid] for rowid in rowids if rowid in rows]
+    return {"ids": [row["id"] for row in picked], "skus": [row["sku"] for row in picked]}
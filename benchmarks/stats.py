@@ -0,0 +1,39 @@
+"""Latency summaries shared by the API and CLI benchmarks"""
+import time
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed, errors=0):
+    """{"n", "errors", "p50_ms", "p95_ms", "p99_ms", "mean_ms", "max_ms", "throughput"} for latencies in seconds"""
+    ordered = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None
+    return {
+        "n": len(ordered),
+        "errors": errors,
+        "p50_ms": ms(percentile(ordered, 50)),
+        "p95_ms": ms(percentile(ordered, 95)),
+        "p99_ms": ms(percentile(ordered, 99)),
+        "mean_ms": ms(sum(ordered) / len(ordered)) if ordered else None,
+        "max_ms": ms(ordered[-1]) if ordered else None,
+        "throughput": round(len(ordered) / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def repeat(call, iterations, warmup=3):
+    """Time ``call(i)`` ``iterations`` times after a few untimed calls; returns summarize()"""
+    for i in range(warmup):
+        call(i)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t = time.perf_counter()
+        call(i)
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - started)
@@ -0,0 +1,131 @@
+"""
+Throughput of the async API against the synchronous one it replaced.
+
+The async side is API/main.py as shipped: async handlers on AsyncSupabaseDB.
+The sync side is the same routes written the way the API was before, plain
+``def`` handlers on the synchronous SupabaseDB, which FastAPI runs in its
+worker thread pool. Both serve the same SQLite file in-process over ASGI.
+
+SQLite answers in microseconds, which hides the difference, so every
+database call first waits ``latency`` seconds, standing in for the round trip
+to Supabase. The sync engine waits with time.sleep and holds a pool thread
+meanwhile; the async one waits with asyncio.sleep, as the async Supabase
+client does. The catalog cache is off on both sides, so every request reaches
+the database, and there are more clients than FastAPI's 40 worker threads,
+the limit the sync API runs into. Expect the two to be level when the round
+trip is around 20 ms or less: in-process, both are then bound by Python.
+"""
+import asyncio
+import inspect
+import os
+import random
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from benchmarks.api import _drive, _request_maker
+from src.db import SupabaseDB
+from src.storage import ObservedEngine
+from src.storage.sqlite_engine import SQLiteEngine
+
+SCENARIOS = ("sku_lookup", "record_sale")
+DEFAULT_LATENCY = 0.05   # seconds per database call
+CONCURRENCY = 256
+
+
+class _SyncLatency:
+    """Sync engine whose calls each wait ``delay`` seconds first"""
+
+    def __init__(self, engine, delay):
+        self.engine = engine
+        self.delay = delay
+        self.name = engine.name
+
+    def __getattr__(self, name):
+        method = getattr(self.engine, name)
+        if not callable(method) or inspect.isgeneratorfunction(method):
+            return method
+
+        def call(*args, **kwargs):
+            time.sleep(self.delay)
+            return method(*args, **kwargs)
+
+        return call
+
+
+class _AsyncLatency:
+    """Async engine whose coroutine calls each wait ``delay`` seconds first"""
+
+    def __init__(self, engine, delay):
+        self.engine = engine
+        self.delay = delay
+        self.name = engine.name
+
+    def __getattr__(self, name):
+        method = getattr(self.engine, name)
+        if not inspect.iscoroutinefunction(method):
+            return method
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(self.delay)
+            return await method(*args, **kwargs)
+
+        return call
+
+
+def sync_app(db):
+    """The routes the scenarios use, as synchronous handlers on the synchronous data layer"""
+    from API.main import SaleCreate
+
+    app = FastAPI()
+
+    @app.get("/products/sku/{sku}")
+    def get_product_by_sku(sku: str):
+        return db.get_product_by_sku(sku)
+
+    @app.post("/sales/")
+    def record_sale(sale: SaleCreate):
+        return db.create_sale(str(sale.product_id), sale.quantity, sale.sale_price)
+
+    return app
+
+
+async def _measure(app, make, requests, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        return await _drive(client, make, requests, concurrency, warmup=min(50, requests // 10))
+
+
+async def run(db_path, sample, requests=1000, concurrency=CONCURRENCY, scenarios=SCENARIOS, seed=0, latency=DEFAULT_LATENCY):
+    """{"<scenario>_sync"|"<scenario>_async": summary, "<scenario>_speedup": x} for both APIs on ``db_path``"""
+    os.environ.update(STORAGE_ENGINE="sqlite", SQLITE_PATH=db_path)
+    for name in ("SALES_JOURNAL", "SALES_SNAPSHOT_DIR", "SERVER_TIMING"):
+        os.environ.pop(name, None)
+    from API.main import app
+
+    rng = random.Random(seed)
+    results = {}
+
+    sync_engine = ObservedEngine(_SyncLatency(SQLiteEngine(db_path), latency))
+    try:
+        blocking = sync_app(SupabaseDB(sync_engine))
+        for name in scenarios:
+            results[f"{name}_sync"] = await _measure(blocking, _request_maker(name, sample, [], rng), requests, concurrency)
+    finally:
+        sync_engine.close()
+
+    os.environ["CATALOG_CACHE_SIZE"] = "0"
+    try:
+        async with app.router.lifespan_context(app):
+            instrumented = app.state.db.engine.engine
+            instrumented.engine = _AsyncLatency(instrumented.engine, latency)
+            for name in scenarios:
+                results[f"{name}_async"] = await _measure(app, _request_maker(name, sample, [], rng), requests, concurrency)
+    finally:
+        os.environ.pop("CATALOG_CACHE_SIZE", None)
+
+    for name in scenarios:
+        before, after = results[f"{name}_sync"]["throughput"], results[f"{name}_async"]["throughput"]
+        results[f"{name}_speedup"] = round(after / before, 2) if before else None
+    return results
@@ -0,0 +1,132 @@
+"""
+Vectorised sales analytics (pandas/NumPy) behind the /analytics endpoints.
+
+Every source is reduced to one frame shape - ts, product_id, sale_count,
+units, revenue, cost, costed_revenue - so the same group-bys serve all of
+them (src/profit.py builds on the cost columns):
+
+* the daily rollups for day/week/month buckets (sales_daily) and top-N
+  rankings (sales_daily_product), one row per day however many sales there were;
+* raw sales from engine.iter_sales(), only for hourly buckets.
+
+Callers get a few hundred points back instead of the sales table.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.reports import report_window
+
+BUCKETS = ("hour", "day", "week", "month")
+RANKINGS = ("revenue", "units")
+DEFAULT_TOP_N = 10
+MAX_HOURLY_DAYS = 31   # hourly series read raw sales, so keep their window bounded
+
+_MEASURES = ["sale_count", "units", "revenue"]
+BUCKET_FREQ = {"hour": "h", "day": "D", "week": "W-MON", "month": "MS"}
+
+
+def window(days, bucket="day"):
+    """(since, until, end): the last ``days`` days as inclusive ISO dates plus the exclusive end"""
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of: {', '.join(BUCKETS)}")
+    if bucket == "hour" and days > MAX_HOURLY_DAYS:
+        raise ValueError(f"hourly series cover at most {MAX_HOURLY_DAYS} days")
+    since, until = report_window(days)
+    return since, until, (date.fromisoformat(until) + timedelta(days=1)).isoformat()
+
+
+def empty_frame():
+    return pd.DataFrame({
+        "ts": pd.Series(dtype="datetime64[ns]"),
+        "product_id": pd.Series(dtype=object),
+        "sale_count": pd.Series(dtype=np.int64),
+        "units": pd.Series(dtype=np.int64),
+        "revenue": pd.Series(dtype=np.float64),
+        "cost": pd.Series(dtype=np.float64),
+        "costed_revenue": pd.Series(dtype=np.float64),
+    })
+
+
+def rollup_frame(rows):
+    """Frame from sales_daily or sales_daily_product rows"""
+    if not rows:
+        return empty_frame()
+    df = pd.DataFrame.from_records(
+        rows, columns=["day", "product_id", "sale_count", "units", "revenue", "cost", "costed_revenue"]
+    )
+    return pd.DataFrame({
+        "ts": pd.to_datetime(df["day"]),
+        "product_id": df["product_id"].astype(object),
+        "sale_count": df["sale_count"].to_numpy(np.int64),
+        "units": df["units"].to_numpy(np.int64),
+        "revenue": df["revenue"].to_numpy(np.float64),
+        "cost": df["cost"].fillna(0).to_numpy(np.float64),
+        "costed_revenue": df["costed_revenue"].fillna(0).to_numpy(np.float64),
+    })
+
+
+def sales_frame(pages):
+    """Frame from pages of raw sale rows (engine.iter_sales)"""
+    rows = [row for page in pages for row in page]
+    if not rows:
+        return empty_frame()
+    df = pd.DataFrame.from_records(rows, columns=["product_id", "quantity_sold", "sale_price", "cost_price", "sale_date"])
+    units = df["quantity_sold"].to_numpy(np.int64)
+    revenue = units * df["sale_price"].to_numpy(np.float64)
+    cost_price = df["cost_price"].to_numpy(np.float64, na_value=np.nan)
+    costed = ~np.isnan(cost_price)
+    return pd.DataFrame({
+        "ts": pd.to_datetime(df["sale_date"], format="ISO8601", utc=True).dt.tz_localize(None),
+        "product_id": df["product_id"].astype(str),
+        "sale_count": np.ones(len(df), dtype=np.int64),
+        "units": units,
+        "revenue": revenue,
+        "cost": np.where(costed, units * cost_price, 0.0),
+        "costed_revenue": np.where(costed, revenue, 0.0),
+    })
+
+
+def bucket_start(ts, bucket):
+    """Start of the hour/day/week (Monday)/month each timestamp falls in"""
+    if bucket == "hour":
+        return ts.dt.floor("h")
+    if bucket == "day":
+        return ts.dt.floor("D")
+    if bucket == "week":
+        return ts.dt.to_period("W-SUN").dt.start_time
+    return ts.dt.to_period("M").dt.start_time
+
+
+def bucket_range(start, end, bucket):
+    """Start of every bucket overlapping [start, end)"""
+    first = bucket_start(pd.Series([pd.Timestamp(start)]), bucket).iloc[0]
+    return pd.date_range(first, pd.Timestamp(end), freq=BUCKET_FREQ[bucket], inclusive="left")
+
+
+def revenue_series(frame, bucket, start=None, end=None):
+    """
+    [{"bucket", "sale_count", "units", "revenue"}] per bucket, oldest first.
+    Buckets between ``start`` and ``end`` with no sales are filled with zeros.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of: {', '.join(BUCKETS)}")
+    totals = frame[_MEASURES].groupby(bucket_start(frame["ts"], bucket)).sum()
+    if start is not None and end is not None:
+        totals = totals.reindex(bucket_range(start, end, bucket).union(totals.index), fill_value=0)
+    return [
+        {"bucket": ts.isoformat(), "sale_count": int(count), "units": int(units), "revenue": round(float(revenue), 2)}
+        for ts, count, units, revenue in zip(totals.index, totals["sale_count"], totals["units"], totals["revenue"])
+    ]
+
+
+def top_products(frame, n=DEFAULT_TOP_N, by="revenue"):
+    """[{"product_id", "sale_count", "units", "revenue"}] for the ``n`` best products by revenue or units"""
+    if by not in RANKINGS:
+        raise ValueError(f"by must be one of: {', '.join(RANKINGS)}")
+    totals = frame.groupby("product_id")[_MEASURES].sum().nlargest(n, by)
+    return [
+        {"product_id": product_id, "sale_count": int(count), "units": int(units), "revenue": round(float(revenue), 2)}
+        for product_id, count, units, revenue in zip(totals.index, totals["sale_count"], totals["units"], totals["revenue"])
+    ]
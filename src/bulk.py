@@ -0,0 +1,201 @@
+"""
+Streaming product import/export (CSV or NDJSON).
+
+Input is parsed one record at a time and validated/upserted in fixed-size
+chunks, and export pages through the catalog by id, so memory use does not
+depend on the size of the file or the catalog.
+
+An import only writes the columns a record has a value for: a SKU that
+already exists keeps its stock, threshold, category and description unless
+the file sets them, and an empty cell never overwrites. New SKUs take
+INSERT_DEFAULTS for what the file leaves out.
+"""
+import asyncio
+import csv
+import io
+import json
+
+FORMATS = ("csv", "ndjson")
+PRODUCT_FIELDS = (
+    "sku", "name", "price", "cost_price", "stock_quantity", "min_stock_level", "category", "description",
+)
+# Columns a new product gets when the import does not set them
+INSERT_DEFAULTS = {"stock_quantity": 0, "min_stock_level": 5, "category": "General", "description": ""}
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+def format_from_path(path):
+    """Guess the format from a file extension"""
+    return "ndjson" if path.lower().endswith((".ndjson", ".jsonl", ".json")) else "csv"
+
+
+def _check_format(fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}' (expected one of: {', '.join(FORMATS)})")
+
+
+def iter_records(text_stream, fmt):
+    """Yield (line_number, record) pairs from a text stream without reading it all"""
+    _check_format(fmt)
+    if fmt == "csv":
+        reader = csv.DictReader(text_stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line_number, line in enumerate(text_stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+
+
+def _number(value, cast, field, required=False, default=None):
+    if value is None or value == "":
+        if required:
+            raise ValueError(f"{field} is required")
+        return default
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a number")
+
+
+def validate_product(record):
+    """Normalise one import record into the product columns it sets; raises ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError(f"Invalid JSON: {record}" if isinstance(record, Exception) else "Record must be an object")
+
+    name = str(record.get("name") or "").strip()
+    sku = str(record.get("sku") or "").strip()
+    if not name or not sku:
+        raise ValueError("Product name and SKU are required")
+
+    price = _number(record.get("price"), float, "price", required=True)
+    if price <= 0:
+        raise ValueError("Price must be greater than 0")
+
+    stock = _number(record.get("stock_quantity"), int, "stock_quantity")
+    if stock is not None and stock < 0:
+        raise ValueError("Stock quantity cannot be negative")
+
+    row = {
+        "sku": sku,
+        "name": name,
+        "price": price,
+        "cost_price": _number(record.get("cost_price"), float, "cost_price"),
+        "stock_quantity": stock,
+        "min_stock_level": _number(record.get("min_stock_level"), int, "min_stock_level"),
+        "category": str(record.get("category") or "").strip() or None,
+        "description": str(record.get("description") or "").strip() or None,
+    }
+    # Missing and empty values are left out, so they never overwrite what is stored
+    return {column: value for column, value in row.items() if value is not None}
+
+
+def _text(stream):
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+
+def new_summary():
+    return {"processed": 0, "inserted": 0, "updated": 0, "error_count": 0, "errors": []}
+
+
+def iter_chunks(stream, fmt, summary, chunk_size=CHUNK_SIZE):
+    """
+    Yield lists of validated product rows with unique SKUs, at most chunk_size
+    long. Rejected records are counted in ``summary``.
+    """
+    def error(line_number, message):
+        summary["error_count"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"line": line_number, "error": message})
+
+    chunk = {}
+    for line_number, record in iter_records(_text(stream), fmt):
+        summary["processed"] += 1
+        try:
+            row = validate_product(record)
+        except ValueError as e:
+            error(line_number, str(e))
+            continue
+        if row["sku"] in chunk:
+            error(line_number, f"Duplicate SKU '{row['sku']}' in import")
+            continue
+        chunk[row["sku"]] = row
+        if len(chunk) >= chunk_size:
+            yield list(chunk.values())
+            chunk = {}
+    if chunk:
+        yield list(chunk.values())
+
+
+def _add_counts(summary, result):
+    summary["inserted"] += result["inserted"]
+    summary["updated"] += result["updated"]
+
+
+def import_products(engine, stream, fmt="csv", chunk_size=CHUNK_SIZE):
+    """
+    Upsert products (matched on SKU) from a binary or text stream.
+
+    Each chunk is validated, de-duplicated and sent to the engine as one bulk
+    upsert. Returns a summary with insert/update counts and the first errors.
+    """
+    summary = new_summary()
+    for chunk in iter_chunks(stream, fmt, summary, chunk_size):
+        _add_counts(summary, engine.upsert_products(chunk, INSERT_DEFAULTS))
+    return summary
+
+
+async def import_products_async(engine, stream, fmt="csv", chunk_size=CHUNK_SIZE):
+    """import_products for async engines; parsing runs in a worker thread"""
+    _check_format(fmt)
+    summary = new_summary()
+    chunks = iter_chunks(stream, fmt, summary, chunk_size)
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            return summary
+        _add_counts(summary, await engine.upsert_products(chunk, INSERT_DEFAULTS))
+
+
+EXPORT_COLUMNS = ("id",) + PRODUCT_FIELDS
+
+
+def format_page(page, fmt, header=False):
+    """Render one page of products as CSV or NDJSON text"""
+    buffer = io.StringIO()
+    if fmt == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+        if header:
+            writer.writeheader()
+        writer.writerows(page)
+    else:
+        for product in page:
+            buffer.write(json.dumps({key: product.get(key) for key in EXPORT_COLUMNS}) + "\n")
+    return buffer.getvalue()
+
+
+def export_products(engine, fmt="csv", chunk_size=CHUNK_SIZE):
+    """Yield the catalog as CSV or NDJSON text, one page of products at a time"""
+    _check_format(fmt)
+    if fmt == "csv":
+        yield format_page([], fmt, header=True)
+    for page in engine.iter_products(chunk_size):
+        yield format_page(page, fmt)
+
+
+async def export_products_async(engine, fmt="csv", chunk_size=CHUNK_SIZE):
+    """export_products for async engines"""
+    _check_format(fmt)
+    if fmt == "csv":
+        yield format_page([], fmt, header=True)
+    async for page in engine.iter_products(chunk_size):
+        yield format_page(page, fmt)
@@ -0,0 +1,153 @@
+"""
+In-process product catalog cache.
+
+Products are held in an LRU map keyed by id with a secondary SKU index, so a
+barcode scan or an id lookup is a dict hit instead of a database round trip.
+Entries expire after ``ttl`` seconds so writes made by other processes are
+eventually picked up; writes made through this process reach the cache as
+storage events (it is a listener on the ObservedEngine, src/storage/observed.py).
+
+A read that misses goes to the database and puts what it got back, and a write
+can land in between. Every write event therefore moves ``generation``; a
+reader takes the generation before its read and passes it to ``put``, which
+refuses the row if that product was written since, as reports.SummaryCache
+does for the dashboard summary.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = 10000
+DEFAULT_CACHE_TTL = 300
+
+
+class CatalogCache:
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._by_id = OrderedDict()  # id -> (product, expires_at)
+        self._id_by_sku = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_puts = 0
+        self.generation = 0           # bumped by every write event
+        self._written_at = OrderedDict()  # id -> generation of its last write event, oldest first
+        self._floor = 0               # generation of the newest entry dropped from _written_at
+
+    def _lookup(self, product_id):
+        entry = self._by_id.get(product_id)
+        if entry is None:
+            return None
+        product, expires_at = entry
+        if self.ttl and expires_at < time.monotonic():
+            self._remove(product_id)
+            return None
+        self._by_id.move_to_end(product_id)
+        return product
+
+    def _remove(self, product_id):
+        product, _ = self._by_id.pop(product_id)
+        if self._id_by_sku.get(product.get("sku")) == product_id:
+            del self._id_by_sku[product["sku"]]
+
+    def _count(self, product):
+        if product is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(product)  # callers may modify what they get back
+
+    def get(self, product_id):
+        with self._lock:
+            return self._count(self._lookup(str(product_id)))
+
+    def get_by_sku(self, sku):
+        with self._lock:
+            product_id = self._id_by_sku.get(sku)
+            return self._count(self._lookup(product_id) if product_id else None)
+
+    def put(self, product, generation=None):
+        """
+        Add or replace one product (a full row as returned by the engine). A row
+        read from the database passes the ``generation`` taken before the read;
+        it is dropped if the product was written since.
+        """
+        if not product or "id" not in product:
+            return
+        product_id = str(product["id"])
+        with self._lock:
+            if generation is not None and max(self._floor, self._written_at.get(product_id, 0)) > generation:
+                self.stale_puts += 1
+                return
+            if product_id in self._by_id:
+                self._remove(product_id)
+            self._by_id[product_id] = (dict(product), time.monotonic() + self.ttl)
+            if product.get("sku") is not None:
+                self._id_by_sku[product["sku"]] = product_id
+            while len(self._by_id) > self.max_size:
+                oldest = next(iter(self._by_id))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _written(self, product_id):
+        # Called with the lock held
+        self.generation += 1
+        self._written_at.pop(product_id, None)
+        self._written_at[product_id] = self.generation
+        # Only reads still in flight need these; forgetting one refuses every put older than it
+        while len(self._written_at) > max(self.max_size, 1):
+            _, self._floor = self._written_at.popitem(last=False)
+
+    def put_many(self, products):
+        for product in products or ():
+            self.put(product)
+
+    def invalidate(self, product_id):
+        with self._lock:
+            self._written(str(product_id))
+            if str(product_id) in self._by_id:
+                self._remove(str(product_id))
+
+    # Storage events
+    def products_changed(self, products):
+        # The rows are fresh, but a read that started before the write must not overwrite them
+        with self._lock:
+            for product in products or ():
+                if product and "id" in product:
+                    self._written(str(product["id"]))
+        self.put_many(products)
+
+    def stock_changed(self, product_id, stock_quantity):
+        # A sale also moves updated_at, the compare-and-set token of PATCH /products/{id}/stock;
+        # the event does not carry it, so the row is read again instead of patched
+        self.invalidate(product_id)
+
+    def product_removed(self, product_id):
+        self.invalidate(product_id)
+
+    def sales_recorded(self, sales):
+        pass
+
+    def clear(self):
+        with self._lock:
+            self._by_id.clear()
+            self._id_by_sku.clear()
+            self.generation += 1
+            self._written_at.clear()
+            self._floor = self.generation
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._by_id),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "stale_puts": self.stale_puts,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
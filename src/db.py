@@ -1,20 +1,450 @@
-from supabase import create_client, Client
+import asyncio
+import logging
 import os
+
 from dotenv import load_dotenv
 
+# analytics, forecast, profit and snapshot load pandas/numpy; they are imported where used so the CLI starts without them
+from src import bulk, reports
+from src.flash_sale import FlashSales
+from src.journal import SaleJournal, WriteBehindSales
+from src.low_stock import LowStockMonitor
+from src.pagination import DEFAULT_PAGE_SIZE, PRODUCT_KEY, SALE_KEY, fetch_page, fetch_page_async
+from src.search import DEFAULT_LIMIT, ProductSearchIndex
+from src.storage import ORDER_REFUSED, ProductNotFound, StockConflict, create_async_engine, shared_engine
+
 load_dotenv()  # ✅ loads variables from .env file
 
+logger = logging.getLogger(__name__)
+
+
+def _log_low_stock(product_id, stock_quantity, min_stock_level):
+    logger.warning("Product %s is low on stock: %s left (minimum %s)", product_id, stock_quantity, min_stock_level)
+
+def _order_response(result):
+    """Data-layer result for engine.record_order(): the order, or why it was refused, with per-line results"""
+    if result["order"] is not None:
+        return {"success": True, "data": result["order"], "lines": result["lines"]}
+    refused = sum(1 for line in result["lines"] if line["error"] != ORDER_REFUSED)
+    return {
+        "success": False,
+        "error": f"Order refused: {refused} of {len(result['lines'])} lines cannot be filled",
+        "lines": result["lines"]
+    }
+
 class SupabaseDB:
-    def __init__(self):
-        url = os.getenv("SUPABASE_URL")
-        key = os.getenv("SUPABASE_KEY")
-        if not url or not key:
-            raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in .env file")
-        self.supabase: Client = create_client(url, key)
+    """
+    The data layer for synchronous callers: the CLI (through Backend/database.py)
+    and FlashInventory. Results are {"success": True, "data": ...} or
+    {"success": False, "error": ...}, as returned by the API; a missing product
+    adds "not_found": True, a lost compare-and-set adds "conflict": True and an
+    invalid argument (a quantity below 1, a field that cannot be written) adds
+    "invalid": True.
+    """
+
+    def __init__(self, engine=None):
+        self._engine = engine
+
+    @property
+    def engine(self):
+        # Storage engine is chosen by STORAGE_ENGINE (supabase by default, or sqlite); one per process,
+        # connected on first use rather than when the data layer is built
+        if self._engine is None:
+            self._engine = shared_engine()
+        return self._engine
+
+    def test_connection(self):
+        try:
+            self.engine.ping()
+            return {"success": True, "data": None}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
 
     # ---------------- PRODUCT METHODS ----------------
 
-    def create_product(self, name, sku, price, stock_quantity):
+    def create_product(self, name, sku, price, stock_quantity, cost_price=None):
+        data = {
+            "name": name,
+            "sku": sku,
+            "price": price,
+            "stock_quantity": stock_quantity
+        }
+        if cost_price is not None:
+            data["cost_price"] = cost_price
+        return self.insert_product(data)
+
+    def insert_product(self, product_data):
+        try:
+            return {"success": True, "data": self.engine.insert_product(product_data)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_all_products(self):
+        try:
+            return {"success": True, "data": self.engine.list_products()}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_products(self, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        try:
+            products, next_cursor = fetch_page(self.engine.list_products_page, PRODUCT_KEY, limit, cursor)
+            return {"success": True, "data": products, "next_cursor": next_cursor}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_product(self, product_id):
+        try:
+            product = self.engine.get_product(product_id)
+            if not product:
+                return {"success": False, "error": "Product not found", "not_found": True}
+            return {"success": True, "data": product}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_product_by_sku(self, sku):
+        try:
+            product = self.engine.get_product_by_sku(sku)
+            if not product:
+                return {"success": False, "error": "Product not found", "not_found": True}
+            return {"success": True, "data": product}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_products_by_ids(self, product_ids):
+        try:
+            return {"success": True, "data": self.engine.get_products_by_ids(product_ids)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def update_product_stock(self, product_id, new_stock):
+        try:
+            return {"success": True, "data": self.engine.update_product_stock(product_id, new_stock)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def update_product(self, product_id, fields):
+        try:
+            return {"success": True, "data": self.engine.update_product(product_id, fields)}
+        except ProductNotFound as e:
+            return {"success": False, "error": str(e), "not_found": True}
+        except ValueError as e:
+            return {"success": False, "error": str(e), "invalid": True}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def delete_product(self, product_id):
+        try:
+            return {"success": True, "data": self.engine.delete_product(product_id)}
+        except ProductNotFound as e:
+            return {"success": False, "error": str(e), "not_found": True}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def adjust_product_stock(self, product_id, delta=None, new_stock=None, expected_updated_at=None):
+        try:
+            rows = self.engine.adjust_product_stock(product_id, delta, new_stock, expected_updated_at)
+            return {"success": True, "data": rows}
+        except StockConflict as e:
+            return {"success": False, "error": str(e), "conflict": True, "data": [e.product]}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_low_stock_products(self):
+        try:
+            return {"success": True, "data": self.engine.list_low_stock()}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_stored_forecast(self, product_id):
+        try:
+            return {"success": True, "data": self.engine.get_forecast(product_id)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_product_forecast(self, product_id):
+        from src import forecast
+        try:
+            # Written by the forecasting job; products it has not covered yet are fitted on the spot
+            result = self.engine.get_forecast(product_id)
+            if result is not None:
+                return {"success": True, "data": {**result, "source": "stored"}}
+            if not self.engine.get_product(product_id):
+                return {"success": False, "error": "Product not found", "not_found": True}
+            since, until = forecast.history_window()
+            rows = self.engine.list_daily_product_sales(since, until, product_id)
+            return {"success": True, "data": {**forecast.forecast_product(product_id, rows), "source": "live"}}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def import_products(self, stream, fmt="csv"):
+        try:
+            return {"success": True, "data": bulk.import_products(self.engine, stream, fmt)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def export_products(self, fmt="csv"):
+        # Generator of text chunks, suitable for a streaming response
+        return bulk.export_products(self.engine, fmt)
+
+    # ---------------- SALES METHODS ----------------
+
+    def create_sale(self, product_id, quantity, sale_price, sale_date=None):
+        try:
+            # Stock check, decrement and sale insert happen atomically in one call
+            result = self.engine.record_sale(product_id, quantity, sale_price, sale_date)
+            return {"success": True, "data": [result["sale"]], "stock_quantity": result["stock_quantity"]}
+        except ValueError as e:
+            return {"success": False, "error": str(e), "invalid": True}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def create_sales_batch(self, lines):
+        try:
+            results = self.engine.record_sales_batch(lines)
+            accepted = sum(1 for r in results if r["success"])
+            return {
+                "success": True,
+                "data": results,
+                "accepted": accepted,
+                "rejected": len(results) - accepted
+            }
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def create_order(self, lines):
+        try:
+            # All lines or none, in one transaction
+            return _order_response(self.engine.record_order(lines))
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_order(self, order_id):
+        try:
+            order = self.engine.get_order(order_id)
+            if order is None:
+                return {"success": False, "error": "Order not found", "not_found": True}
+            return {"success": True, "data": order}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def insert_sale(self, sale_data):
+        try:
+            return {"success": True, "data": self.engine.insert_sale(sale_data)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_sales(self, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        try:
+            sales, next_cursor = fetch_page(self.engine.list_sales_page, SALE_KEY, limit, cursor)
+            for s in sales:
+                s["quantity"] = s.get("quantity_sold", 0)
+            return {"success": True, "data": sales, "next_cursor": next_cursor}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_all_sales(self):
+        try:
+            return {"success": True, "data": self.engine.list_sales()}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_recent_sales(self, limit=10):
+        try:
+            return {"success": True, "data": self.engine.list_sales(limit=limit)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_sales_by_product(self, product_id):
+        try:
+            return {"success": True, "data": self.engine.get_sales_by_product(product_id)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    # ---------------- REPORTS ----------------
+
+    def get_dashboard_counts(self, since):
+        try:
+            # Product count, low-stock count and sales totals since a date, from one snapshot
+            return {"success": True, "data": self.engine.dashboard_summary(since)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_dashboard_summary(self):
+        since, _ = reports.report_window(reports.DASHBOARD_DAYS)
+        result = self.get_dashboard_counts(since)
+        if result["success"]:
+            result["data"] = reports.dashboard_summary(result["data"], since=since)
+        return result
+
+    def get_daily_sales(self, since=None, until=None):
+        try:
+            return {"success": True, "data": self.engine.list_daily_sales(since, until)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_daily_product_sales(self, since=None, until=None, product_id=None):
+        try:
+            return {"success": True, "data": self.engine.list_daily_product_sales(since, until, product_id)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def rebuild_sales_rollups(self):
+        try:
+            return {"success": True, "data": self.engine.rebuild_sales_rollups()}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_sales_report(self, days=30, top=0):
+        try:
+            since, until = reports.report_window(days)
+            report = reports.sales_report(days, self.engine.list_daily_sales(since, until), since)
+            if top:
+                report["top_products"] = reports.product_totals(self.engine.list_daily_product_sales(since, until), top)
+            return {"success": True, "data": report}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    # ---------------- ANALYTICS ----------------
+
+    def get_revenue_series(self, days=30, bucket="day"):
+        from src import analytics
+        try:
+            since, until, end = analytics.window(days, bucket)
+            if bucket == "hour":
+                frame = analytics.sales_frame(self.engine.iter_sales(since, end))
+            else:
+                frame = analytics.rollup_frame(self.engine.list_daily_sales(since, until))
+            return {"success": True, "data": analytics.revenue_series(frame, bucket, since, end)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_top_products(self, days=30, n=None, by="revenue"):
+        from src import analytics
+        n = analytics.DEFAULT_TOP_N if n is None else n
+        try:
+            since, until, _ = analytics.window(days)
+            frame = analytics.rollup_frame(self.engine.list_daily_product_sales(since, until))
+            top = analytics.top_products(frame, n, by)
+            for entry in top:
+                product = self.engine.get_product(entry["product_id"])
+                entry["name"] = product["name"] if product else None
+                entry["sku"] = product["sku"] if product else None
+            return {"success": True, "data": top}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def get_profit_report(self, days=30, group="product", n=None, by="gross_profit"):
+        from src import analytics, profit
+        n = profit.DEFAULT_LIMIT if n is None else n
+        try:
+            rows_from = profit.source(group)
+            since, until, end = analytics.window(days, group if group in analytics.BUCKETS else "day")
+            products = None
+            if rows_from == "sales":
+                frame = analytics.sales_frame(self.engine.iter_sales(since, end))
+            elif rows_from == "daily":
+                frame = analytics.rollup_frame(self.engine.list_daily_sales(since, until))
+            else:
+                frame = analytics.rollup_frame(self.engine.list_daily_product_sales(since, until))
+                # Only the products sold in the window are read, in one batched lookup
+                products = self.engine.get_products_by_ids(profit.sold_products(frame))
+            return {"success": True, "data": profit.profit_report(frame, group, products, n, by, since, end)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+
+class AsyncSupabaseDB:
+    """
+    Async version of SupabaseDB for the API: same methods and result format,
+    but every call is awaited on a shared, pooled client instead of blocking
+    a worker thread. Create it once per process with ``await AsyncSupabaseDB.connect()``.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        # In-process views kept current by the engine's write events; filled in the background
+        self.search_index = ProductSearchIndex()
+        self.low_stock = LowStockMonitor()
+        self.low_stock.on_low_stock(_log_low_stock)
+        self.summary_cache = reports.SummaryCache()
+        for view in (self.search_index, self.low_stock, self.summary_cache):
+            self.engine.subscribe(view)
+        self._index_task = None
+        # Optional columnar copy of the sales history for analytics (see src/snapshot.py)
+        snapshot_dir = os.getenv("SALES_SNAPSHOT_DIR")
+        self.snapshot = None
+        if snapshot_dir:
+            from src.snapshot import SalesSnapshot
+            self.snapshot = SalesSnapshot(snapshot_dir)
+        self._snapshot_lock = asyncio.Lock()
+        self._snapshot_task = None
+        # Optional write-behind checkout: sales are journaled locally and flushed in batches (see src/journal.py)
+        journal_path = os.getenv("SALES_JOURNAL")
+        self.write_behind = WriteBehindSales(self.engine, SaleJournal(journal_path)) if journal_path else None
+        if self.write_behind is not None:
+            self.engine.subscribe(self.write_behind)
+        # Hot products whose stock is held in memory while a flash sale runs (see src/flash_sale.py)
+        self.flash_sales = FlashSales(self.engine)
+
+    @classmethod
+    async def connect(cls):
+        db = cls(await create_async_engine())
+        db._index_task = asyncio.create_task(db._load_views())
+        if db.write_behind is not None:
+            db.write_behind.start()
+        if db.snapshot is not None:
+            db._snapshot_task = asyncio.create_task(db._warm_snapshot())
+        return db
+
+    async def _warm_snapshot(self):
+        try:
+            snapshot = await self._fresh_snapshot()
+            logger.info("Sales snapshot ready: %s rows", snapshot.rows)
+        except Exception:
+            logger.exception("Updating the sales snapshot failed")
+
+    async def _load_views(self):
+        # Write events only cover this process; the catalog is scanned again once the
+        # products table has moved, to pick up the CLI, imports, the forecast job and other workers
+        while True:
+            versions = await self.table_versions()
+            version = versions.get("products") if versions else None
+            if not self.search_index.ready or self.search_index.stale(version):
+                await self._scan_catalog(version)
+            if not self.search_index.refresh_interval:
+                return
+            await asyncio.sleep(self.search_index.refresh_interval)
+
+    async def _scan_catalog(self, version):
+        # One catalog scan feeds both the search index and the low-stock monitor
+        async def pages():
+            async for page in self.engine.iter_products():
+                self.low_stock.track(page)
+                yield page
+
+        try:
+            await self.search_index.load_async(pages(), version)
+            self.low_stock.ready = True
+        except Exception:
+            logger.exception("Loading the product views failed")
+
+    async def close(self):
+        for task in (self._index_task, self._snapshot_task):
+            if task is not None:
+                task.cancel()
+        # Store admitted flash-sale checkouts and give unsold units back to their rows
+        await self.flash_sales.stop()
+        if self.write_behind is not None:
+            # Drain what the database will take now; the rest is replayed on the next start
+            await self.write_behind.stop()
+            self.engine.unsubscribe(self.write_behind)
+        for view in (self.search_index, self.low_stock, self.summary_cache):
+            self.engine.unsubscribe(view)
+        await self.engine.close()
+
+    # ---------------- PRODUCT METHODS ----------------
+
+    async def create_product(self, name, sku, price, stock_quantity, cost_price=None):
         try:
             data = {
                 "name": name,
@@ -22,63 +452,334 @@ class SupabaseDB:
                 "price": price,
                 "stock_quantity": stock_quantity
             }
-            response = self.supabase.table("products").insert(data).execute()
-            return {"success": True, "data": response.data}
+            if cost_price is not None:
+                data["cost_price"] = cost_price
+            return {"success": True, "data": await self.engine.insert_product(data)}
         except Exception as e:
             return {"success": False, "error": str(e)}
 
-    def get_products(self):
+    async def get_products(self, limit=DEFAULT_PAGE_SIZE, cursor=None):
         try:
-            response = self.supabase.table("products").select("*").execute()
-            return {"success": True, "data": response.data}
+            products, next_cursor = await fetch_page_async(self.engine.list_products_page, PRODUCT_KEY, limit, cursor)
+            return {"success": True, "data": products, "next_cursor": next_cursor}
         except Exception as e:
             return {"success": False, "error": str(e)}
 
-    def update_product_stock(self, product_id, new_stock):
+    async def get_product(self, product_id):
+        try:
+            product = await self.engine.get_product(product_id)
+            if not product:
+                return {"success": False, "error": "Product not found", "not_found": True}
+            return {"success": True, "data": product}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def get_product_by_sku(self, sku):
+        try:
+            product = await self.engine.get_product_by_sku(sku)
+            if not product:
+                return {"success": False, "error": "Product not found", "not_found": True}
+            return {"success": True, "data": product}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def search_products(self, query, limit=DEFAULT_LIMIT):
+        if not self.search_index.ready:
+            return {"success": False, "error": "Search index is still loading, try again shortly"}
+        return {"success": True, "data": self.search_index.search(query, limit)}
+
+    def cache_stats(self):
+        cache = getattr(self.engine, "cache", None)
+        stats = cache.stats() if cache is not None else {"disabled": True}
+        return {"success": True, "data": {**stats, "search_index": self.search_index.stats()}}
+
+    def gauges(self):
+        """[(name, help, labels, value)] of the in-process views, read when /metrics is scraped"""
+        samples = [
+            ("low_stock_products", "Products below their minimum stock level", {}, len(self.low_stock)),
+            ("search_index_ready", "1 once the search index has loaded", {}, int(self.search_index.ready)),
+        ]
+        if self.search_index.ready:
+            samples.append(("search_index_age_seconds", "Seconds since the search index last scanned the catalog",
+                            {}, round(self.search_index.age(), 1)))
+        cache = getattr(self.engine, "cache", None)
+        if cache is not None:
+            stats = cache.stats()
+            for key in ("size", "hits", "misses", "evictions", "hit_rate"):
+                samples.append((f"catalog_cache_{key}", f"Catalog cache {key.replace('_', ' ')}", {}, stats[key]))
+        if self.write_behind is not None:
+            stats = self.write_behind.stats()
+            for key in ("pending", "flushed", "rejected"):
+                samples.append((f"sales_journal_{key}", f"Journaled sales {key}", {}, stats[key]))
+        flash = self.flash_sales.stats()
+        samples.append(("flash_sale_waiting", "Admitted flash-sale checkouts not stored yet", {}, flash["waiting"]))
+        samples.append(("flash_sale_failed", "Admitted flash-sale checkouts the database refused", {}, flash["failed"]))
+        for sale in flash["sales"]:
+            labels = {"sku": sale["sku"]}
+            samples.append(("flash_sale_remaining_units", "Units left in a running flash sale", labels, sale["remaining"]))
+            samples.append(("flash_sale_refused", "Checkouts refused by a running flash sale", labels, sale["refused"]))
+        return samples
+
+    async def update_product_stock(self, product_id, new_stock):
         try:
-            response = self.supabase.table("products").update({"stock_quantity": new_stock}).eq("id", product_id).execute()
-            return {"success": True, "data": response.data}
+            return {"success": True, "data": await self.engine.update_product_stock(product_id, new_stock)}
         except Exception as e:
             return {"success": False, "error": str(e)}
 
+    async def adjust_product_stock(self, product_id, delta=None, new_stock=None, expected_updated_at=None):
+        try:
+            rows = await self.engine.adjust_product_stock(product_id, delta, new_stock, expected_updated_at)
+            return {"success": True, "data": rows}
+        except StockConflict as e:
+            # data is the current row, so the client can retry without re-reading
+            return {"success": False, "error": str(e), "conflict": True, "data": [e.product]}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def get_low_stock_products(self):
+        try:
+            return {"success": True, "data": await self.engine.list_low_stock()}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def get_product_forecast(self, product_id):
+        from src import forecast
+        try:
+            result = await self.engine.get_forecast(product_id)
+            if result is not None:
+                return {"success": True, "data": {**result, "source": "stored"}}
+            if not await self.engine.get_product(product_id):
+                return {"success": False, "error": "Product not found", "not_found": True}
+            since, until = forecast.history_window()
+            rows = await self.engine.list_daily_product_sales(since, until, product_id)
+            return {"success": True, "data": {**forecast.forecast_product(product_id, rows), "source": "live"}}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def import_products(self, stream, fmt="csv"):
+        try:
+            return {"success": True, "data": await bulk.import_products_async(self.engine, stream, fmt)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def export_products(self, fmt="csv"):
+        # Async generator of text chunks, suitable for a streaming response
+        return bulk.export_products_async(self.engine, fmt)
+
     # ---------------- SALES METHODS ----------------
 
-    def create_sale(self, product_id, quantity, sale_price, sale_date=None):
+    async def create_sale(self, product_id, quantity, sale_price, sale_date=None):
         try:
-            # Check product
-            product_res = self.supabase.table("products").select("stock_quantity").eq("id", product_id).execute()
-            if not product_res.data:
-                return {"success": False, "error": "Product not found"}
+            if self.flash_sales.get(product_id) is not None:
+                # Admitted against the in-memory counter, answered once its batch is stored
+                result = await self.flash_sales.record(product_id, quantity, sale_price, sale_date)
+                return {"success": True, "data": [result["sale"]], "stock_quantity": result["stock_quantity"]}
+            if self.write_behind is not None:
+                result = await self.write_behind.record(product_id, quantity, sale_price, sale_date)
+                return {
+                    "success": True,
+                    "data": [result["sale"]],
+                    "stock_quantity": result["stock_quantity"],
+                    "queued": True
+                }
+            result = await self.engine.record_sale(product_id, quantity, sale_price, sale_date)
+            return {"success": True, "data": [result["sale"]], "stock_quantity": result["stock_quantity"]}
+        except ValueError as e:
+            return {"success": False, "error": str(e), "invalid": True}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
 
-            current_stock = product_res.data[0]["stock_quantity"]
-            if current_stock < quantity:
-                return {"success": False, "error": f"Not enough stock (Available: {current_stock})"}
+    async def _record_lines(self, lines):
+        if self.write_behind is not None:
+            # Through the journal too, so a batch cannot sell units the journal still holds
+            return await self.write_behind.record_batch(lines)
+        return await self.engine.record_sales_batch(lines)
 
-            sale_data = {
-                "product_id": product_id,
-                "quantity_sold": quantity,  # ✅ match DB column
-                "sale_price": sale_price
+    async def create_sales_batch(self, lines):
+        try:
+            hot = [i for i, line in enumerate(lines) if self.flash_sales.get(line["product_id"]) is not None]
+            if hot:
+                # Lines for flash-sale products are admitted by their counters, the rest go through as usual
+                hot_set = set(hot)
+                rest = [i for i in range(len(lines)) if i not in hot_set]
+                calls = [self.flash_sales.record_batch([lines[i] for i in hot])]
+                if rest:
+                    calls.append(self._record_lines([lines[i] for i in rest]))
+                results = [None] * len(lines)
+                for indexes, part in zip((hot, rest), await asyncio.gather(*calls)):
+                    for i, result in zip(indexes, part):
+                        results[i] = {**result, "index": i}
+            else:
+                results = await self._record_lines(lines)
+            accepted = sum(1 for r in results if r["success"])
+            response = {
+                "success": True,
+                "data": results,
+                "accepted": accepted,
+                "rejected": len(results) - accepted
             }
-            if sale_date:
-                sale_data["sale_date"] = sale_date
+            if self.write_behind is not None:
+                response["queued"] = True
+            return response
+        except Exception as e:
+            return {"success": False, "error": str(e)}
 
-            response = self.supabase.table("sales").insert(sale_data).execute()
+    async def create_order(self, lines):
+        try:
+            hot = {i for i, line in enumerate(lines) if self.flash_sales.get(line["product_id"]) is not None}
+            if hot:
+                # A flash sale's units live in its counter, not in the row the order would lock
+                return _order_response({"order": None, "lines": [
+                    {"index": i, "success": False, "error": "Product is in a flash sale; sell it on its own"}
+                    if i in hot else {"index": i, "success": False, "error": ORDER_REFUSED}
+                    for i in range(len(lines))
+                ]})
+            if self.write_behind is not None:
+                return _order_response(await self.write_behind.record_order(lines))
+            return _order_response(await self.engine.record_order(lines))
+        except Exception as e:
+            return {"success": False, "error": str(e)}
 
-            if response.data:
-                # update stock
-                new_stock = current_stock - quantity
-                self.supabase.table("products").update({"stock_quantity": new_stock}).eq("id", product_id).execute()
+    async def get_order(self, order_id):
+        try:
+            order = await self.engine.get_order(order_id)
+            if order is None:
+                return {"success": False, "error": "Order not found", "not_found": True}
+            return {"success": True, "data": order}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
 
-            return {"success": True, "data": response.data}
+    async def start_flash_sale(self, product_id, units=None):
+        try:
+            return {"success": True, "data": await self.flash_sales.start(product_id, units)}
+        except StockConflict as e:
+            return {"success": False, "error": str(e), "conflict": True, "data": [e.product]}
         except Exception as e:
             return {"success": False, "error": str(e)}
 
-    def get_sales(self):
+    async def end_flash_sale(self, product_id):
         try:
-            response = self.supabase.table("sales").select("*, products(name, sku)").execute()
-            sales = response.data
+            return {"success": True, "data": await self.flash_sales.end(product_id)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def flash_sale_stats(self):
+        return {"success": True, "data": self.flash_sales.stats()}
+
+    def sales_journal_stats(self):
+        if self.write_behind is None:
+            return {"success": False, "error": "Write-behind sales are not enabled (set SALES_JOURNAL)"}
+        return {"success": True, "data": self.write_behind.stats()}
+
+    async def get_sales(self, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        try:
+            sales, next_cursor = await fetch_page_async(self.engine.list_sales_page, SALE_KEY, limit, cursor)
             for s in sales:
                 s["quantity"] = s.get("quantity_sold", 0)
-            return {"success": True, "data": sales}
+            return {"success": True, "data": sales, "next_cursor": next_cursor}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    # ---------------- REPORTS ----------------
+
+    async def table_versions(self):
+        """Current write counters per table, or None if they cannot be read (then skip caching)"""
+        try:
+            return await self.engine.table_versions()
+        except Exception:
+            logger.exception("Reading table versions failed")
+            return None
+
+    async def get_dashboard_summary(self):
+        summary = self.summary_cache.get()
+        if summary is None:
+            try:
+                generation = self.summary_cache.generation
+                since, _ = reports.report_window(reports.DASHBOARD_DAYS)
+                counts = await self.engine.dashboard_summary(since)
+                summary = reports.dashboard_summary(counts, since=since)
+                self.summary_cache.put(summary, generation)
+            except Exception as e:
+                return {"success": False, "error": str(e)}
+        return {"success": True, "data": summary}
+
+    async def get_sales_report(self, days=30, top=0):
+        try:
+            since, until = reports.report_window(days)
+            report = reports.sales_report(days, await self.engine.list_daily_sales(since, until), since)
+            if top:
+                rows = await self.engine.list_daily_product_sales(since, until)
+                report["top_products"] = reports.product_totals(rows, top)
+            return {"success": True, "data": report}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    # ---------------- ANALYTICS ----------------
+    # pandas work runs in a worker thread so it never stalls the event loop
+
+    async def _fresh_snapshot(self):
+        # Catch up with sales recorded since the last append (usually none or a few)
+        async with self._snapshot_lock:
+            await self.snapshot.append_async(self.engine)
+        return self.snapshot
+
+    async def get_revenue_series(self, days=30, bucket="day"):
+        from src import analytics
+        try:
+            if self.snapshot is not None:
+                since, _, end = analytics.window(days)
+                snapshot = await self._fresh_snapshot()
+                series = await asyncio.to_thread(snapshot.revenue_series, bucket, since, end)
+                return {"success": True, "data": series}
+            since, until, end = analytics.window(days, bucket)
+            if bucket == "hour":
+                pages = [page async for page in self.engine.iter_sales(since, end)]
+                frame = await asyncio.to_thread(analytics.sales_frame, pages)
+            else:
+                rows = await self.engine.list_daily_sales(since, until)
+                frame = await asyncio.to_thread(analytics.rollup_frame, rows)
+            series = await asyncio.to_thread(analytics.revenue_series, frame, bucket, since, end)
+            return {"success": True, "data": series}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def get_top_products(self, days=30, n=None, by="revenue"):
+        from src import analytics
+        n = analytics.DEFAULT_TOP_N if n is None else n
+        try:
+            since, until, end = analytics.window(days)
+            if self.snapshot is not None:
+                snapshot = await self._fresh_snapshot()
+                top = await asyncio.to_thread(snapshot.top_products, n, by, since, end)
+            else:
+                rows = await self.engine.list_daily_product_sales(since, until)
+                frame = await asyncio.to_thread(analytics.rollup_frame, rows)
+                top = await asyncio.to_thread(analytics.top_products, frame, n, by)
+            products = await asyncio.gather(*(self.engine.get_product(entry["product_id"]) for entry in top))
+            for entry, product in zip(top, products):
+                entry["name"] = product["name"] if product else None
+                entry["sku"] = product["sku"] if product else None
+            return {"success": True, "data": top}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def get_profit_report(self, days=30, group="product", n=None, by="gross_profit"):
+        from src import analytics, profit
+        n = profit.DEFAULT_LIMIT if n is None else n
+        try:
+            rows_from = profit.source(group)
+            since, until, end = analytics.window(days, group if group in analytics.BUCKETS else "day")
+            products = None
+            if rows_from == "sales":
+                pages = [page async for page in self.engine.iter_sales(since, end)]
+                frame = await asyncio.to_thread(analytics.sales_frame, pages)
+            elif rows_from == "daily":
+                frame = await asyncio.to_thread(analytics.rollup_frame, await self.engine.list_daily_sales(since, until))
+            else:
+                rows = await self.engine.list_daily_product_sales(since, until)
+                frame = await asyncio.to_thread(analytics.rollup_frame, rows)
+                products = await self.engine.get_products_by_ids(profit.sold_products(frame))
+            report = await asyncio.to_thread(profit.profit_report, frame, group, products, n, by, since, end)
+            return {"success": True, "data": report}
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -0,0 +1,321 @@
+"""
+Flash-sale mode for hot products: their stock is held in process memory and
+POST /sales/ for them never touches the products row.
+
+Starting a flash sale (POST /flash-sales/) takes ``units`` (default: all the
+stock) out of the product's row with one conditional stock write and puts
+them in an in-process counter. A sale for the product is then admitted or
+refused against the counter - a comparison and a subtraction on the event
+loop, no database read and no row lock shared by every buyer. Admitted sales
+are written with insert_sales(), which stores sale rows without touching
+stock: whatever was admitted while the previous batch was being written goes
+in the next one (up to FLUSH_BATCH), so batches grow with the load and an
+idle sale waits for one insert only. Each checkout is answered once its batch
+is stored (group commit), so an acknowledged sale is never lost.
+
+A batch that fails on a transient error (the database unreachable, busy or
+cancelling statements) is resent under the same sale ids until it is stored;
+checkouts wait meanwhile, and the queue is bounded by the units on sale since
+every admitted sale holds at least one. Any other error is permanent for some
+row of the batch, so the rows are then written one by one: the sales the
+database refuses are failed back to their buyers and their units return to
+the counter (or to the row, if the flash sale has ended). Both show up in
+stats() - last_error and failed - and in the /metrics gauges.
+
+Ending the sale (DELETE /flash-sales/{product_id}, or shutting down) stops
+admitting and gives the unsold units back to the row.
+
+No overselling: a unit is sold either from the counter or from the row,
+never both, and the counter holds exactly what its stock write took. If the
+process dies mid-sale, its unsold units stay out of the row - stock reads
+low, never high - until they are added back with PATCH /products/{id}/stock.
+Counters live in the API process that started them; other workers keep
+selling from what is left in the row.
+"""
+import asyncio
+import logging
+import sqlite3
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+from postgrest.exceptions import APIError
+
+from src.storage import InsufficientStock, ProductNotFound
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH = 1000     # sales per insert_sales call
+RETRY_DELAY = 0.05     # first wait after a failed batch, doubled up to MAX_RETRY_DELAY
+MAX_RETRY_DELAY = 5.0
+
+# SQLSTATE classes worth retrying: connection exception, transaction rollback
+# (serialization failure, deadlock), insufficient resources, operator intervention
+TRANSIENT_SQLSTATES = ("08", "40", "53", "57")
+
+
+def is_transient(error):
+    """True for failures that say nothing about the rows themselves, so resending them can succeed"""
+    if isinstance(error, (OSError, asyncio.TimeoutError, httpx.TransportError, sqlite3.OperationalError)):
+        return True
+    if isinstance(error, APIError):
+        code = str(error.code or "")
+        # PGRST000-PGRST003: PostgREST could not reach the database or get a connection
+        return code.startswith(TRANSIENT_SQLSTATES) or code in ("PGRST000", "PGRST001", "PGRST002", "PGRST003")
+    return False
+
+
+def _utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat(timespec="microseconds")
+
+
+class FlashSale:
+    """The units held for one hot product and what has been sold from them"""
+
+    def __init__(self, product, units):
+        self.product_id = str(product["id"])
+        self.sku = product.get("sku")
+        self.price = product.get("price")
+        self.cost_price = product.get("cost_price")
+        self.units = units
+        self.remaining = units
+        self.sales = 0
+        self.refused = 0
+        self.started_at = _utc_now()
+
+    def admit(self, quantity, sale_price=None, sale_date=None):
+        """Take ``quantity`` units and return the sale row, or raise InsufficientStock"""
+        if quantity <= 0:
+            raise ValueError("Quantity must be greater than 0")
+        if quantity > self.remaining:
+            self.refused += 1
+            raise InsufficientStock(self.remaining, self.product_id)
+        self.remaining -= quantity
+        self.sales += 1
+        return {
+            "id": str(uuid.uuid4()),
+            "product_id": self.product_id,
+            "quantity_sold": quantity,
+            "sale_price": sale_price if sale_price is not None else self.price,
+            "cost_price": self.cost_price,
+            "sale_date": sale_date or _utc_now(),
+        }
+
+    def stats(self):
+        return {
+            "product_id": self.product_id,
+            "sku": self.sku,
+            "units": self.units,
+            "remaining": self.remaining,
+            "sold": self.units - self.remaining,
+            "sales": self.sales,
+            "refused": self.refused,
+            "started_at": self.started_at,
+        }
+
+
+class FlashSales:
+    """
+    The flash sales running in this process. Counters are only touched from
+    the event loop, so admitting needs no lock; starting and ending are
+    serialised by an asyncio.Lock.
+    """
+
+    def __init__(self, engine, batch_size=FLUSH_BATCH):
+        self.engine = engine
+        self.batch_size = batch_size
+        self._sales = {}      # product id -> FlashSale
+        self._waiting = []    # (sale row, future) admitted but not stored yet
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+        self.batches = 0
+        self.failed = 0       # admitted sales the database refused
+        self.last_error = None
+
+    def get(self, product_id):
+        """The running FlashSale for a product, or None"""
+        return self._sales.get(str(product_id))
+
+    # ---------------- starting and ending ----------------
+
+    async def start(self, product_id, units=None):
+        product_id = str(product_id)
+        async with self._lock:
+            if product_id in self._sales:
+                raise ValueError("A flash sale is already running for this product")
+            product = await self.engine.get_product(product_id)
+            if product is None:
+                raise ProductNotFound(product_id)
+            units = (product.get("stock_quantity") or 0) if units is None else units
+            if units <= 0:
+                raise ValueError("The flash sale needs at least one unit of stock")
+            # Conditional decrement: refused (StockConflict) if the row no longer has that many
+            rows = await self.engine.adjust_product_stock(product_id, delta=-units)
+            sale = self._sales[product_id] = FlashSale(rows[0] if rows else product, units)
+            if self._task is None:
+                self._task = asyncio.create_task(self._run())
+            logger.info("Flash sale started for %s with %s units", sale.sku or product_id, units)
+            return sale.stats()
+
+    async def end(self, product_id):
+        """Stop admitting sales for a product and return its unsold units to the row"""
+        product_id = str(product_id)
+        async with self._lock:
+            sale = self._sales.pop(product_id, None)
+            if sale is None:
+                raise ValueError("No flash sale is running for this product")
+            if sale.remaining:
+                try:
+                    await self.engine.adjust_product_stock(product_id, delta=sale.remaining)
+                except BaseException:
+                    self._sales[product_id] = sale  # still ours; ending can be retried
+                    raise
+            stats = {**sale.stats(), "returned": sale.remaining}
+            sale.remaining = 0
+            logger.info("Flash sale ended for %s: %s sold, %s returned", sale.sku or product_id, stats["sold"], stats["returned"])
+            return stats
+
+    # ---------------- checkout ----------------
+
+    async def record(self, product_id, quantity, sale_price=None, sale_date=None):
+        """Admit one sale and wait until it is stored; returns {"sale", "stock_quantity"} like engine.record_sale"""
+        sale = self._sales[str(product_id)]
+        row = sale.admit(quantity, sale_price, sale_date)
+        remaining = sale.remaining
+        error, = await self._stored([row])
+        if error is not None:
+            raise error
+        return {"sale": row, "stock_quantity": remaining}
+
+    async def record_batch(self, lines):
+        """Admit many sales and wait until they are stored; per-line results like engine.record_sales_batch"""
+        results, rows = [], []
+        for index, line in enumerate(lines):
+            sale = self._sales.get(str(line["product_id"]))
+            try:
+                if sale is None:
+                    raise InsufficientStock(0, str(line["product_id"]))  # the flash sale ended meanwhile
+                row = sale.admit(line["quantity"], line.get("sale_price"), line.get("sale_date"))
+            except InsufficientStock as e:
+                results.append({"index": index, "success": False, "error": str(e), "available": e.available})
+                continue
+            except ValueError as e:
+                results.append({"index": index, "success": False, "error": str(e)})
+                continue
+            rows.append((index, row))
+            results.append({"index": index, "success": True, "sale": row, "stock_quantity": sale.remaining})
+        if rows:
+            errors = await self._stored([row for _, row in rows])
+            for (index, _), error in zip(rows, errors):
+                if error is not None:
+                    results[index] = {"index": index, "success": False, "error": str(error)}
+        return results
+
+    async def _stored(self, rows):
+        """Queue admitted rows and wait until each is stored; returns None or the error for each row"""
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in rows]
+        self._waiting.extend(zip(rows, futures))
+        self._wakeup.set()
+        # shield: a buyer hanging up does not take an admitted sale back out of its batch
+        return await asyncio.shield(asyncio.gather(*futures, return_exceptions=True))
+
+    # ---------------- storing ----------------
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Store every admitted sale, batch by batch, retrying while the database is unavailable"""
+        retry = RETRY_DELAY
+        while self._waiting:
+            batch = self._waiting[:self.batch_size]
+            try:
+                await self.engine.insert_sales([row for row, _ in batch])
+            except Exception as e:
+                self.last_error = str(e)
+                if is_transient(e):
+                    # Units stay sold: the rows are resent under the same ids, which the database skips if it has them
+                    logger.warning("Storing %s flash sales failed, retrying in %.2fs: %s", len(batch), retry, e)
+                    await asyncio.sleep(retry)
+                    retry = min(retry * 2, MAX_RETRY_DELAY)
+                    continue
+                del self._waiting[:len(batch)]
+                await self._store_each(batch)
+                continue
+            del self._waiting[:len(batch)]
+            self.batches += 1
+            self.last_error = None
+            retry = RETRY_DELAY
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    async def _store_each(self, batch):
+        """Write a refused batch row by row, so only the sales the database rejects are failed"""
+        for position, (row, future) in enumerate(batch):
+            try:
+                await self.engine.insert_sales([row])
+            except Exception as e:
+                if is_transient(e):
+                    # Back in front of the queue; flush() retries them with the usual backoff
+                    self._waiting[:0] = batch[position:]
+                    return
+                await self._refused(row, e)
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            if not future.done():
+                future.set_result(None)
+
+    async def _refused(self, row, error):
+        """Give a refused sale's units back: to its counter, or to the row once the flash sale has ended"""
+        self.failed += 1
+        self.last_error = str(error)
+        product_id, quantity = row["product_id"], row["quantity_sold"]
+        logger.error("Flash sale %s for %s was refused by the database: %s", row["id"], product_id, error)
+        sale = self._sales.get(product_id)
+        if sale is not None:
+            sale.remaining += quantity
+            sale.sales -= 1
+            return
+        try:
+            await self.engine.adjust_product_stock(product_id, delta=quantity)
+        except Exception:
+            logger.exception("Could not return %s units of %s to its row", quantity, product_id)
+
+    async def stop(self, timeout=10.0):
+        """End every flash sale, store what was admitted and return the unsold units"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await asyncio.wait_for(self._close(), timeout)
+        except Exception:
+            held = {sale.sku or product_id: sale.remaining for product_id, sale in self._sales.items()}
+            logger.exception(
+                "Flash sales not closed cleanly: %s sales unstored, units still held %s",
+                len(self._waiting), held,
+            )
+
+    async def _close(self):
+        await self.flush()
+        for product_id in list(self._sales):
+            await self.end(product_id)
+
+    def stats(self):
+        return {
+            "sales": [sale.stats() for sale in self._sales.values()],
+            "waiting": len(self._waiting),
+            "batches": self.batches,
+            "failed": self.failed,
+            "last_error": self.last_error,
+        }
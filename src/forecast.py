@@ -0,0 +1,194 @@
+"""
+Per-SKU demand forecasts and reorder points.
+
+Daily demand comes from the sales_daily_product rollup (units per product per
+day), read in product order so each product's history arrives in one piece.
+Products are grouped into batches of BATCH_SIZE; each batch becomes a
+(products x days) NumPy matrix and is fitted in a worker process, so a
+catalog of 100k SKUs is spread over every core. The model is deliberately
+small - a day-of-week profile and an exponentially smoothed level, fitted
+for the whole batch at once - so one batch of thousands of SKUs takes
+milliseconds and the job is bound by reading the rollups.
+
+For each product:
+
+    forecast          expected units for each of the next HORIZON_DAYS days
+    lead_time_demand  expected units over the restocking lead time
+    safety_stock      SERVICE_Z x one-step-ahead error x sqrt(lead time)
+    reorder_point     ceil(lead_time_demand + safety_stock)
+
+run() stores the forecasts in product_forecasts and sets each product's
+min_stock_level to its reorder point, so the low-stock alert fires while
+there is still time to restock. Products without sales in the history
+window keep their current level.
+"""
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+HISTORY_DAYS = 84          # 12 whole weeks, so every weekday is seen equally often
+HORIZON_DAYS = 14
+DEFAULT_LEAD_TIME_DAYS = 7
+SERVICE_Z = 1.65           # ~95% chance of not running out during the lead time
+ALPHA = 0.2                # weight of the newest day in the smoothed level
+SEASON_PRIOR_WEEKS = 2     # pulls day-of-week factors toward 1 for products that rarely sell
+BATCH_SIZE = 2000          # products per worker task
+
+
+def history_window(days=HISTORY_DAYS, today=None):
+    """(since, until) ISO dates of the last ``days`` complete days (today is still partial)"""
+    if days < 7:
+        raise ValueError("the forecast history must cover at least 7 days")
+    today = today or datetime.now(timezone.utc).date()
+    until = today - timedelta(days=1)
+    return (until - timedelta(days=days - 1)).isoformat(), until.isoformat()
+
+
+def product_batches(pages, size=BATCH_SIZE):
+    """Regroup rollup pages ordered by product into lists of rows covering ``size`` whole products"""
+    batch, products, last = [], 0, None
+    for page in pages:
+        for row in page:
+            if row["product_id"] != last:
+                if products == size:
+                    yield batch
+                    batch, products = [], 0
+                products += 1
+                last = row["product_id"]
+            batch.append(row)
+    if batch:
+        yield batch
+
+
+def demand_matrix(rows, since, days, product_ids=None):
+    """(product_ids, units matrix of shape (products, days)) from sales_daily_product rows"""
+    if product_ids is None:
+        product_ids = list(dict.fromkeys(str(row["product_id"]) for row in rows))
+    index = {product_id: i for i, product_id in enumerate(product_ids)}
+    start = date.fromisoformat(since)
+    offsets = {}   # only ``days`` distinct dates, so parse each once
+    matrix = np.zeros((len(product_ids), days))
+    for row in rows:
+        day = str(row["day"])[:10]
+        offset = offsets.get(day)
+        if offset is None:
+            offset = offsets[day] = (date.fromisoformat(day) - start).days
+        if 0 <= offset < days:
+            matrix[index[str(row["product_id"])], offset] = row["units"]
+    return product_ids, matrix
+
+
+def fit(matrix, first_weekday):
+    """(level, weekday profile (products x 7), one-step-ahead error) for every row of ``matrix``"""
+    products, days = matrix.shape
+    weekdays = (first_weekday + np.arange(days)) % 7
+    by_weekday = np.stack([matrix[:, weekdays == w].mean(axis=1) for w in range(7)], axis=1)
+    overall = matrix.mean(axis=1, keepdims=True)
+    weeks = days / 7
+    shrunk = (weeks * by_weekday + SEASON_PRIOR_WEEKS * overall) / (weeks + SEASON_PRIOR_WEEKS)
+    profile = np.ones((products, 7))
+    np.divide(shrunk, overall, out=profile, where=overall > 0)
+    profile /= profile.mean(axis=1, keepdims=True)
+
+    season = profile[:, weekdays]
+    deseasoned = matrix / season
+    level = deseasoned[:, :7].mean(axis=1)
+    squared = np.zeros(products)
+    for t in range(7, days):
+        error = matrix[:, t] - level * season[:, t]
+        squared += error * error
+        level = ALPHA * deseasoned[:, t] + (1 - ALPHA) * level
+    sigma = np.sqrt(squared / max(days - 7, 1))
+    return level, profile, sigma
+
+
+def forecast_batch(product_ids, matrix, first_weekday, lead_time=DEFAULT_LEAD_TIME_DAYS, horizon=HORIZON_DAYS):
+    """Forecast rows for one batch; runs in a worker process"""
+    level, profile, sigma = fit(matrix, first_weekday)
+    days = matrix.shape[1]
+    ahead = (first_weekday + days + np.arange(max(horizon, lead_time))) % 7
+    daily = level[:, None] * profile[:, ahead]
+    lead_demand = daily[:, :lead_time].sum(axis=1)
+    safety = SERVICE_Z * sigma * math.sqrt(lead_time)
+    reorder = np.ceil(lead_demand + safety - 1e-9).astype(np.int64)
+    return [
+        {
+            "product_id": product_id,
+            "daily_demand": round(float(level[i]), 3),
+            "forecast": [round(float(units), 2) for units in daily[i, :horizon]],
+            "lead_time_days": lead_time,
+            "lead_time_demand": round(float(lead_demand[i]), 2),
+            "safety_stock": round(float(safety[i]), 2),
+            "reorder_point": int(reorder[i]),
+        }
+        for i, product_id in enumerate(product_ids)
+    ]
+
+
+def forecast_product(product_id, rows, history_days=HISTORY_DAYS, lead_time=DEFAULT_LEAD_TIME_DAYS, today=None):
+    """Forecast one product from its own rollup rows (an empty history forecasts zero demand)"""
+    since, until = history_window(history_days, today)
+    product_ids, matrix = demand_matrix(rows, since, history_days, [str(product_id)])
+    forecast = forecast_batch(product_ids, matrix, date.fromisoformat(since).weekday(), lead_time)[0]
+    return {**forecast, "history_start": since, "history_end": until}
+
+
+def run(engine, history_days=HISTORY_DAYS, lead_time=DEFAULT_LEAD_TIME_DAYS, workers=None, apply=True,
+        batch_size=BATCH_SIZE, today=None, dry_run=False):
+    """
+    Forecast every product with sales in the history window and save the
+    results through ``engine`` (a sync engine). With apply=False the
+    forecasts are stored but min_stock_level is left alone. With dry_run=True
+    nothing is written: the forecasts come back in "forecasts", each with the
+    product's sku and current min_stock_level, and thresholds_changed counts
+    the levels a real run would move.
+    Returns {"products", "thresholds_changed", "seconds"} (+ "forecasts").
+    """
+    started = time.perf_counter()
+    since, until = history_window(history_days, today)
+    first_weekday = date.fromisoformat(since).weekday()
+    workers = workers or int(os.getenv("FORECAST_WORKERS", 0)) or os.cpu_count() or 1
+    stats = {"products": 0, "thresholds_changed": 0}
+    if dry_run:
+        stats["forecasts"] = []
+
+    def save(forecasts):
+        for forecast in forecasts:
+            forecast.update(history_start=since, history_end=until)
+        if dry_run:
+            products = {str(p["id"]): p for p in engine.get_products_by_ids([f["product_id"] for f in forecasts])}
+            for forecast in forecasts:
+                product = products.get(forecast["product_id"], {})
+                forecast.update(sku=product.get("sku"), min_stock_level=product.get("min_stock_level"))
+            stats["products"] += len(forecasts)
+            stats["thresholds_changed"] += sum(f["reorder_point"] != f["min_stock_level"] for f in forecasts)
+            stats["forecasts"].extend(forecasts)
+            return
+        result = engine.save_forecasts(forecasts, apply)
+        stats["products"] += result["saved"]
+        stats["thresholds_changed"] += len(result["products"])
+
+    batches = (
+        demand_matrix(rows, since, history_days)
+        for rows in product_batches(engine.iter_daily_product_sales(since, until), batch_size)
+    )
+    if workers == 1:
+        for product_ids, matrix in batches:
+            save(forecast_batch(product_ids, matrix, first_weekday, lead_time))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for product_ids, matrix in batches:
+                pending.add(pool.submit(forecast_batch, product_ids, matrix, first_weekday, lead_time))
+                # Keep a bounded number of batches in flight while the rollups are still being read
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        save(future.result())
+            for future in wait(pending).done:
+                save(future.result())
+    return {**stats, "seconds": round(time.perf_counter() - started, 2)}
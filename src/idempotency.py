@@ -0,0 +1,100 @@
+"""
+Idempotency-Key store for the API's write endpoints.
+
+A client that times out and retries sends the same Idempotency-Key; the
+first request runs and its response is kept, the retry gets that response
+back without reaching the database. A retry that arrives while the first
+request is still running waits for it instead of running in parallel.
+
+Entries live in an OrderedDict in insertion order. Every entry has the same
+TTL, so insertion order is also expiry order: expired entries are popped from
+the front and, past ``max_size``, the oldest go first - O(1) amortised per
+request. The key is scoped to the endpoint and bound to a fingerprint of the
+request body; reusing it for a different request is an error. A request that
+raises or returns {"success": False} changed nothing and is forgotten, so a
+retry runs it again (the database may have been briefly unreachable).
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+DEFAULT_STORE_SIZE = 100000
+DEFAULT_STORE_TTL = 24 * 3600
+
+
+class KeyReused(Exception):
+    def __init__(self):
+        super().__init__("Idempotency-Key was already used for a different request")
+
+
+class IdempotencyStore:
+    def __init__(self, max_size=DEFAULT_STORE_SIZE, ttl=DEFAULT_STORE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (scope, key) -> (fingerprint, future, expires_at)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expire(self, now):
+        while self._entries:
+            scoped, (_, _, expires_at) = next(iter(self._entries.items()))
+            if expires_at >= now:
+                break
+            del self._entries[scoped]
+
+    async def run(self, scope, key, fingerprint, call):
+        """
+        Await ``call()`` once per (scope, key) and return its result; repeats
+        within the TTL return the same result. Returns (result, replayed).
+        """
+        if not key or not self.max_size:
+            return await call(), False
+        now = time.monotonic()
+        self._expire(now)
+        scoped = (scope, key)
+        entry = self._entries.get(scoped)
+        if entry is not None:
+            if entry[0] != fingerprint:
+                raise KeyReused()
+            self.hits += 1
+            # shield: a client hanging up on the retry must not cancel the original
+            return await asyncio.shield(entry[1]), True
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._entries[scoped] = (fingerprint, future, now + self.ttl)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        try:
+            result = await call()
+        except BaseException as e:
+            self._forget(scoped, future)
+            if isinstance(e, Exception):
+                future.set_exception(e)
+                future.exception()  # retrieved here, so no "never retrieved" warning without waiters
+            else:
+                future.cancel()
+            raise
+        if isinstance(result, dict) and result.get("success") is False:
+            self._forget(scoped, future)
+        future.set_result(result)
+        return result, False
+
+    def _forget(self, scoped, future):
+        entry = self._entries.get(scoped)
+        if entry is not None and entry[1] is future:
+            del self._entries[scoped]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,375 @@
+"""
+Write-behind mode for POST /sales/, enabled with SALES_JOURNAL=<path>.
+
+A sale is checked against an in-memory stock view, appended to a local
+append-only journal, fsync'd and acknowledged; the database is not on the
+checkout path. A background flusher sends journaled sales to the database in
+batches through record_sales_batch(), each under the id it was acknowledged
+with, then moves a checkpoint past them. After a crash the journal lines past
+the checkpoint are sent again; the database recognises sales it already has
+by id and skips them, so nothing is recorded twice.
+
+Files:
+
+    <path>              one JSON sale per line: seq, id, product_id, quantity, sale_price, sale_date
+    <path>.checkpoint   seq of the last flushed line, replaced atomically
+    <path>.rejected     journaled sales the database refused on flush
+
+The stock view assumes this process is the only one selling through its
+journal. It starts from the database stock of a product the first time the
+product is sold, follows writes made through the engine (StorageListener),
+and holds back the units still waiting in the journal. A sale the database
+refuses on flush (stock changed behind our back, product deleted) has already
+been acknowledged; it is logged and written to <path>.rejected for
+reconciliation.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from src.storage import ORDER_REFUSED, InsufficientStock, ProductNotFound
+from src.storage.observed import StorageListener
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 0.2   # seconds between flushes while sales are waiting
+FLUSH_BATCH = 500              # sales per record_sales_batch call
+COMPACT_BYTES = 1 << 20        # truncate the journal past this size once everything is flushed
+MAX_RETRY_DELAY = 30.0
+
+
+def _utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat(timespec="microseconds")
+
+
+def _write_atomic(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class SaleJournal:
+    """Append-only, fsync'd journal of acknowledged sales with a flushed-up-to checkpoint"""
+
+    def __init__(self, path):
+        self.path = path
+        self.checkpoint_path = path + ".checkpoint"
+        self.rejected_path = path + ".rejected"
+        self._lock = threading.Lock()
+        self.flushed_seq = self._read_checkpoint()
+        self.pending = self._replay()   # unflushed entries, oldest first
+        self.last_seq = max([self.flushed_seq, *(entry["seq"] for entry in self.pending)])
+        self._file = open(path, "ab")
+
+    def _read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _replay(self):
+        entries, intact = [], 0
+        try:
+            with open(self.path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    intact += len(line)
+                    if entry["seq"] > self.flushed_seq:
+                        entries.append(entry)
+        except FileNotFoundError:
+            return []
+        if intact < os.path.getsize(self.path):
+            # A crash mid-append left a torn line; it was never acknowledged
+            logger.warning("Dropping a torn write at the end of %s", self.path)
+            with open(self.path, "r+b") as f:
+                f.truncate(intact)
+                os.fsync(f.fileno())
+        return entries
+
+    def append(self, sales):
+        """Write sales and fsync them once; returns the journaled entries once they are durable"""
+        with self._lock:
+            entries = [{"seq": self.last_seq + i, **sale} for i, sale in enumerate(sales, 1)]
+            self._file.write(b"".join(json.dumps(entry).encode() + b"\n" for entry in entries))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.last_seq += len(entries)
+            self.pending.extend(entries)
+            return entries
+
+    def peek(self, limit):
+        with self._lock:
+            return self.pending[:limit]
+
+    def commit(self, seq, rejected=()):
+        """Mark every entry up to ``seq`` as flushed and record the ones the database refused"""
+        with self._lock:
+            if rejected:
+                with open(self.rejected_path, "a") as f:
+                    f.write("".join(json.dumps(entry) + "\n" for entry in rejected))
+                    f.flush()
+                    os.fsync(f.fileno())
+            _write_atomic(self.checkpoint_path, str(seq))
+            self.flushed_seq = seq
+            self.pending = [entry for entry in self.pending if entry["seq"] > seq]
+            # Checkpoint first, then truncate: a crash in between leaves only flushed lines
+            if not self.pending and self._file.tell() > COMPACT_BYTES:
+                self._file.truncate(0)
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class WriteBehindSales(StorageListener):
+    """Acknowledge sales from the journal and flush them to an async engine in the background"""
+
+    def __init__(self, engine, journal, interval=None, batch_size=FLUSH_BATCH):
+        self.engine = engine
+        self.journal = journal
+        self.interval = float(os.getenv("JOURNAL_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL)) if interval is None else interval
+        self.batch_size = batch_size
+        self._stock = {}   # product id -> stock in the database, as last seen
+        self._price = {}   # product id -> listed price
+        self._held = {}    # product id -> units journaled but not flushed yet
+        for entry in journal.pending:
+            self._hold(entry["product_id"], entry["quantity"])
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.flushed = 0
+        self.rejected = 0
+        self.last_error = None
+
+    def _hold(self, product_id, quantity):
+        self._held[product_id] = self._held.get(product_id, 0) + quantity
+
+    def available(self, product_id):
+        return self._stock[product_id] - self._held.get(product_id, 0)
+
+    # ---------------- checkout ----------------
+
+    async def _reserve(self, product_id, quantity):
+        """Hold ``quantity`` units of a product for a sale; returns the stock left, raises if short"""
+        if quantity <= 0:
+            raise ValueError("Quantity must be greater than 0")
+        if product_id not in self._stock:
+            product = await self.engine.get_product(product_id)
+            if product is None:
+                raise ProductNotFound(product_id)
+            self._stock.setdefault(product_id, product.get("stock_quantity") or 0)
+            self._price.setdefault(product_id, product.get("price"))
+        available = self.available(product_id)
+        if quantity > available:
+            raise InsufficientStock(max(available, 0), product_id)
+        # Held before the fsync await, so concurrent checkouts see these units as taken
+        self._hold(product_id, quantity)
+        return available - quantity
+
+    def _sale(self, product_id, quantity, sale_price, sale_date):
+        return {
+            "id": str(uuid.uuid4()),
+            "product_id": product_id,
+            "quantity": quantity,
+            "sale_price": sale_price if sale_price is not None else self._price.get(product_id),
+            "sale_date": sale_date or _utc_now(),
+        }
+
+    async def _journal(self, sales):
+        try:
+            await asyncio.to_thread(self.journal.append, sales)
+        except BaseException:
+            for sale in sales:
+                self._hold(sale["product_id"], -sale["quantity"])
+            raise
+        if len(self.journal.pending) >= self.batch_size:
+            self._wakeup.set()
+
+    @staticmethod
+    def _acknowledged(sale):
+        return {
+            "id": sale["id"],
+            "product_id": sale["product_id"],
+            "quantity_sold": sale["quantity"],
+            "sale_price": sale["sale_price"],
+            "sale_date": sale["sale_date"],
+        }
+
+    async def record(self, product_id, quantity, sale_price=None, sale_date=None):
+        """Validate and journal one sale; returns {"sale", "stock_quantity"} like engine.record_sale"""
+        product_id = str(product_id)
+        stock_quantity = await self._reserve(product_id, quantity)
+        sale = self._sale(product_id, quantity, sale_price, sale_date)
+        await self._journal([sale])
+        return {"sale": self._acknowledged(sale), "stock_quantity": stock_quantity}
+
+    async def record_batch(self, lines):
+        """Validate and journal many sales with one fsync; per-line results like engine.record_sales_batch"""
+        results, sales = [], []
+        for index, line in enumerate(lines):
+            product_id = str(line["product_id"])
+            try:
+                stock_quantity = await self._reserve(product_id, line["quantity"])
+            except InsufficientStock as e:
+                results.append({"index": index, "success": False, "error": str(e), "available": e.available})
+                continue
+            except (ProductNotFound, ValueError) as e:
+                results.append({"index": index, "success": False, "error": str(e)})
+                continue
+            sale = self._sale(product_id, line["quantity"], line.get("sale_price"), line.get("sale_date"))
+            sales.append(sale)
+            results.append({"index": index, "success": True, "sale": self._acknowledged(sale), "stock_quantity": stock_quantity})
+        if sales:
+            await self._journal(sales)
+        return results
+
+    async def record_order(self, lines):
+        """
+        Record an order straight to the database (engine.record_order), checked
+        against the stock view first: the order cannot take units the journal
+        has acknowledged, and its units are held until the database answers so
+        checkouts meanwhile cannot take them either.
+        """
+        results, held = [], []
+        try:
+            for index, line in enumerate(lines):
+                product_id = str(line["product_id"])
+                try:
+                    await self._reserve(product_id, line["quantity"])
+                except InsufficientStock as e:
+                    results.append({"index": index, "success": False, "error": str(e), "available": e.available})
+                    continue
+                except (ProductNotFound, ValueError) as e:
+                    results.append({"index": index, "success": False, "error": str(e)})
+                    continue
+                held.append((product_id, line["quantity"]))
+                results.append(None)
+            if len(held) < len(lines):
+                return {"order": None, "lines": [
+                    result or {"index": index, "success": False, "error": ORDER_REFUSED}
+                    for index, result in enumerate(results)
+                ]}
+            # The engine's stock_changed events move the stock view past the order before the units are released
+            return await self.engine.record_order(lines)
+        finally:
+            for product_id, quantity in held:
+                self._hold(product_id, -quantity)
+
+    # ---------------- flushing ----------------
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        retry = self.interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                while await self.flush():
+                    pass
+                self.last_error = None
+                retry = self.interval
+            except Exception as e:
+                # The database is unreachable or failing: keep everything journaled and back off
+                self.last_error = str(e)
+                logger.warning("Flushing the sale journal failed, retrying in %.1fs: %s", retry, e)
+                await asyncio.sleep(retry)
+                retry = min(retry * 2, MAX_RETRY_DELAY)
+
+    async def flush(self):
+        """Send the oldest batch of journaled sales to the database; returns how many were sent"""
+        batch = self.journal.peek(self.batch_size)
+        if not batch:
+            return 0
+        lines = [
+            {key: entry[key] for key in ("id", "product_id", "quantity", "sale_price", "sale_date")}
+            for entry in batch
+        ]
+        results = await self.engine.record_sales_batch(lines)
+        rejected, stock = [], {}
+        for entry, result in zip(batch, results):
+            product_id = entry["product_id"]
+            if result["success"]:
+                stock[product_id] = result["stock_quantity"]
+                continue
+            rejected.append({**entry, "error": result["error"]})
+            if "available" in result:
+                stock[product_id] = result["available"]
+            else:
+                stock[product_id] = None
+        await asyncio.to_thread(self.journal.commit, batch[-1]["seq"], rejected)
+
+        for entry in batch:
+            self._hold(entry["product_id"], -entry["quantity"])
+        for product_id, stock_quantity in stock.items():
+            if stock_quantity is None:
+                self._stock.pop(product_id, None)
+            elif product_id in self._stock:
+                self._stock[product_id] = stock_quantity
+        for entry in rejected:
+            logger.error("Journaled sale %s was refused by the database: %s", entry["id"], entry["error"])
+        self.flushed += len(batch) - len(rejected)
+        self.rejected += len(rejected)
+        return len(batch)
+
+    async def stop(self, timeout=10.0):
+        """Stop the flusher after one last attempt to drain the journal (anything left is replayed on start)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except Exception:
+            logger.exception("Sale journal not fully flushed; %s sales will be replayed", len(self.journal.pending))
+        self.journal.close()
+
+    async def _drain(self):
+        while await self.flush():
+            pass
+
+    def stats(self):
+        return {
+            "pending": len(self.journal.pending),
+            "last_seq": self.journal.last_seq,
+            "flushed_seq": self.journal.flushed_seq,
+            "flushed": self.flushed,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+        }
+
+    # ---------------- storage events ----------------
+
+    def products_changed(self, products):
+        for product in products:
+            product_id = str(product["id"])
+            if product_id in self._stock and "stock_quantity" in product:
+                self._stock[product_id] = product["stock_quantity"] or 0
+                self._price[product_id] = product.get("price", self._price.get(product_id))
+
+    def stock_changed(self, product_id, stock_quantity):
+        if str(product_id) in self._stock:
+            self._stock[str(product_id)] = stock_quantity
+
+    def product_removed(self, product_id):
+        self._stock.pop(str(product_id), None)
+        self._price.pop(str(product_id), None)
@@ -1,8 +1,9 @@
-from src.db import DatabaseManager
+from src.db import SupabaseDB
 
 class FlashInventory:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db=None):
+        # Shares the process-wide engine with every other SupabaseDB and the CLI managers
+        self.db = db or SupabaseDB()
 
     def add_product(self, name, sku, price, stock_quantity, category=None, description=None):
         if not name or not sku:
@@ -11,18 +12,29 @@ class FlashInventory:
             return {"success": False, "error": "Price must be > 0"}
         if stock_quantity < 0:
             return {"success": False, "error": "Invalid stock"}
-        return self.db.create_product(name, sku, price, stock_quantity, category, description)
+        data = {"name": name, "sku": sku, "price": price, "stock_quantity": stock_quantity}
+        if category is not None:
+            data["category"] = category
+        if description is not None:
+            data["description"] = description
+        return self.db.insert_product(data)
 
     def get_products(self):
         return self.db.get_all_products()
 
     def get_product_by_id(self, pid):
-        return self.db.get_product_by_id(pid)
+        return self.db.get_product(pid)
 
     def update_product(self, pid, **kwargs):
         if not kwargs:
             return {"success": False, "error": "No data to update"}
-        return self.db.update_product(pid, **kwargs)
+        if "name" in kwargs and not kwargs["name"] or "sku" in kwargs and not kwargs["sku"]:
+            return {"success": False, "error": "Name and SKU are required"}
+        if "price" in kwargs and kwargs["price"] <= 0:
+            return {"success": False, "error": "Price must be > 0"}
+        if "stock_quantity" in kwargs and kwargs["stock_quantity"] < 0:
+            return {"success": False, "error": "Invalid stock"}
+        return self.db.update_product(pid, kwargs)
 
     def delete_product(self, pid):
         return self.db.delete_product(pid)
@@ -0,0 +1,131 @@
+"""
+Maintained set of products below their min_stock_level.
+
+LowStockMonitor is a StorageListener: once seeded it follows stock changes
+from the engine's events, so "which products are low" and "how many" cost
+O(result) instead of a catalog scan. Handlers registered with on_low_stock()
+fire once when a product drops below its threshold, and are re-armed when
+the product is restocked to the threshold or above.
+"""
+import logging
+import threading
+
+from src.storage.observed import StorageListener
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_STOCK_LEVEL = 5
+
+
+def is_low(stock_quantity, min_stock_level):
+    return (stock_quantity or 0) < (DEFAULT_MIN_STOCK_LEVEL if min_stock_level is None else min_stock_level)
+
+
+class LowStockMonitor(StorageListener):
+    def __init__(self, lookup=None):
+        # lookup(product_id) -> row or None, for thresholds of products not seen yet
+        self.lookup = lookup
+        self._levels = {}   # product id -> min_stock_level of every product seen
+        self._low = {}      # product id -> stock_quantity, for products below their level
+        self._handlers = []
+        self._lock = threading.RLock()
+        self.ready = False
+
+    def __len__(self):
+        return len(self._low)
+
+    def __contains__(self, product_id):
+        return str(product_id) in self._low
+
+    def on_low_stock(self, handler):
+        """Call handler(product_id, stock_quantity, min_stock_level) when a product drops below its level"""
+        self._handlers.append(handler)
+        return handler
+
+    # ---------------- seeding ----------------
+
+    def seed(self, low_products):
+        """Start from the engine's list_low_stock(); other thresholds are looked up when needed"""
+        with self._lock:
+            self._track(low_products)
+            self.ready = True
+        return self
+
+    def load(self, pages):
+        """Track every product from an iterable of product pages (e.g. engine.iter_products())"""
+        with self._lock:
+            for page in pages:
+                self._track(page)
+            self.ready = True
+        return self
+
+    async def load_async(self, pages):
+        """load() for async engines' iter_products()"""
+        async for page in pages:
+            self.track(page)
+        self.ready = True
+        return self
+
+    def track(self, products):
+        with self._lock:
+            self._track(products)
+
+    def _track(self, products):
+        for product in products:
+            product_id = str(product["id"])
+            self._levels[product_id] = product.get("min_stock_level")
+            if is_low(product.get("stock_quantity"), product.get("min_stock_level")):
+                self._low[product_id] = product.get("stock_quantity") or 0
+            else:
+                self._low.pop(product_id, None)
+
+    # ---------------- queries ----------------
+
+    def low_stock(self):
+        """[(product_id, stock_quantity, min_stock_level)] lowest stock first"""
+        with self._lock:
+            return sorted(
+                ((product_id, stock, self._levels.get(product_id)) for product_id, stock in self._low.items()),
+                key=lambda item: item[1],
+            )
+
+    # ---------------- storage events ----------------
+
+    def products_changed(self, products):
+        for product in products:
+            if "stock_quantity" in product:
+                self._update(str(product["id"]), product["stock_quantity"], product.get("min_stock_level"))
+
+    def stock_changed(self, product_id, stock_quantity):
+        product_id = str(product_id)
+        if product_id not in self._levels and self.lookup is not None:
+            try:
+                product = self.lookup(product_id)
+            except Exception:
+                logger.exception("Low-stock threshold lookup failed for %s", product_id)
+                return
+            if product is None:
+                return
+            self._levels[product_id] = product.get("min_stock_level")
+        if product_id in self._levels:
+            self._update(product_id, stock_quantity, self._levels[product_id])
+
+    def product_removed(self, product_id):
+        with self._lock:
+            self._levels.pop(str(product_id), None)
+            self._low.pop(str(product_id), None)
+
+    def _update(self, product_id, stock_quantity, min_stock_level):
+        with self._lock:
+            self._levels[product_id] = min_stock_level
+            was_low = product_id in self._low
+            if not is_low(stock_quantity, min_stock_level):
+                self._low.pop(product_id, None)
+                return
+            self._low[product_id] = stock_quantity
+        if not was_low:
+            for handler in self._handlers:
+                try:
+                    handler(product_id, stock_quantity, min_stock_level)
+                except Exception:
+                    logger.exception("Low-stock handler %r failed", handler)
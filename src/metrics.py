@@ -0,0 +1,260 @@
+"""
+In-process metrics for the API, exposed in the Prometheus text format at
+GET /metrics.
+
+    http_request_duration_seconds{method, route, status}   latency per route
+    http_request_size_bytes / http_response_size_bytes      payload sizes per route
+    http_request_db_calls{route} / http_request_db_rows     round trips and rows per request
+    http_app_errors_total{route}                            {"success": false} answers
+    db_call_duration_seconds{method}                        latency per engine method
+    db_rows{method}                                         rows returned per engine method
+    db_errors_total{method, error}                          engine calls that raised
+
+Engine calls are timed by src/storage/instrumented.py and attributed to the
+request they ran for through a context variable, so background work (view
+loading, the journal flusher) is counted per method only. Gauges for the
+catalog cache and the other in-process views are read from their stats()
+when /metrics is scraped. Recording is a bisect and a few additions under a
+lock, a microsecond or two against a millisecond-scale database round trip,
+and there is no dependency on prometheus_client.
+
+MetricsMiddleware also adds a Server-Timing header (app and db durations,
+shown in browser dev tools) when SERVER_TIMING is set.
+"""
+import bisect
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def lines(self):
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [count per bucket (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def lines(self):
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        names = self.labels + ("le",)
+        for label_values, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                labels = _format_labels(names, (*label_values, _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, collect):
+        """
+        Register ``collect()`` to be called at scrape time; it returns
+        [(name, help, labels dict, value)] gauge samples. Returns a function
+        that removes it again.
+        """
+        self._collectors.append(collect)
+        return lambda: self._collectors.remove(collect) if collect in self._collectors else None
+
+    def render(self):
+        out = []
+        for metric in self._metrics:
+            out.append(f"# HELP {metric.name} {metric.help}")
+            out.append(f"# TYPE {metric.name} {metric.kind}")
+            out.extend(metric.lines())
+        gauges = {}
+        for collect in list(self._collectors):
+            for name, help, labels, value in collect():
+                gauges.setdefault(name, (help, []))[1].append((labels, value))
+        for name, (help, samples) in gauges.items():
+            out.append(f"# HELP {name} {help}")
+            out.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                out.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}")
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to answer a request", ("method", "route", "status"))
+REQUEST_BYTES = REGISTRY.histogram(
+    "http_request_size_bytes", "Request body size", ("route",), SIZE_BUCKETS)
+RESPONSE_BYTES = REGISTRY.histogram(
+    "http_response_size_bytes", "Response body size", ("route",), SIZE_BUCKETS)
+REQUEST_DB_CALLS = REGISTRY.histogram(
+    "http_request_db_calls", "Database round trips made for one request", ("route",), COUNT_BUCKETS)
+REQUEST_DB_ROWS = REGISTRY.histogram(
+    "http_request_db_rows", "Rows read or written for one request", ("route",), ROW_BUCKETS)
+APP_ERRORS = REGISTRY.counter(
+    "http_app_errors_total", 'Requests answered with {"success": false}', ("route",))
+DB_SECONDS = REGISTRY.histogram(
+    "db_call_duration_seconds", "Time spent in one storage engine call", ("method",))
+DB_ROWS = REGISTRY.histogram(
+    "db_rows", "Rows returned by one storage engine call", ("method",), ROW_BUCKETS)
+DB_ERRORS = REGISTRY.counter(
+    "db_errors_total", "Storage engine calls that raised", ("method", "error"))
+
+
+class RequestStats:
+    """Database work done on behalf of the current request"""
+
+    __slots__ = ("db_calls", "db_rows", "db_seconds")
+
+    def __init__(self):
+        self.db_calls = 0
+        self.db_rows = 0
+        self.db_seconds = 0.0
+
+
+_current = ContextVar("request_stats", default=None)
+
+
+def record_db_call(method, seconds, rows=0, error=None):
+    """Account one engine call to the method's metrics and to the current request, if any"""
+    DB_SECONDS.observe(seconds, method)
+    if error is None:
+        DB_ROWS.observe(rows, method)
+    else:
+        DB_ERRORS.inc(method, error)
+    stats = _current.get()
+    if stats is not None:
+        stats.db_calls += 1
+        stats.db_rows += rows
+        stats.db_seconds += seconds
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request (routes are labelled by their path template)"""
+
+    def __init__(self, app, server_timing=None):
+        self.app = app
+        self.server_timing = bool(os.getenv("SERVER_TIMING")) if server_timing is None else server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        stats = RequestStats()
+        token = _current.set(stats)
+        sizes = {"request": 0, "response": 0}
+        status = {"code": 500, "json": False, "checked": False}
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["request"] += len(message.get("body", b""))
+            return message
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = message.get("headers", [])
+                status["json"] = any(
+                    name == b"content-type" and value.startswith(b"application/json") for name, value in headers
+                )
+                if self.server_timing:
+                    app_ms = (time.perf_counter() - started) * 1000
+                    timing = f'app;dur={app_ms:.1f}, db;dur={stats.db_seconds * 1000:.1f};desc="{stats.db_calls} calls"'
+                    message = {**message, "headers": [*headers, (b"server-timing", timing.encode())]}
+            elif message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                sizes["response"] += len(body)
+                if status["json"] and not status["checked"] and body:
+                    # The data layers answer failures as {"success": false, ...}
+                    status["checked"] = True
+                    if body.startswith(b'{"success":false'):
+                        APP_ERRORS.inc(_route(scope))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, timed_send)
+        finally:
+            _current.reset(token)
+            route = _route(scope)
+            REQUEST_SECONDS.observe(time.perf_counter() - started, scope["method"], route, status["code"])
+            REQUEST_BYTES.observe(sizes["request"], route)
+            RESPONSE_BYTES.observe(sizes["response"], route)
+            REQUEST_DB_CALLS.observe(stats.db_calls, route)
+            REQUEST_DB_ROWS.observe(stats.db_rows, route)
+
+
+def _route(scope):
+    # The template, not the raw path, so product ids do not become label values
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
@@ -0,0 +1,60 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is the sort key of the last row on a page - (name, id) for products,
+(sale_date, id) for sales - encoded as opaque URL-safe text, so each page is
+an index seek instead of an OFFSET scan.
+"""
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+PRODUCT_KEY = ("name", "id")
+SALE_KEY = ("sale_date", "id")
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, size=2):
+    """Return the key tuple stored in a cursor (None for the first page); raises ValueError"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return tuple(values)
+
+
+def _clamp(limit):
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def _split(rows, key, limit):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1][column] for column in key)
+
+
+def fetch_page(fetch, key, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    Run fetch(limit + 1, after) and split the result into (rows, next_cursor).
+    The extra row only tells us whether another page exists.
+    """
+    limit = _clamp(limit)
+    return _split(fetch(limit + 1, decode_cursor(cursor, len(key))), key, limit)
+
+
+async def fetch_page_async(fetch, key, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """fetch_page for async engines"""
+    limit = _clamp(limit)
+    return _split(await fetch(limit + 1, decode_cursor(cursor, len(key))), key, limit)
@@ -0,0 +1,146 @@
+"""
+Gross profit, margin and ROI from the cost-aware sales rollups.
+
+Each sale is stamped with its product's cost_price when it is recorded, and
+the rollup triggers add up cost and costed_revenue (the revenue of sales with
+a known cost) next to revenue, so profit is kept current sale by sale. A
+report reads the rollup rows in its window - one per day, or per day and
+product - and joins the per-product totals against the products once,
+vectorised, to label them and group them by category.
+
+    gross_profit  = costed_revenue - cost
+    margin        = gross_profit / costed_revenue
+    roi           = gross_profit / cost
+    cost_coverage = costed_revenue / revenue
+
+Sales of products without a cost_price count toward revenue only;
+cost_coverage says how much of the revenue the profit figures rest on.
+"""
+import numpy as np
+import pandas as pd
+
+from src.analytics import BUCKETS, bucket_range, bucket_start
+
+GROUPS = ("product", "category", *BUCKETS)
+RANKINGS = ("gross_profit", "margin", "roi", "revenue")
+DEFAULT_LIMIT = 50
+UNCATEGORISED = "Uncategorised"
+
+_MEASURES = ["sale_count", "units", "revenue", "cost", "costed_revenue"]
+_MONEY = ["revenue", "cost", "costed_revenue", "gross_profit"]
+_RATIOS = ["margin", "roi", "cost_coverage"]
+
+
+def _ratio(numerator, denominator):
+    """Element-wise numerator / denominator, NaN where the denominator is 0"""
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    out = np.full(numerator.shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def with_ratios(totals):
+    """Add gross_profit, margin, roi and cost_coverage to a frame of summed measures"""
+    totals = totals.copy()
+    totals["gross_profit"] = totals["costed_revenue"] - totals["cost"]
+    totals["margin"] = _ratio(totals["gross_profit"], totals["costed_revenue"])
+    totals["roi"] = _ratio(totals["gross_profit"], totals["cost"])
+    totals["cost_coverage"] = _ratio(totals["costed_revenue"], totals["revenue"])
+    return totals
+
+
+def _records(frame, labels):
+    """JSON-ready rows: counts as ints, money rounded to cents, ratios to 4 places, NaN as None"""
+    columns = {label: frame[label].tolist() for label in labels}
+    columns["sale_count"] = frame["sale_count"].astype(np.int64).tolist()
+    columns["units"] = frame["units"].astype(np.int64).tolist()
+    for name in _MONEY:
+        columns[name] = frame[name].round(2).tolist()
+    for name in _RATIOS:
+        columns[name] = [None if np.isnan(value) else value for value in frame[name].round(4).tolist()]
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def sold_products(frame):
+    """Ids of the products with sales in a frame, for engine.get_products_by_ids()"""
+    return frame["product_id"].astype(str).unique().tolist()
+
+
+def product_frame(products):
+    """product_id, name, sku, category for a list of product rows"""
+    df = pd.DataFrame.from_records(products or [], columns=["id", "name", "sku", "category"])
+    category = df["category"].where(df["category"].notna() & (df["category"] != ""), UNCATEGORISED)
+    return pd.DataFrame({
+        "product_id": df["id"].astype(str),
+        "name": df["name"],
+        "sku": df["sku"],
+        "category": category,
+    })
+
+
+def _per_product(frame, products):
+    """Per-product totals joined with the product attributes (one merge for the whole window)"""
+    totals = frame.groupby(frame["product_id"].astype(str))[_MEASURES].sum().reset_index()
+    joined = totals.merge(product_frame(products), on="product_id", how="left")
+    joined["category"] = joined["category"].fillna(UNCATEGORISED)
+    return joined
+
+
+def _ranked(totals, by, n):
+    if by not in RANKINGS:
+        raise ValueError(f"by must be one of: {', '.join(RANKINGS)}")
+    ranked = totals.sort_values(by, ascending=False, na_position="last", kind="stable")
+    return ranked if n is None else ranked.head(n)
+
+
+def totals(frame):
+    """Profit figures for a whole frame"""
+    summed = pd.DataFrame([frame[_MEASURES].sum()])
+    return _records(with_ratios(summed), [])[0]
+
+
+def by_product(frame, products, n=DEFAULT_LIMIT, by="gross_profit"):
+    """[{"product_id", "name", "sku", "category", measures...}] best first"""
+    ranked = _ranked(with_ratios(_per_product(frame, products)), by, n)
+    return _records(ranked, ["product_id", "name", "sku", "category"])
+
+
+def by_category(frame, products, n=DEFAULT_LIMIT, by="gross_profit"):
+    """[{"category", measures...}] best first; products without a category share one group"""
+    summed = _per_product(frame, products).groupby("category")[_MEASURES].sum().reset_index()
+    return _records(_ranked(with_ratios(summed), by, n), ["category"])
+
+
+def series(frame, bucket, start=None, end=None):
+    """[{"bucket", measures...}] per bucket, oldest first; empty buckets in [start, end) are zero-filled"""
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of: {', '.join(BUCKETS)}")
+    summed = frame[_MEASURES].groupby(bucket_start(frame["ts"], bucket)).sum()
+    if start is not None and end is not None:
+        summed = summed.reindex(bucket_range(start, end, bucket).union(summed.index), fill_value=0)
+    summed = with_ratios(summed)
+    summed["bucket"] = [ts.isoformat() for ts in summed.index]
+    return _records(summed, ["bucket"])
+
+
+def source(group):
+    """Which rows a grouping is computed from: "sales" (raw, hourly), "daily" or "daily_product" rollups"""
+    if group not in GROUPS:
+        raise ValueError(f"group must be one of: {', '.join(GROUPS)}")
+    if group == "hour":
+        return "sales"
+    return "daily" if group in BUCKETS else "daily_product"
+
+
+def profit_report(frame, group, products=None, n=DEFAULT_LIMIT, by="gross_profit", start=None, end=None):
+    """{"group", "totals", "rows"} for one grouping; ``products`` are needed for product/category"""
+    if group not in GROUPS:
+        raise ValueError(f"group must be one of: {', '.join(GROUPS)}")
+    if group == "product":
+        rows = by_product(frame, products, n, by)
+    elif group == "category":
+        rows = by_category(frame, products, n, by)
+    else:
+        rows = series(frame, group, start, end)
+    return {"group": group, "totals": totals(frame), "rows": rows}
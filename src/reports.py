@@ -0,0 +1,157 @@
+"""
+Sales reports built from the daily rollup tables (sales_daily and
+sales_daily_product) instead of the raw sales, so a report costs one row per
+day (or per day and product) in its window however many sales there were.
+
+The dashboard summary is read in one engine call and kept in a SummaryCache
+for DASHBOARD_CACHE_TTL seconds (default 5); any write through the engine
+drops it sooner. The CLI also keeps the last summary in DASHBOARD_FILE (a
+SavedSummary) so its first screen is drawn before it has connected.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from src.storage.observed import StorageListener
+
+DASHBOARD_DAYS = 7
+DEFAULT_SUMMARY_TTL = 5.0
+DEFAULT_SUMMARY_FILE = "flash_inventory_dashboard.json"
+
+
+def report_window(days, today=None):
+    """(since, until) ISO dates for the last ``days`` calendar days, today included (UTC, like sale_date)"""
+    if days < 1:
+        raise ValueError("days must be at least 1")
+    today = today or datetime.now(timezone.utc).date()
+    return (today - timedelta(days=days - 1)).isoformat(), today.isoformat()
+
+
+def sales_report(days, daily, since=None):
+    """Totals for a window from its sales_daily rows"""
+    total_sales = sum(row["sale_count"] for row in daily)
+    total_revenue = sum(float(row["revenue"]) for row in daily)
+    # Profit only counts sales whose cost is known (see src/profit.py)
+    costed_revenue = sum(float(row.get("costed_revenue") or 0) for row in daily)
+    total_cost = sum(float(row.get("cost") or 0) for row in daily)
+    return {
+        "period_days": days,
+        "start_date": since,
+        "total_sales": total_sales,
+        "total_revenue": total_revenue,
+        "total_items_sold": sum(row["units"] for row in daily),
+        "average_sale_value": total_revenue / total_sales if total_sales else 0,
+        "total_cost": total_cost,
+        "gross_profit": costed_revenue - total_cost,
+        "gross_margin": (costed_revenue - total_cost) / costed_revenue if costed_revenue else None,
+        "daily": [
+            {"day": str(row["day"]), "sale_count": row["sale_count"], "units": row["units"], "revenue": float(row["revenue"])}
+            for row in daily
+        ],
+    }
+
+
+def product_totals(rows, limit=None):
+    """Collapse sales_daily_product rows into per-product totals, best revenue first"""
+    totals = defaultdict(lambda: {"sale_count": 0, "units": 0, "revenue": 0.0})
+    for row in rows:
+        total = totals[str(row["product_id"])]
+        total["sale_count"] += row["sale_count"]
+        total["units"] += row["units"]
+        total["revenue"] += float(row["revenue"])
+    ranked = sorted(totals.items(), key=lambda item: item[1]["revenue"], reverse=True)
+    if limit is not None:
+        ranked = ranked[:limit]
+    return [{"product_id": product_id, **total} for product_id, total in ranked]
+
+
+def dashboard_summary(counts, days=DASHBOARD_DAYS, since=None):
+    """Shape an engine dashboard_summary() row for display"""
+    return {
+        "total_products": counts["total_products"],
+        "low_stock_count": counts["low_stock_count"],
+        "period_days": days,
+        "start_date": since,
+        "recent_sales": counts["sale_count"],
+        "recent_items_sold": counts["units"],
+        "recent_revenue": float(counts["revenue"]),
+    }
+
+
+class SummaryCache(StorageListener):
+    """Holds one computed summary until it expires or the engine reports a write"""
+
+    def __init__(self, ttl=None):
+        self.ttl = float(os.getenv("DASHBOARD_CACHE_TTL", DEFAULT_SUMMARY_TTL)) if ttl is None else ttl
+        self._value = None
+        self._expires = 0.0
+        self.generation = 0   # bumped by every write
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._value is not None and time.monotonic() < self._expires:
+                return self._value
+            return None
+
+    def put(self, value, generation):
+        """Store a summary computed when ``generation`` was current, unless a write happened since"""
+        with self._lock:
+            if generation == self.generation:
+                self._value = value
+                self._expires = time.monotonic() + self.ttl
+
+    def invalidate(self, *args):
+        with self._lock:
+            self._value = None
+            self.generation += 1
+
+    products_changed = stock_changed = product_removed = sales_recorded = invalidate
+
+
+class SavedSummary:
+    """
+    The last dashboard summary on disk, tagged with the database it was read
+    from (a summary of another database is never shown). Only a cache: failing
+    to read or write it is ignored.
+    """
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = source
+
+    @classmethod
+    def from_env(cls, source):
+        return cls(os.getenv("DASHBOARD_FILE", DEFAULT_SUMMARY_FILE), source)
+
+    def load(self):
+        """(summary, saved_at ISO timestamp), or (None, None) if there is none for this database"""
+        if not self.path:
+            return None, None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None, None
+        if not isinstance(saved, dict) or saved.get("source") != self.source:
+            return None, None
+        return saved.get("summary"), saved.get("saved_at")
+
+    def save(self, summary):
+        if not self.path:
+            return
+        saved = {
+            "source": self.source,
+            "saved_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "summary": summary,
+        }
+        partial = self.path + ".partial"
+        try:
+            with open(partial, "w", encoding="utf-8") as f:
+                json.dump(saved, f)
+            os.replace(partial, self.path)
+        except OSError:
+            pass
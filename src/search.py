@@ -0,0 +1,325 @@
+"""
+In-memory product search index.
+
+Products are tokenised (name, SKU, category, description) into an inverted
+index: token -> product ids, per field. Query tokens are matched against a
+sorted vocabulary, so a prefix lookup is a binary search instead of a scan,
+and misspelt tokens fall back to vocabulary words that share trigrams with
+them. Results are ranked by field weight and match quality and the top-k are
+returned with heapq, so a search touches only the matching postings.
+
+The index is a StorageListener: subscribe it to the engine and it follows
+every product write made through this process. Writes made elsewhere (the
+CLI, imports, the forecast job, other API workers) only reach it when it is
+loaded again: the owner re-scans the catalog once the products table version
+has moved and the index is older than ``refresh_interval`` seconds.
+"""
+import bisect
+import heapq
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+from src.storage.observed import StorageListener
+
+FIELD_WEIGHTS = {"sku": 3.0, "name": 2.0, "category": 1.0, "description": 0.5}
+DOC_FIELDS = ("id", "name", "sku", "price", "stock_quantity", "min_stock_level", "category")
+
+EXACT, PREFIX, FUZZY = 1.0, 0.7, 0.4
+MIN_PREFIX_LENGTH = 2
+MAX_EXPANSIONS = 200     # vocabulary words one query token may expand to
+MIN_SIMILARITY = 0.4     # trigram Dice coefficient for a typo match
+DEFAULT_LIMIT = 20
+DEFAULT_REFRESH_INTERVAL = 60   # seconds; 0 never re-scans
+
+_TOKEN = re.compile(r"[0-9a-z]+")
+
+
+def tokenize(text):
+    return _TOKEN.findall(str(text or "").lower())
+
+
+def _trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ProductSearchIndex(StorageListener):
+    def __init__(self, refresh_interval=None):
+        self._docs = {}                                   # id -> display fields
+        self._doc_tokens = {}                             # id -> {(field, token)}
+        self._postings = defaultdict(lambda: defaultdict(set))   # token -> field -> ids
+        self._token_docs = defaultdict(set)               # token -> ids (any field)
+        self._vocab = []                                  # sorted tokens
+        self._trigram_index = defaultdict(set)            # trigram -> tokens
+        self._sku_to_id = {}
+        self._lock = threading.RLock()
+        self.ready = False
+        self.refresh_interval = (float(os.getenv("SEARCH_INDEX_REFRESH", DEFAULT_REFRESH_INTERVAL))
+                                 if refresh_interval is None else refresh_interval)
+        self.version = None       # products table version the last load started from
+        self.loaded_at = None     # time.monotonic() when the last load finished
+        self.loads = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    # ---------------- building / maintenance ----------------
+
+    def load(self, pages, version=None):
+        """
+        Bulk-load from an iterable of product pages (e.g. engine.iter_products()).
+        Loading again refreshes the index: products the scan no longer returns
+        are dropped. ``version`` is the products table version read before the scan.
+        """
+        with self._lock:
+            before, seen = set(self._docs), set()
+            for page in pages:
+                for product in page:
+                    self.add(product, _bulk=True)
+                    seen.add(str(product["id"]))
+            self._finish_load(before - seen, version)
+        return self
+
+    async def load_async(self, pages, version=None):
+        """load() for async engines' iter_products(); searches keep working between pages"""
+        with self._lock:
+            before, seen = set(self._docs), set()
+        async for page in pages:
+            with self._lock:
+                for product in page:
+                    self.add(product, _bulk=True)
+                    seen.add(str(product["id"]))
+        with self._lock:
+            self._finish_load(before - seen, version)
+        return self
+
+    def _finish_load(self, gone, version):
+        # Products added by write events during the scan were not in the index before it, so they stay
+        for product_id in gone:
+            self._unindex(product_id)
+        self._rebuild_vocab()
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.loads += 1
+
+    def age(self):
+        """Seconds since the last load finished, or None before the first"""
+        return None if self.loaded_at is None else time.monotonic() - self.loaded_at
+
+    def stale(self, version):
+        """
+        True if it is time to re-scan: the products table moved since the last
+        load (or its version is unknown) and the load is ``refresh_interval`` old
+        """
+        if not self.ready or not self.refresh_interval:
+            return False
+        return (version is None or version != self.version) and self.age() >= self.refresh_interval
+
+    def stats(self):
+        age = self.age()
+        return {
+            "ready": self.ready,
+            "size": len(self._docs),
+            "version": self.version,
+            "age_seconds": None if age is None else round(age, 1),
+            "refresh_interval": self.refresh_interval,
+            "loads": self.loads,
+        }
+
+    def _rebuild_vocab(self):
+        # Sorting once is far cheaper than keeping the list sorted during a bulk load
+        self._vocab = sorted(self._postings)
+        self._trigram_index.clear()
+        for token in self._vocab:
+            for gram in _trigrams(token):
+                self._trigram_index[gram].add(token)
+        self.ready = True
+
+    def add(self, product, _bulk=False):
+        """Index a product, replacing any previous version of it"""
+        product_id = str(product["id"])
+        tokens = set()
+        for field in FIELD_WEIGHTS:
+            for token in tokenize(product.get(field)):
+                tokens.add((field, token))
+        with self._lock:
+            self._unindex(product_id)
+            self._docs[product_id] = {key: product.get(key) for key in DOC_FIELDS}
+            self._doc_tokens[product_id] = tokens
+            if product.get("sku"):
+                self._sku_to_id[str(product["sku"]).lower()] = product_id
+            for field, token in tokens:
+                if token not in self._postings and not _bulk:
+                    self._add_word(token)
+                self._postings[token][field].add(product_id)
+                self._token_docs[token].add(product_id)
+
+    def remove(self, product_id):
+        with self._lock:
+            self._unindex(str(product_id))
+
+    def _add_word(self, token):
+        bisect.insort(self._vocab, token)
+        for gram in _trigrams(token):
+            self._trigram_index[gram].add(token)
+
+    def _drop_word(self, token):
+        del self._postings[token]
+        self._token_docs.pop(token, None)
+        i = bisect.bisect_left(self._vocab, token)
+        if i < len(self._vocab) and self._vocab[i] == token:
+            del self._vocab[i]
+        for gram in _trigrams(token):
+            words = self._trigram_index.get(gram)
+            if words is not None:
+                words.discard(token)
+                if not words:
+                    del self._trigram_index[gram]
+
+    def _unindex(self, product_id):
+        doc = self._docs.pop(product_id, None)
+        if doc is None:
+            return
+        if doc.get("sku") and self._sku_to_id.get(str(doc["sku"]).lower()) == product_id:
+            del self._sku_to_id[str(doc["sku"]).lower()]
+        for field, token in self._doc_tokens.pop(product_id, ()):
+            fields = self._postings.get(token)
+            if fields is None:
+                continue
+            fields[field].discard(product_id)
+            if not fields[field]:
+                del fields[field]
+            if not fields:
+                self._drop_word(token)
+            elif not any(product_id in ids for ids in fields.values()):
+                self._token_docs[token].discard(product_id)
+
+    # Storage events
+    def products_changed(self, products):
+        for product in products:
+            self.add(product)
+
+    def stock_changed(self, product_id, stock_quantity):
+        with self._lock:
+            doc = self._docs.get(str(product_id))
+            if doc is not None:
+                doc["stock_quantity"] = stock_quantity
+
+    def product_removed(self, product_id):
+        self.remove(product_id)
+
+    # ---------------- querying ----------------
+
+    def _expand(self, token):
+        """Vocabulary words matching a query token, with a match-quality factor"""
+        matches = {}
+        if token in self._postings:
+            matches[token] = EXACT
+        if len(token) >= MIN_PREFIX_LENGTH:
+            i = bisect.bisect_left(self._vocab, token)
+            while i < len(self._vocab) and len(matches) < MAX_EXPANSIONS:
+                word = self._vocab[i]
+                if not word.startswith(token):
+                    break
+                matches.setdefault(word, PREFIX * len(token) / len(word))
+                i += 1
+        if not matches and len(token) >= 3:
+            grams = _trigrams(token)
+            counts = defaultdict(int)
+            for gram in grams:
+                for word in self._trigram_index.get(gram, ()):
+                    counts[word] += 1
+            for word, shared in heapq.nlargest(MAX_EXPANSIONS, counts.items(), key=lambda item: item[1]):
+                similarity = 2 * shared / (len(grams) + len(_trigrams(word)))
+                if similarity >= MIN_SIMILARITY:
+                    matches[word] = FUZZY * similarity
+        return matches
+
+    def _matches(self, token):
+        """
+        For one query token: (weight, ids) for each posting list it hits, best
+        first, and the per-word sets of products it matches (shared, read only)
+        """
+        words = self._expand(token)
+        lists = [
+            (FIELD_WEIGHTS[field] * quality, ids)
+            for word, quality in words.items()
+            for field, ids in self._postings[word].items()
+        ]
+        lists.sort(key=lambda item: -item[0])
+        return lists, [self._token_docs[word] for word in words]
+
+    @staticmethod
+    def _probe(product_id, lists):
+        """Best weight among a token's posting lists containing the product, or None"""
+        for weight, ids in lists:
+            if product_id in ids:
+                return weight
+        return None
+
+    def _score(self, product_id, matches):
+        total = 0.0
+        for lists in matches:
+            weight = self._probe(product_id, lists)
+            if weight is None:
+                return None
+            total += weight
+        return total
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Top ``limit`` products for ``query``; every query token must match"""
+        tokens = tokenize(query)
+        if not tokens or limit <= 0:
+            return []
+        with self._lock:
+            matches = [self._matches(token) for token in dict.fromkeys(tokens)]
+            if not all(doc_sets for _, doc_sets in matches):
+                return []
+
+            # Candidates are the products matching every token. Start from the
+            # most selective token and narrow with C-level set intersections,
+            # which only ever iterate the (small) candidate set
+            matches.sort(key=lambda match: sum(len(docs) for docs in match[1]))
+            candidates = None
+            if len(matches) > 1:
+                candidates = set().union(*matches[0][1])
+                for _, doc_sets in matches[1:]:
+                    candidates = set().union(*(candidates & docs for docs in doc_sets))
+                    if not candidates:
+                        return []
+
+            # Walk the most selective token's posting lists best first, score each
+            # candidate by probing the other tokens, and stop once nothing left
+            # can beat the current top-k: a product first seen in a list scores at
+            # most that list's weight plus the best weight of every other token
+            driver = matches[0][0]
+            others = [lists for lists, _ in matches[1:]]
+            others_best = sum(lists[0][0] for lists in others)
+            top = []  # min-heap of (score, product_id)
+            seen = set()
+            for weight, ids in driver:
+                bound = weight + others_best
+                if len(top) >= limit and top[0][0] >= bound:
+                    break
+                for product_id in (ids if candidates is None else ids & candidates):
+                    if product_id in seen:
+                        continue
+                    seen.add(product_id)
+                    item = (weight + self._score(product_id, others), product_id)
+                    if len(top) < limit:
+                        heapq.heappush(top, item)
+                    elif item > top[0]:
+                        heapq.heapreplace(top, item)
+                    if len(top) >= limit and top[0][0] >= bound:
+                        break
+
+            scores = {product_id: score for score, product_id in top}
+            exact_sku = self._sku_to_id.get(str(query).strip().lower())
+            if exact_sku is not None:
+                scores[exact_sku] = (self._score(exact_sku, [lists for lists, _ in matches]) or 0.0) + 100.0
+
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return [dict(self._docs[product_id], score=round(score, 3)) for product_id, score in best]
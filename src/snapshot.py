@@ -0,0 +1,320 @@
+"""
+Columnar, memory-mapped snapshot of the sales history for analytics.
+
+The snapshot is a directory of flat NumPy columns, one value per sale, in
+(sale_date, id) order:
+
+    product_idx.bin   int32    index into product_ids.txt
+    quantity.bin      int32
+    price.bin         float64  sale_price
+    revenue.bin       float64  quantity * sale_price, so sums need no temporaries
+    ts.bin            int64    sale_date as microseconds since the epoch (UTC)
+    product_ids.txt            product id for each index, one per line
+    meta.json                  {"rows": n, "last_key": [sale_date, id]}
+
+append() pulls only the sales after last_key from the engine and appends
+them to the columns. meta.json is replaced last, so a crash mid-append just
+leaves bytes past "rows" that the next append writes over. Readers open the
+columns with np.memmap and slice the time range with a binary search, so a
+report over tens of millions of sales never copies the history onto the
+Python heap.
+
+Some sales commit after a later-dated sale is already in the snapshot: a
+write-behind journal flush or a flash-sale batch stamped when it was
+acknowledged, or concurrent transactions. append() would never pull them,
+so after pulling it reconciles: the rows per day in the snapshot are checked
+against sale_count in the daily rollups, and from the first day that differs
+the columns are cut back and pulled again. rebuild() starts the snapshot over.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.analytics import BUCKETS, DEFAULT_TOP_N, RANKINGS, bucket_range
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = {
+    "product_idx": np.int32,
+    "quantity": np.int32,
+    "price": np.float64,
+    "revenue": np.float64,
+    "ts": np.int64,
+}
+DAY_US = 86400 * 10**6
+PRODUCT_IDS = "product_ids.txt"
+META = "meta.json"
+DEFAULT_DIRECTORY = "sales_snapshot"
+
+
+
+def to_epoch_us(values):
+    """ISO timestamps (naive = UTC) -> int64 microseconds since the epoch"""
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), format="ISO8601", utc=True)
+    return parsed.dt.tz_localize(None).to_numpy("datetime64[us]").astype(np.int64)
+
+
+def _count_days(ts):
+    """{"YYYY-MM-DD": rows} for epoch-microsecond timestamps"""
+    days, counts = np.unique(np.asarray(ts) // DAY_US, return_counts=True)
+    return {str(np.datetime64(int(day), "D")): int(count) for day, count in zip(days, counts)}
+
+
+class SalesSnapshot:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._load()
+
+    # ---------------- files ----------------
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        with self._lock:
+            try:
+                with open(self._path(META)) as f:
+                    meta = json.load(f)
+            except FileNotFoundError:
+                meta = {"rows": 0, "last_key": None}
+            self.rows = meta["rows"]
+            self.last_key = tuple(meta["last_key"]) if meta["last_key"] else None
+            try:
+                with open(self._path(PRODUCT_IDS)) as f:
+                    self.product_ids = f.read().split()
+            except FileNotFoundError:
+                self.product_ids = []
+            committed = meta.get("products", len(self.product_ids))
+            if len(self.product_ids) > committed:
+                # Ids written by an append that never committed
+                self.product_ids = self.product_ids[:committed]
+                with open(self._path(PRODUCT_IDS), "w") as f:
+                    f.write("".join(f"{product_id}\n" for product_id in self.product_ids))
+            self._product_index = {product_id: i for i, product_id in enumerate(self.product_ids)}
+            self._columns = None
+            self._day_counts = None
+
+    def columns(self):
+        """{"product_idx", "quantity", "price", "ts"} as read-only memmaps of the committed rows"""
+        with self._lock:
+            if self._columns is None:
+                self._columns = {
+                    name: (
+                        np.memmap(self._path(f"{name}.bin"), dtype=dtype, mode="r", shape=(self.rows,))
+                        if self.rows else np.empty(0, dtype=dtype)
+                    )
+                    for name, dtype in COLUMNS.items()
+                }
+            return self._columns
+
+    # ---------------- writing ----------------
+
+    def append_rows(self, rows):
+        """Append raw sale rows (oldest first, all after last_key); returns how many were added"""
+        with self._lock:
+            if self.last_key is not None:
+                rows = [row for row in rows if (row["sale_date"], str(row["id"])) > self.last_key]
+            if not rows:
+                return 0
+
+            new_ids = []
+            for row in rows:
+                product_id = str(row["product_id"])
+                if product_id not in self._product_index:
+                    self._product_index[product_id] = len(self.product_ids)
+                    self.product_ids.append(product_id)
+                    new_ids.append(product_id)
+
+            arrays = {
+                "product_idx": np.fromiter((self._product_index[str(row["product_id"])] for row in rows), np.int32, len(rows)),
+                "quantity": np.fromiter((row["quantity_sold"] for row in rows), np.int32, len(rows)),
+                "price": np.fromiter((row["sale_price"] for row in rows), np.float64, len(rows)),
+                "ts": to_epoch_us([row["sale_date"] for row in rows]),
+            }
+            arrays["revenue"] = arrays["quantity"] * arrays["price"]
+            for name, dtype in COLUMNS.items():
+                path = self._path(f"{name}.bin")
+                with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                    # Written over anything past the committed rows (a torn earlier
+                    # append, or rows dropped by truncate()). Files never shrink, so
+                    # a reader's memmap of the old length stays valid.
+                    f.seek(self.rows * np.dtype(dtype).itemsize)
+                    arrays[name].astype(dtype, copy=False).tofile(f)
+                    f.flush()
+                    os.fsync(f.fileno())
+            if new_ids:
+                with open(self._path(PRODUCT_IDS), "a") as f:
+                    f.write("".join(f"{product_id}\n" for product_id in new_ids))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            self.rows += len(rows)
+            self.last_key = (rows[-1]["sale_date"], str(rows[-1]["id"]))
+            self._write_meta()
+            self._columns = None
+            if self._day_counts is not None:
+                for day, count in _count_days(arrays["ts"]).items():
+                    self._day_counts[day] = self._day_counts.get(day, 0) + count
+            return len(rows)
+
+    def day_counts(self):
+        """{"YYYY-MM-DD": rows} for the committed rows (UTC days, like the rollups)"""
+        with self._lock:
+            if self._day_counts is None:
+                self._day_counts = _count_days(self.columns()["ts"])
+            return dict(self._day_counts)
+
+    def drifted_day(self, daily):
+        """
+        The first day whose row count differs from the rollups' sale_count
+        (``daily``: rows with "day" and "sale_count"), or None. Days after the
+        snapshot's last row are still to be appended and are not compared.
+        """
+        if self.last_key is None:
+            return None
+        last_day = str(self.last_key[0])[:10]
+        expected = {str(row["day"])[:10]: row["sale_count"] for row in daily if row["sale_count"]}
+        held = self.day_counts()
+        for day in sorted(set(expected) | set(held)):
+            if day > last_day:
+                break
+            if expected.get(day, 0) != held.get(day, 0):
+                return day
+        return None
+
+    def truncate(self, day):
+        """Drop the rows from ``day`` (YYYY-MM-DD) on, so the next append pulls them again"""
+        with self._lock:
+            keep = int(np.searchsorted(self.columns()["ts"], to_epoch_us([day])[0], "left"))
+            self.rows = keep
+            self._columns = None
+            # Every sale of ``day`` sorts after this key; product ids are kept
+            self.last_key = (day, "") if keep else None
+            self._write_meta()
+            self._day_counts = None
+
+    def _write_meta(self):
+        tmp = self._path(META + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"rows": self.rows, "last_key": self.last_key, "products": len(self.product_ids)}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path(META))
+
+    def _start(self):
+        return self.last_key[0] if self.last_key else None
+
+    def append(self, engine, batch_size=10000):
+        """Pull the sales recorded since the last append from a sync engine, then reconcile"""
+        added = self._pull(engine, batch_size)
+        day = self.drifted_day(engine.list_daily_sales())
+        if day is not None:
+            logger.warning("Sales snapshot differs from the rollups on %s; pulling that day on again", day)
+            self.truncate(day)
+            added += self._pull(engine, batch_size)
+        return added
+
+    def _pull(self, engine, batch_size):
+        added = 0
+        for page in engine.iter_sales(self._start(), None, batch_size):
+            added += self.append_rows(page)
+        return added
+
+    async def append_async(self, engine, batch_size=10000):
+        """append() for async engines; file writes run in a worker thread"""
+        added = await self._pull_async(engine, batch_size)
+        daily = await engine.list_daily_sales()
+        day = await asyncio.to_thread(self.drifted_day, daily)
+        if day is not None:
+            logger.warning("Sales snapshot differs from the rollups on %s; pulling that day on again", day)
+            await asyncio.to_thread(self.truncate, day)
+            added += await self._pull_async(engine, batch_size)
+        return added
+
+    async def _pull_async(self, engine, batch_size):
+        added = 0
+        async for page in engine.iter_sales(self._start(), None, batch_size):
+            added += await asyncio.to_thread(self.append_rows, page)
+        return added
+
+    def rebuild(self, engine, batch_size=10000):
+        """Discard the snapshot and rebuild it from the full sales history"""
+        with self._lock:
+            for name in [*(f"{column}.bin" for column in COLUMNS), PRODUCT_IDS, META]:
+                try:
+                    os.remove(self._path(name))
+                except FileNotFoundError:
+                    pass
+            self._load()
+            return self.append(engine, batch_size)
+
+    # ---------------- reading ----------------
+
+    def _range(self, start=None, end=None):
+        """Memmap slices for start <= ts < end (ISO dates or timestamps); ts is sorted"""
+        cols = self.columns()
+        ts = cols["ts"]
+        lo = 0 if start is None else int(np.searchsorted(ts, to_epoch_us([start])[0], "left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, to_epoch_us([end])[0], "left"))
+        return {name: column[lo:hi] for name, column in cols.items()}
+
+    def revenue_series(self, bucket, start=None, end=None):
+        """Same output as analytics.revenue_series, computed on the memmapped columns"""
+        if bucket not in BUCKETS:
+            raise ValueError(f"bucket must be one of: {', '.join(BUCKETS)}")
+        cols = self._range(start, end)
+        ts = cols["ts"]
+        if start is None or end is None:
+            if not len(ts):
+                return []
+            first, last = (pd.Timestamp(int(value), unit="us") for value in (ts[0], ts[-1]))
+            start = start or first
+            end = end or last + pd.Timedelta(microseconds=1)
+        starts = bucket_range(start, end, bucket)
+        # ts is sorted, so every bucket is one contiguous slice of the columns
+        edges = [0, *np.searchsorted(ts, starts[1:].to_numpy("datetime64[us]").astype(np.int64), "left"), len(ts)]
+        series = []
+        for bucket_ts, lo, hi in zip(starts, edges, edges[1:]):
+            series.append({
+                "bucket": bucket_ts.isoformat(),
+                "sale_count": int(hi - lo),
+                "units": int(cols["quantity"][lo:hi].sum(dtype=np.int64)),
+                "revenue": round(float(cols["revenue"][lo:hi].sum()), 2),
+            })
+        return series
+
+    def top_products(self, n=DEFAULT_TOP_N, by="revenue", start=None, end=None):
+        """Same output as analytics.top_products, computed on the memmapped columns"""
+        if by not in RANKINGS:
+            raise ValueError(f"by must be one of: {', '.join(RANKINGS)}")
+        cols = self._range(start, end)
+        size = len(self.product_ids)
+        counts = np.bincount(cols["product_idx"], minlength=size)
+        units = np.bincount(cols["product_idx"], weights=cols["quantity"], minlength=size)
+        revenue = np.bincount(cols["product_idx"], weights=cols["revenue"], minlength=size)
+        ranking = revenue if by == "revenue" else units
+        sold = np.flatnonzero(counts)
+        best = sold[np.argsort(-ranking[sold], kind="stable")[:n]]
+        return [
+            {
+                "product_id": self.product_ids[i],
+                "sale_count": int(counts[i]),
+                "units": int(units[i]),
+                "revenue": round(float(revenue[i]), 2),
+            }
+            for i in best
+        ]
+
+    def stats(self):
+        ts = self.columns()["ts"]
+        first = last = None
+        if len(ts):
+            first, last = (pd.Timestamp(int(value), unit="us").isoformat() for value in (ts[0], ts[-1]))
+        return {"rows": self.rows, "products": len(self.product_ids), "first_sale": first, "last_sale": last}
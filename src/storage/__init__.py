@@ -0,0 +1,104 @@
+"""
+Storage engines behind SupabaseDB (src/db.py) and Database (Backend/database.py).
+
+The engine is picked with the STORAGE_ENGINE environment variable:
+
+    STORAGE_ENGINE=supabase   remote Supabase project (default)
+    STORAGE_ENGINE=sqlite     embedded database at SQLITE_PATH (default flash_inventory.db)
+
+Engines come wrapped in an ObservedEngine, which publishes writes to
+in-process listeners (engine.subscribe). Product lookups by id/SKU are served from an in-process catalog cache of
+CATALOG_CACHE_SIZE products (0 disables it) whose entries expire after
+CATALOG_CACHE_TTL seconds.
+
+Synchronous callers (SupabaseDB, the CLI's Database, FlashInventory) share
+one engine per process from shared_engine(), built on first use; the API
+builds its own async engine once at startup with create_async_engine().
+"""
+import os
+import threading
+
+from src.cache import DEFAULT_CACHE_SIZE, DEFAULT_CACHE_TTL, CatalogCache
+
+from .base import (
+    ORDER_REFUSED, PRODUCT_FIELDS, DuplicateSKU, InsufficientStock, ProductInUse, ProductNotFound, StockConflict, StorageEngine,
+    StorageError,
+)
+from .instrumented import InstrumentedEngine
+from .observed import AsyncObservedEngine, ObservedEngine, StorageListener
+
+ENGINES = ("supabase", "sqlite")
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def _engine_name(name):
+    return (name or os.getenv("STORAGE_ENGINE") or "supabase").lower()
+
+
+def engine_source(name=None):
+    """Which database the configured engine points at (e.g. "sqlite:/path/to.db"), without connecting"""
+    name = _engine_name(name)
+    if name == "sqlite":
+        return f"sqlite:{os.path.abspath(os.getenv('SQLITE_PATH', 'flash_inventory.db'))}"
+    return f"{name}:{os.getenv('SUPABASE_URL', '')}"
+
+
+def _catalog_cache():
+    size = int(os.getenv("CATALOG_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+    if size <= 0:
+        return None
+    return CatalogCache(size, float(os.getenv("CATALOG_CACHE_TTL", DEFAULT_CACHE_TTL)))
+
+
+def _create_raw_engine(name, options):
+    if name == "supabase":
+        from .supabase_engine import SupabaseEngine
+        return SupabaseEngine(**options)
+
+    if name == "sqlite":
+        from .sqlite_engine import SQLiteEngine
+        options.setdefault("path", os.getenv("SQLITE_PATH", "flash_inventory.db"))
+        return SQLiteEngine(**options)
+
+    raise ValueError(f"Unknown STORAGE_ENGINE '{name}' (expected one of: {', '.join(ENGINES)})")
+
+
+def create_engine(name=None, **options):
+    """Build the configured storage engine"""
+    return ObservedEngine(_create_raw_engine(_engine_name(name), options), _catalog_cache())
+
+
+def shared_engine():
+    """The process-wide engine (and its client/connection pool), created on first use"""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = create_engine()
+    return _shared
+
+
+async def create_async_engine(name=None, **options):
+    """
+    Build the configured engine for async callers (the API). Supabase gets a
+    native async client with a pooled HTTP connection; local engines run in
+    worker threads.
+    """
+    name = _engine_name(name)
+    if name == "supabase":
+        from .async_engines import AsyncSupabaseEngine
+        engine = await AsyncSupabaseEngine.connect(**options)
+    else:
+        from .async_engines import ThreadedEngine
+        engine = ThreadedEngine(_create_raw_engine(name, options))
+
+    # Every call that reaches the database is timed for GET /metrics (src/metrics.py)
+    return AsyncObservedEngine(InstrumentedEngine(engine), _catalog_cache())
+
+
+__all__ = [
+    "StorageEngine", "StorageError", "StorageListener", "ProductNotFound", "InsufficientStock", "DuplicateSKU",
+    "ProductInUse", "StockConflict", "ORDER_REFUSED", "PRODUCT_FIELDS", "create_engine", "create_async_engine", "shared_engine", "engine_source", "ENGINES",
+]
@@ -0,0 +1,266 @@
+"""
+Async counterparts of the storage engines, used by the API.
+
+They expose the same methods as StorageEngine, but as coroutines
+(iter_products is an async generator). AsyncSupabaseEngine talks to
+PostgREST through one pooled HTTP/2 client for the whole process;
+ThreadedEngine adapts a local sync engine such as SQLite.
+"""
+import asyncio
+import functools
+import os
+
+import httpx
+from postgrest.exceptions import APIError
+from supabase import AsyncClientOptions, acreate_client
+
+from .base import DuplicateSKU, ProductInUse, ProductNotFound
+from .supabase_engine import (
+    ORDER_WITH_SALES, SALE_FIELDS, SALE_WITH_PRODUCT, _batch_payload, _forecast_payload, _id_chunks, _is_duplicate_sku,
+    _is_referenced, _order_payload, _order_row, _product_fields, _quote, _rollup_query, _sale_result, _sales_range_query, _stock_payload, _stock_result,
+    _upsert_groups,
+)
+
+DEFAULT_POOL_SIZE = 100
+
+
+class ThreadedEngine:
+    """Run a sync engine's methods in worker threads so they never block the event loop"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.name = engine.name
+
+    def __getattr__(self, name):
+        method = getattr(self.engine, name)
+        if not callable(method):
+            return method
+
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
+
+    async def iter_products(self, batch_size=1000):
+        async for page in self._iterate(self.engine.iter_products(batch_size)):
+            yield page
+
+    async def iter_sales(self, start=None, end=None, batch_size=1000):
+        async for page in self._iterate(self.engine.iter_sales(start, end, batch_size)):
+            yield page
+
+    @staticmethod
+    async def _iterate(pages):
+        while True:
+            page = await asyncio.to_thread(next, pages, None)
+            if page is None:
+                return
+            yield page
+
+    async def close(self):
+        await asyncio.to_thread(self.engine.close)
+
+
+class AsyncSupabaseEngine:
+    """Non-blocking Supabase engine sharing one connection pool across all requests"""
+
+    name = "supabase"
+
+    def __init__(self, client, http_client):
+        self.client = client
+        self.http_client = http_client
+
+    @classmethod
+    async def connect(cls, url=None, key=None, pool_size=None):
+        url = url or os.getenv("SUPABASE_URL")
+        key = key or os.getenv("SUPABASE_KEY")
+        if not url or not key:
+            raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in .env file")
+        pool_size = pool_size or int(os.getenv("DB_POOL_SIZE", DEFAULT_POOL_SIZE))
+        http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(30.0),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        client = await acreate_client(url, key, AsyncClientOptions(httpx_client=http_client))
+        return cls(client, http_client)
+
+    async def close(self):
+        await self.http_client.aclose()
+
+    async def ping(self):
+        await self.client.table("products").select("id").limit(1).execute()
+
+    # PRODUCTS
+    async def insert_product(self, product_data):
+        try:
+            return (await self.client.table("products").insert(product_data).execute()).data
+        except APIError as e:
+            if _is_duplicate_sku(e):
+                raise DuplicateSKU(product_data.get("sku")) from e
+            raise
+
+    async def list_products_page(self, limit, after=None):
+        query = self.client.table("products").select("*").order("name").order("id").limit(limit)
+        if after is not None:
+            name, last_id = map(_quote, after)
+            query = query.or_(f"name.gt.{name},and(name.eq.{name},id.gt.{last_id})")
+        return (await query.execute()).data
+
+    async def get_product(self, product_id):
+        rows = (await self.client.table("products").select("*").eq("id", str(product_id)).execute()).data
+        return rows[0] if rows else None
+
+    async def get_product_by_sku(self, sku):
+        rows = (await self.client.table("products").select("*").eq("sku", sku).execute()).data
+        return rows[0] if rows else None
+
+    async def get_products_by_ids(self, product_ids):
+        pages = await asyncio.gather(*(
+            self.client.table("products").select("*").in_("id", chunk).execute() for chunk in _id_chunks(product_ids)
+        ))
+        return [product for page in pages for product in page.data]
+
+    async def update_product_stock(self, product_id, new_stock):
+        query = self.client.table("products").update({"stock_quantity": new_stock}).eq("id", str(product_id))
+        return (await query.execute()).data
+
+    async def update_product(self, product_id, fields):
+        query = self.client.table("products").update(_product_fields(fields)).eq("id", str(product_id))
+        try:
+            rows = (await query.execute()).data
+        except APIError as e:
+            if _is_duplicate_sku(e):
+                raise DuplicateSKU(fields.get("sku")) from e
+            raise
+        if not rows:
+            raise ProductNotFound(product_id)
+        return rows
+
+    async def delete_product(self, product_id):
+        try:
+            rows = (await self.client.table("products").delete().eq("id", str(product_id)).execute()).data
+        except APIError as e:
+            if _is_referenced(e):
+                raise ProductInUse(product_id) from e
+            raise
+        if not rows:
+            raise ProductNotFound(product_id)
+        return rows
+
+    async def adjust_product_stock(self, product_id, delta=None, new_stock=None, expected_updated_at=None):
+        payload = _stock_payload(product_id, delta, new_stock, expected_updated_at)
+        return _stock_result((await self.client.rpc("adjust_stock", payload).execute()).data, product_id)
+
+    async def upsert_products(self, rows, defaults=None):
+        if not rows:
+            return {"inserted": 0, "updated": 0, "products": []}
+        existing = set()
+        for chunk in _id_chunks(row["sku"] for row in rows):
+            query = self.client.table("products").select("sku").in_("sku", chunk)
+            existing.update(r["sku"] for r in (await query.execute()).data)
+        products = []
+        for group in _upsert_groups(rows, existing, defaults):
+            products.extend((await self.client.table("products").upsert(
+                group, on_conflict="sku", default_to_null=False
+            ).execute()).data)
+        return {"inserted": len(rows) - len(existing), "updated": len(existing), "products": products}
+
+    async def list_low_stock(self):
+        return (await self.client.table("low_stock_products").select("*").order("stock_quantity").execute()).data
+
+    async def iter_products(self, batch_size=1000):
+        last_id = None
+        while True:
+            query = self.client.table("products").select("*").order("id").limit(batch_size)
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            page = (await query.execute()).data
+            if not page:
+                return
+            yield page
+            if len(page) < batch_size:
+                return
+            last_id = page[-1]["id"]
+
+    # SALES
+    async def record_sale(self, product_id, quantity, sale_price=None, sale_date=None):
+        result = (await self.client.rpc("record_sale", {
+            "p_product_id": str(product_id),
+            "p_quantity": quantity,
+            "p_sale_price": sale_price,
+            "p_sale_date": sale_date,
+        }).execute()).data
+        return _sale_result(result, product_id)
+
+    async def record_sales_batch(self, lines):
+        return (await self.client.rpc("record_sales_batch", {"p_lines": _batch_payload(lines)}).execute()).data
+
+    async def insert_sales(self, sales):
+        return (await self.client.table("sales").upsert(sales, on_conflict="id", ignore_duplicates=True).execute()).data
+
+    async def record_order(self, lines):
+        return (await self.client.rpc("record_order", {"p_lines": _order_payload(lines)}).execute()).data
+
+    async def get_order(self, order_id):
+        query = self.client.table("orders").select(ORDER_WITH_SALES).eq("id", str(order_id))
+        return _order_row((await query.execute()).data)
+
+    async def list_sales_page(self, limit, before=None):
+        query = (
+            self.client.table("sales").select(SALE_WITH_PRODUCT)
+            .order("sale_date", desc=True).order("id", desc=True).limit(limit)
+        )
+        if before is not None:
+            sale_date, last_id = map(_quote, before)
+            query = query.or_(f"sale_date.lt.{sale_date},and(sale_date.eq.{sale_date},id.lt.{last_id})")
+        return (await query.execute()).data
+
+    async def iter_sales(self, start=None, end=None, batch_size=1000):
+        after = None
+        while True:
+            query = _sales_range_query(self.client.table("sales").select(SALE_FIELDS), start, end, after)
+            page = (await query.limit(batch_size).execute()).data
+            if not page:
+                return
+            yield page
+            if len(page) < batch_size:
+                return
+            after = (page[-1]["sale_date"], page[-1]["id"])
+
+    async def get_sales_by_product(self, product_id):
+        return (await self.client.table("sales").select("*").eq("product_id", str(product_id)).execute()).data
+
+    async def table_versions(self):
+        return (await self.client.rpc("table_versions").execute()).data
+
+    # ROLLUPS
+    async def list_daily_sales(self, since=None, until=None):
+        return (await _rollup_query(self.client.table("sales_daily").select("*"), since, until).execute()).data
+
+    async def list_daily_product_sales(self, since=None, until=None, product_id=None):
+        query = self.client.table("sales_daily_product").select("*")
+        if product_id is not None:
+            query = query.eq("product_id", str(product_id))
+        return (await _rollup_query(query, since, until).execute()).data
+
+    async def dashboard_summary(self, since):
+        return (await self.client.rpc("dashboard_summary", {"p_since": str(since)}).execute()).data
+
+    async def rebuild_sales_rollups(self):
+        return (await self.client.rpc("rebuild_sales_rollups").execute()).data
+
+    # FORECASTS
+    async def save_forecasts(self, forecasts, update_min_stock=True):
+        if not forecasts:
+            return {"saved": 0, "products": []}
+        return (await self.client.rpc("save_forecasts", {
+            "p_rows": _forecast_payload(forecasts),
+            "p_update_min_stock": update_min_stock,
+        }).execute()).data
+
+    async def get_forecast(self, product_id):
+        query = self.client.table("product_forecasts").select("*").eq("product_id", str(product_id))
+        rows = (await query.execute()).data
+        return rows[0] if rows else None
@@ -0,0 +1,262 @@
+class StorageError(Exception):
+    """Raised by a storage engine when an operation cannot be completed"""
+
+
+class ProductNotFound(StorageError):
+    def __init__(self, product_id=None):
+        super().__init__("Product not found")
+        self.product_id = product_id
+
+
+class DuplicateSKU(StorageError):
+    def __init__(self, sku=None):
+        super().__init__(f"SKU '{sku}' already exists" if sku else "SKU already exists")
+        self.sku = sku
+
+
+class InsufficientStock(StorageError):
+    def __init__(self, available, product_id=None):
+        super().__init__(f"Not enough stock (Available: {available})")
+        self.available = available
+        self.product_id = product_id
+
+
+class ProductInUse(StorageError):
+    """The product is referenced by recorded sales, so it cannot be deleted"""
+
+    def __init__(self, product_id=None):
+        super().__init__("Product has recorded sales and cannot be deleted")
+        self.product_id = product_id
+
+
+class StockConflict(StorageError):
+    """A conditional stock write was refused; ``product`` is the row as it is now"""
+
+    def __init__(self, product, modified):
+        if modified:
+            message = "Product was modified since it was read"
+        else:
+            message = f"Not enough stock (Available: {product['stock_quantity']})"
+        super().__init__(message)
+        self.product = product
+        self.modified = modified
+
+
+# Columns update_product() may write; id and the timestamps are managed by the engines
+PRODUCT_FIELDS = ("name", "description", "sku", "price", "cost_price", "stock_quantity", "min_stock_level", "category")
+
+# Result of an order line that could be filled but was not, because another line was refused
+ORDER_REFUSED = "Not recorded: another line of the order was refused"
+
+
+class StorageEngine:
+    """
+    Interface every storage backend implements.
+
+    Engines return plain row dicts shaped like Supabase responses (sales carry
+    a nested ``products`` dict with ``name`` and ``sku``) and raise on failure;
+    the data layers (SupabaseDB / Database) turn that into their result format.
+    """
+
+    name = "base"
+
+    def ping(self):
+        """Cheap round trip used to check connectivity"""
+        raise NotImplementedError
+
+    # PRODUCTS
+    def insert_product(self, product_data):
+        """Insert a product and return the inserted rows"""
+        raise NotImplementedError
+
+    def list_products(self):
+        """All products ordered by name"""
+        raise NotImplementedError
+
+    def list_products_page(self, limit, after=None):
+        """Up to ``limit`` products ordered by (name, id), strictly after the ``after`` key"""
+        raise NotImplementedError
+
+    def get_product(self, product_id):
+        """Product by id, or None"""
+        raise NotImplementedError
+
+    def get_product_by_sku(self, sku):
+        """Product by SKU, or None"""
+        raise NotImplementedError
+
+    def get_products_by_ids(self, product_ids):
+        """Products for a list of ids in as few queries as the backend allows; unknown ids are skipped"""
+        raise NotImplementedError
+
+    def update_product_stock(self, product_id, new_stock):
+        """Overwrite stock_quantity and return the updated rows"""
+        raise NotImplementedError
+
+    def update_product(self, product_id, fields):
+        """
+        Write the given PRODUCT_FIELDS of a product and return the updated rows.
+        Raises ValueError for any other field, ProductNotFound, or DuplicateSKU.
+        """
+        raise NotImplementedError
+
+    def delete_product(self, product_id):
+        """Delete a product (and its stored forecast) and return the deleted rows. Raises ProductNotFound or ProductInUse"""
+        raise NotImplementedError
+
+    def adjust_product_stock(self, product_id, delta=None, new_stock=None, expected_updated_at=None):
+        """
+        Add ``delta`` to stock_quantity (or set it to ``new_stock``) in one
+        conditional write and return the updated rows. With ``expected_updated_at``
+        the write only happens if the product's updated_at still equals it
+        (compare-and-set). Raises ProductNotFound, or StockConflict carrying the
+        current row when the precondition fails or stock would go below zero.
+        """
+        raise NotImplementedError
+
+    def upsert_products(self, rows, defaults=None):
+        """
+        Bulk insert-or-update products matched on SKU (rows must have unique SKUs).
+        Existing SKUs are looked up for the whole batch in one query. Rows may
+        carry different columns: an existing product only has the columns in
+        its row written, a new one takes ``defaults`` for the columns it lacks.
+        Returns {"inserted": n, "updated": n, "products": rows after the write}.
+        """
+        raise NotImplementedError
+
+    def list_low_stock(self):
+        """Products whose stock_quantity is below their min_stock_level, lowest stock first (partial index)"""
+        raise NotImplementedError
+
+    def iter_products(self, batch_size=1000):
+        """Yield the whole catalog as lists of products, paging by id"""
+        raise NotImplementedError
+
+    # SALES
+    def insert_sale(self, sale_data):
+        """Insert a sale row and return the inserted rows"""
+        raise NotImplementedError
+
+    def record_sale(self, product_id, quantity, sale_price=None, sale_date=None):
+        """
+        Atomically decrement stock (only if stock_quantity >= quantity) and insert
+        the sale, in one round trip. sale_price defaults to the listed price, and
+        the product's cost_price at that moment is stamped on the sale.
+
+        Returns {"sale": row, "stock_quantity": remaining}; raises ProductNotFound,
+        InsufficientStock or ValueError (quantity below 1) without changing anything.
+        """
+        raise NotImplementedError
+
+    def record_sales_batch(self, lines):
+        """
+        Record many sale lines ({product_id, quantity, sale_price?, sale_date?, id?})
+        in one transaction: one stock read and one decrement per product and a
+        bulk insert of the accepted rows. A line whose id is already recorded
+        succeeds with "duplicate": True and changes nothing, so batches can be
+        resent safely.
+
+        Lines are admitted in order against the product's stock; a line is
+        accepted while the running quantity for its product still fits. Returns
+        one result per line: {"index", "success", "sale", "stock_quantity"}
+        (stock left after that line) or {"index", "success", "error", "available"}.
+        """
+        raise NotImplementedError
+
+    def insert_sales(self, sales):
+        """
+        Bulk insert complete sale rows (id, product_id, quantity_sold,
+        sale_price, cost_price, sale_date) without touching stock, for units
+        already taken out of it (a flash sale). Rows whose id is already
+        recorded are skipped, so a batch can be resent; returns the rows inserted.
+        """
+        raise NotImplementedError
+
+    def record_order(self, lines):
+        """
+        Record an order of sale lines ({product_id, quantity, sale_price?}) all
+        or nothing, in one transaction and one round trip: the products are
+        locked, every line is checked in order against the running quantity for
+        its product, and only if all of them fit is the order row written, the
+        stock decremented and one sale per line inserted (with its order_id and
+        the order's timestamp).
+
+        Returns {"order": row, "lines": results} with results shaped like
+        record_sales_batch's. If any line is refused, "order" is None, nothing is
+        written, refused lines carry their own error (and "available") and the
+        others carry ORDER_REFUSED.
+        """
+        raise NotImplementedError
+
+    def get_order(self, order_id):
+        """The order row with its sales (product name/sku embedded) under "sales", or None"""
+        raise NotImplementedError
+
+    def list_sales(self, limit=None):
+        """Sales with product name/sku, newest first"""
+        raise NotImplementedError
+
+    def list_sales_page(self, limit, before=None):
+        """Up to ``limit`` sales with product name/sku, newest first, strictly before the (sale_date, id) key"""
+        raise NotImplementedError
+
+    def get_sales_by_product(self, product_id):
+        """Sales for one product"""
+        raise NotImplementedError
+
+    def table_versions(self):
+        """{"products": n, "sales": n}: counters the database bumps on every write to each table"""
+        raise NotImplementedError
+
+    # ROLLUPS
+    # sales_daily / sales_daily_product are maintained by the database on every
+    # sale insert, so reports read one row per day instead of every sale.
+    def list_daily_sales(self, since=None, until=None):
+        """
+        Per-day {"day", "sale_count", "units", "revenue", "cost", "costed_revenue"}
+        rows, oldest first; days are inclusive ISO dates. cost and costed_revenue
+        cover only the sales that carry a cost_price.
+        """
+        raise NotImplementedError
+
+    def list_daily_product_sales(self, since=None, until=None, product_id=None):
+        """Per-day, per-product rollup rows ({"day", "product_id", ...}), oldest first"""
+        raise NotImplementedError
+
+    def dashboard_summary(self, since):
+        """
+        {"total_products", "low_stock_count", "sale_count", "units", "revenue"}
+        with sales totals from ``since`` (ISO date) on, read in one snapshot
+        """
+        raise NotImplementedError
+
+    def iter_daily_product_sales(self, since=None, until=None, batch_size=10000):
+        """Yield pages of sales_daily_product rows ordered by (product_id, day), keyset-paginated"""
+        raise NotImplementedError
+
+    def rebuild_sales_rollups(self):
+        """Recompute both rollup tables from the sales history; returns the number of days"""
+        raise NotImplementedError
+
+    def iter_sales(self, start=None, end=None, batch_size=1000):
+        """
+        Yield pages of raw sale rows (id, product_id, quantity_sold, sale_price,
+        cost_price, sale_date) with start <= sale_date < end, oldest first, keyset-paginated
+        """
+        raise NotImplementedError
+
+    # FORECASTS
+    def save_forecasts(self, forecasts, update_min_stock=True):
+        """
+        Upsert product_forecasts rows (see src/forecast.py) for existing products and,
+        if ``update_min_stock``, set each product's min_stock_level to its reorder_point.
+        Returns {"saved": n, "products": full rows whose min_stock_level changed}.
+        """
+        raise NotImplementedError
+
+    def get_forecast(self, product_id):
+        """Stored forecast for a product, or None"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources held by the engine"""
@@ -0,0 +1,76 @@
+"""
+Async engine wrapper that times every call into src.metrics.
+
+Each engine method is roughly one database round trip (a few chunk their
+queries); each page of an iter_* generator counts as one. Catalog cache hits
+are answered by the ObservedEngine above this wrapper and never get here.
+Exceptions are counted by type and re-raised unchanged, so the data layer
+still turns them into {"success": False} - but they are no longer invisible.
+"""
+import functools
+import inspect
+import time
+
+from src.metrics import record_db_call
+
+
+def _rows(result):
+    """How many rows an engine result holds (lists, {"products": [...]} results, single rows)"""
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict) and isinstance(result.get("products"), list):
+        return len(result["products"])
+    return 1
+
+
+class InstrumentedEngine:
+    def __init__(self, engine):
+        self.engine = engine
+        self.name = engine.name
+
+    def __getattr__(self, name):
+        method = getattr(self.engine, name)
+        if inspect.isasyncgenfunction(method):
+            wrapped = self._pages(name, method)
+        elif inspect.iscoroutinefunction(method):
+            wrapped = self._timed(name, method)
+        else:
+            return method
+        setattr(self, name, wrapped)  # built once per method, later lookups skip __getattr__
+        return wrapped
+
+    @staticmethod
+    def _timed(name, method):
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = await method(*args, **kwargs)
+            except Exception as e:
+                record_db_call(name, time.perf_counter() - started, error=type(e).__name__)
+                raise
+            record_db_call(name, time.perf_counter() - started, _rows(result))
+            return result
+
+        return call
+
+    @staticmethod
+    def _pages(name, method):
+        @functools.wraps(method)
+        async def pages(*args, **kwargs):
+            iterator = method(*args, **kwargs).__aiter__()
+            while True:
+                started = time.perf_counter()
+                try:
+                    page = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                except Exception as e:
+                    record_db_call(name, time.perf_counter() - started, error=type(e).__name__)
+                    raise
+                record_db_call(name, time.perf_counter() - started, _rows(page))
+                yield page
+
+        return pages
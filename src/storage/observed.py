@@ -0,0 +1,288 @@
+"""
+Engine wrappers that publish every write to in-process listeners.
+
+Derived views - the catalog cache, the search index, and so on - subscribe
+to an ObservedEngine instead of polling the database. Each write made through
+the engine is reported as one or more events, which listeners implement as
+methods (see StorageListener):
+
+    products_changed(products)              full rows after insert/update/upsert
+    stock_changed(product_id, stock)        new stock after a sale
+    product_removed(product_id)             product no longer exists
+    sales_recorded(sales)                   sale rows that were inserted
+
+Product lookups by id/SKU are also served from the optional CatalogCache.
+"""
+import logging
+
+from .base import InsufficientStock, ProductNotFound, StockConflict
+
+logger = logging.getLogger(__name__)
+
+
+class StorageListener:
+    """No-op base for listeners; override the events you care about"""
+
+    def products_changed(self, products):
+        pass
+
+    def stock_changed(self, product_id, stock_quantity):
+        pass
+
+    def product_removed(self, product_id):
+        pass
+
+    def sales_recorded(self, sales):
+        pass
+
+
+class ObservedEngine:
+    def __init__(self, engine, cache=None):
+        self.engine = engine
+        self.cache = cache
+        self.name = engine.name
+        self.listeners = []
+        if cache is not None:
+            self.subscribe(cache)
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def _emit(self, event, *args):
+        for listener in self.listeners:
+            try:
+                getattr(listener, event)(*args)
+            except Exception:
+                # A broken view must never fail the write that already committed
+                logger.exception("Storage listener %r failed on %s", listener, event)
+
+    def _sale_failed(self, product_id, error):
+        # A failed sale still tells us the product's current stock (or that it is gone)
+        if isinstance(error, InsufficientStock):
+            self._emit("stock_changed", str(product_id), error.available)
+        elif isinstance(error, ProductNotFound):
+            self._emit("product_removed", str(product_id))
+
+    def _stock_refused(self, product_id, error):
+        # A refused stock write still tells us the current row (or that it is gone)
+        if isinstance(error, StockConflict):
+            self._emit("products_changed", [error.product])
+        elif isinstance(error, ProductNotFound):
+            self._emit("product_removed", str(product_id))
+
+    def _sale_recorded(self, product_id, result):
+        self._emit("stock_changed", str(product_id), result["stock_quantity"])
+        self._emit("sales_recorded", [result["sale"]])
+
+    def _batch_recorded(self, results):
+        stock = {}
+        sales = []
+        for result in results:
+            if result["success"]:
+                sale = result["sale"]
+                if not result.get("duplicate"):
+                    sales.append(sale)
+                # lines are applied in order, so the last one holds the final stock
+                if result["stock_quantity"] is not None:
+                    stock[str(sale["product_id"])] = result["stock_quantity"]
+        for product_id, stock_quantity in stock.items():
+            self._emit("stock_changed", product_id, stock_quantity)
+        if sales:
+            self._emit("sales_recorded", sales)
+
+    # PRODUCTS
+    def get_product(self, product_id):
+        product = self.cache.get(product_id) if self.cache is not None else None
+        if product is None:
+            # Taken before the read, so a write that lands during it wins over the row read
+            generation = self.cache.generation if self.cache is not None else None
+            product = self.engine.get_product(product_id)
+            if product is not None and self.cache is not None:
+                self.cache.put(product, generation)
+        return product
+
+    def get_product_by_sku(self, sku):
+        product = self.cache.get_by_sku(sku) if self.cache is not None else None
+        if product is None:
+            generation = self.cache.generation if self.cache is not None else None
+            product = self.engine.get_product_by_sku(sku)
+            if product is not None and self.cache is not None:
+                self.cache.put(product, generation)
+        return product
+
+    def insert_product(self, product_data):
+        rows = self.engine.insert_product(product_data)
+        self._emit("products_changed", rows)
+        return rows
+
+    def update_product_stock(self, product_id, new_stock):
+        rows = self.engine.update_product_stock(product_id, new_stock)
+        self._emit("products_changed", rows)
+        return rows
+
+    def update_product(self, product_id, fields):
+        try:
+            rows = self.engine.update_product(product_id, fields)
+        except ProductNotFound:
+            self._emit("product_removed", str(product_id))
+            raise
+        self._emit("products_changed", rows)
+        return rows
+
+    def delete_product(self, product_id):
+        try:
+            rows = self.engine.delete_product(product_id)
+        except ProductNotFound:
+            self._emit("product_removed", str(product_id))
+            raise
+        self._emit("product_removed", str(product_id))
+        return rows
+
+    def adjust_product_stock(self, product_id, delta=None, new_stock=None, expected_updated_at=None):
+        try:
+            rows = self.engine.adjust_product_stock(product_id, delta, new_stock, expected_updated_at)
+        except (StockConflict, ProductNotFound) as e:
+            self._stock_refused(product_id, e)
+            raise
+        self._emit("products_changed", rows)
+        return rows
+
+    def upsert_products(self, rows, defaults=None):
+        result = self.engine.upsert_products(rows, defaults)
+        self._emit("products_changed", result["products"])
+        return result
+
+    def save_forecasts(self, forecasts, update_min_stock=True):
+        result = self.engine.save_forecasts(forecasts, update_min_stock)
+        self._emit("products_changed", result["products"])
+        return result
+
+    # SALES
+    def record_sale(self, product_id, quantity, sale_price=None, sale_date=None):
+        try:
+            result = self.engine.record_sale(product_id, quantity, sale_price, sale_date)
+        except (InsufficientStock, ProductNotFound) as e:
+            self._sale_failed(product_id, e)
+            raise
+        self._sale_recorded(product_id, result)
+        return result
+
+    def record_sales_batch(self, lines):
+        results = self.engine.record_sales_batch(lines)
+        self._batch_recorded(results)
+        return results
+
+    def insert_sales(self, sales):
+        rows = self.engine.insert_sales(sales)
+        if rows:
+            self._emit("sales_recorded", rows)
+        return rows
+
+    def record_order(self, lines):
+        result = self.engine.record_order(lines)
+        # A refused order has no successful lines, so nothing is published
+        self._batch_recorded(result["lines"])
+        return result
+
+
+class AsyncObservedEngine(ObservedEngine):
+    """ObservedEngine for async engines; listeners are still called synchronously"""
+
+    async def get_product(self, product_id):
+        product = self.cache.get(product_id) if self.cache is not None else None
+        if product is None:
+            generation = self.cache.generation if self.cache is not None else None
+            product = await self.engine.get_product(product_id)
+            if product is not None and self.cache is not None:
+                self.cache.put(product, generation)
+        return product
+
+    async def get_product_by_sku(self, sku):
+        product = self.cache.get_by_sku(sku) if self.cache is not None else None
+        if product is None:
+            generation = self.cache.generation if self.cache is not None else None
+            product = await self.engine.get_product_by_sku(sku)
+            if product is not None and self.cache is not None:
+                self.cache.put(product, generation)
+        return product
+
+    async def insert_product(self, product_data):
+        rows = await self.engine.insert_product(product_data)
+        self._emit("products_changed", rows)
+        return rows
+
+    async def update_product_stock(self, product_id, new_stock):
+        rows = await self.engine.update_product_stock(product_id, new_stock)
+        self._emit("products_changed", rows)
+        return rows
+
+    async def update_product(self, product_id, fields):
+        try:
+            rows = await self.engine.update_product(product_id, fields)
+        except ProductNotFound:
+            self._emit("product_removed", str(product_id))
+            raise
+        self._emit("products_changed", rows)
+        return rows
+
+    async def delete_product(self, product_id):
+        try:
+            rows = await self.engine.delete_product(product_id)
+        except ProductNotFound:
+            self._emit("product_removed", str(product_id))
+            raise
+        self._emit("product_removed", str(product_id))
+        return rows
+
+    async def adjust_product_stock(self, product_id, delta=None, new_stock=None, expected_updated_at=None):
+        try:
+            rows = await self.engine.adjust_product_stock(product_id, delta, new_stock, expected_updated_at)
+        except (StockConflict, ProductNotFound) as e:
+            self._stock_refused(product_id, e)
+            raise
+        self._emit("products_changed", rows)
+        return rows
+
+    async def upsert_products(self, rows, defaults=None):
+        result = await self.engine.upsert_products(rows, defaults)
+        self._emit("products_changed", result["products"])
+        return result
+
+    async def save_forecasts(self, forecasts, update_min_stock=True):
+        result = await self.engine.save_forecasts(forecasts, update_min_stock)
+        self._emit("products_changed", result["products"])
+        return result
+
+    # SALES
+    async def record_sale(self, product_id, quantity, sale_price=None, sale_date=None):
+        try:
+            result = await self.engine.record_sale(product_id, quantity, sale_price, sale_date)
+        except (InsufficientStock, ProductNotFound) as e:
+            self._sale_failed(product_id, e)
+            raise
+        self._sale_recorded(product_id, result)
+        return result
+
+    async def record_sales_batch(self, lines):
+        results = await self.engine.record_sales_batch(lines)
+        self._batch_recorded(results)
+        return results
+
+    async def insert_sales(self, sales):
+        rows = await self.engine.insert_sales(sales)
+        if rows:
+            self._emit("sales_recorded", rows)
+        return rows
+
+    async def record_order(self, lines):
+        result = await self.engine.record_order(lines)
+        self._batch_recorded(result["lines"])
+        return result
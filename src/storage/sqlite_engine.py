@@ -0,0 +1,826 @@
+import json
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from .base import (
+    ORDER_REFUSED, PRODUCT_FIELDS, DuplicateSKU, InsufficientStock, ProductInUse, ProductNotFound, StockConflict, StorageEngine,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    sku TEXT UNIQUE NOT NULL,
+    price REAL NOT NULL,
+    cost_price REAL,
+    stock_quantity INTEGER DEFAULT 0,
+    min_stock_level INTEGER DEFAULT 5,
+    category TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id TEXT PRIMARY KEY,
+    line_count INTEGER NOT NULL,
+    units INTEGER NOT NULL,
+    total REAL NOT NULL,
+    created_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sales (
+    id TEXT PRIMARY KEY,
+    product_id TEXT REFERENCES products(id),
+    quantity_sold INTEGER NOT NULL,
+    sale_price REAL NOT NULL,
+    cost_price REAL,
+    sale_date TEXT,
+    order_id TEXT REFERENCES orders(id)
+);
+
+CREATE TABLE IF NOT EXISTS product_forecasts (
+    product_id TEXT PRIMARY KEY REFERENCES products(id),
+    daily_demand REAL NOT NULL,
+    forecast TEXT NOT NULL,
+    lead_time_days INTEGER NOT NULL,
+    lead_time_demand REAL NOT NULL,
+    safety_stock REAL NOT NULL,
+    reorder_point INTEGER NOT NULL,
+    history_start TEXT,
+    history_end TEXT,
+    computed_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_products_name ON products(name, id);
+CREATE INDEX IF NOT EXISTS idx_products_low_stock ON products(stock_quantity) WHERE stock_quantity < min_stock_level;
+CREATE INDEX IF NOT EXISTS idx_sales_product_id ON sales(product_id);
+CREATE INDEX IF NOT EXISTS idx_sales_sale_date ON sales(sale_date, id);
+"""
+
+# Daily rollups kept current by triggers, so every writer (single sales, batches,
+# direct inserts) updates them in the same transaction as the sale itself.
+# cost and costed_revenue only count sales with a known cost_price, so profit
+# is never inflated by sales of products that have no cost on record.
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sales_daily (
+    day TEXT PRIMARY KEY,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    units INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    cost REAL NOT NULL DEFAULT 0,
+    costed_revenue REAL NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS sales_daily_product (
+    day TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    units INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    cost REAL NOT NULL DEFAULT 0,
+    costed_revenue REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, product_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_sales_daily_product_product ON sales_daily_product(product_id, day);
+
+-- Recreated on every open so databases from before the cost columns get the new bodies
+DROP TRIGGER IF EXISTS sales_rollup_insert;
+CREATE TRIGGER sales_rollup_insert AFTER INSERT ON sales BEGIN
+    INSERT INTO sales_daily (day, sale_count, units, revenue, cost, costed_revenue)
+    VALUES (
+        substr(NEW.sale_date, 1, 10), 1, NEW.quantity_sold, NEW.quantity_sold * NEW.sale_price,
+        coalesce(NEW.quantity_sold * NEW.cost_price, 0),
+        CASE WHEN NEW.cost_price IS NULL THEN 0 ELSE NEW.quantity_sold * NEW.sale_price END
+    )
+    ON CONFLICT(day) DO UPDATE SET
+        sale_count = sale_count + 1,
+        units = units + excluded.units,
+        revenue = revenue + excluded.revenue,
+        cost = cost + excluded.cost,
+        costed_revenue = costed_revenue + excluded.costed_revenue;
+    INSERT INTO sales_daily_product (day, product_id, sale_count, units, revenue, cost, costed_revenue)
+    VALUES (
+        substr(NEW.sale_date, 1, 10), NEW.product_id, 1, NEW.quantity_sold, NEW.quantity_sold * NEW.sale_price,
+        coalesce(NEW.quantity_sold * NEW.cost_price, 0),
+        CASE WHEN NEW.cost_price IS NULL THEN 0 ELSE NEW.quantity_sold * NEW.sale_price END
+    )
+    ON CONFLICT(day, product_id) DO UPDATE SET
+        sale_count = sale_count + 1,
+        units = units + excluded.units,
+        revenue = revenue + excluded.revenue,
+        cost = cost + excluded.cost,
+        costed_revenue = costed_revenue + excluded.costed_revenue;
+END;
+
+DROP TRIGGER IF EXISTS sales_rollup_delete;
+CREATE TRIGGER sales_rollup_delete AFTER DELETE ON sales BEGIN
+    UPDATE sales_daily SET
+        sale_count = sale_count - 1,
+        units = units - OLD.quantity_sold,
+        revenue = revenue - OLD.quantity_sold * OLD.sale_price,
+        cost = cost - coalesce(OLD.quantity_sold * OLD.cost_price, 0),
+        costed_revenue = costed_revenue - CASE WHEN OLD.cost_price IS NULL THEN 0 ELSE OLD.quantity_sold * OLD.sale_price END
+    WHERE day = substr(OLD.sale_date, 1, 10);
+    UPDATE sales_daily_product SET
+        sale_count = sale_count - 1,
+        units = units - OLD.quantity_sold,
+        revenue = revenue - OLD.quantity_sold * OLD.sale_price,
+        cost = cost - coalesce(OLD.quantity_sold * OLD.cost_price, 0),
+        costed_revenue = costed_revenue - CASE WHEN OLD.cost_price IS NULL THEN 0 ELSE OLD.quantity_sold * OLD.sale_price END
+    WHERE day = substr(OLD.sale_date, 1, 10) AND product_id = OLD.product_id;
+END;
+"""
+
+# Columns added after the first release: (table, column, type), applied to older files on open
+UPGRADES = (
+    ("sales", "cost_price", "REAL"),
+    ("sales_daily", "cost", "REAL NOT NULL DEFAULT 0"),
+    ("sales_daily", "costed_revenue", "REAL NOT NULL DEFAULT 0"),
+    ("sales_daily_product", "cost", "REAL NOT NULL DEFAULT 0"),
+    ("sales_daily_product", "costed_revenue", "REAL NOT NULL DEFAULT 0"),
+    ("sales", "order_id", "TEXT REFERENCES orders(id)"),
+)
+
+# Indexes on upgraded columns, created once UPGRADES has run
+UPGRADE_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_sales_order_id ON sales(order_id) WHERE order_id IS NOT NULL;
+"""
+
+# Sales recorded before costs were stamped take the product's current cost
+BACKFILL_SALE_COSTS = """
+UPDATE sales SET cost_price = (SELECT cost_price FROM products WHERE products.id = sales.product_id)
+WHERE cost_price IS NULL
+"""
+
+# Bumped by every write to a table; the API turns them into ETags
+VERSION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS table_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+-- Random starting points, so ETags from a previous database file never match this one
+INSERT OR IGNORE INTO table_versions (name, version)
+    VALUES ('products', abs(random() % 1000000000)), ('sales', abs(random() % 1000000000));
+""" + "".join(
+    f"""
+CREATE TRIGGER IF NOT EXISTS {table}_version_{op.lower()} AFTER {op} ON {table} BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+END;
+"""
+    for table in ("products", "sales")
+    for op in ("INSERT", "UPDATE", "DELETE")
+)
+
+REBUILD_ROLLUPS = """
+DELETE FROM sales_daily;
+DELETE FROM sales_daily_product;
+INSERT INTO sales_daily (day, sale_count, units, revenue, cost, costed_revenue)
+    SELECT substr(sale_date, 1, 10), count(*), sum(quantity_sold), sum(quantity_sold * sale_price),
+           total(quantity_sold * cost_price), total(CASE WHEN cost_price IS NULL THEN 0 ELSE quantity_sold * sale_price END)
+    FROM sales GROUP BY 1;
+INSERT INTO sales_daily_product (day, product_id, sale_count, units, revenue, cost, costed_revenue)
+    SELECT substr(sale_date, 1, 10), product_id, count(*), sum(quantity_sold), sum(quantity_sold * sale_price),
+           total(quantity_sold * cost_price), total(CASE WHEN cost_price IS NULL THEN 0 ELSE quantity_sold * sale_price END)
+    FROM sales GROUP BY 1, 2;
+"""
+
+PRODUCT_COLUMNS = (
+    "id", "name", "description", "sku", "price", "cost_price", "stock_quantity",
+    "min_stock_level", "category", "created_at", "updated_at",
+)
+SALE_COLUMNS = ("id", "product_id", "quantity_sold", "sale_price", "cost_price", "sale_date")
+ORDER_COLUMNS = ("id", "line_count", "units", "total", "created_at")
+FORECAST_COLUMNS = (
+    "product_id", "daily_demand", "forecast", "lead_time_days", "lead_time_demand", "safety_stock",
+    "reorder_point", "history_start", "history_end", "computed_at",
+)
+
+# Stay well below SQLite's bound-parameter limit when building IN (...) lists
+SQL_CHUNK = 500
+
+SALE_WITH_PRODUCT = """
+SELECT s.*, p.name AS product_name, p.sku AS product_sku
+FROM sales s LEFT JOIN products p ON p.id = s.product_id
+"""
+
+
+def utc_now():
+    """Timestamp in the same naive-UTC ISO format Postgres returns for TIMESTAMP columns"""
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat(timespec="microseconds")
+
+
+def _sale_row(row):
+    """Reshape a joined sales row like PostgREST's embedded ``products(name, sku)``"""
+    sale = dict(row)
+    name = sale.pop("product_name")
+    sku = sale.pop("product_sku")
+    sale["products"] = {"name": name, "sku": sku} if sku is not None else None
+    return sale
+
+
+class SQLiteEngine(StorageEngine):
+    """
+    Embedded engine for edge stores, offline testing and benchmarks.
+
+    A single connection is shared between threads and guarded by a lock, so
+    every statement sees a consistent database without network round trips.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path="flash_inventory.db"):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        with self.lock:
+            if path != ":memory:":
+                self.conn.execute("PRAGMA journal_mode=WAL")
+                self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("PRAGMA foreign_keys=ON")
+            self.conn.executescript(SCHEMA)
+            backfill = self.conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM sqlite_master WHERE name = 'sales_daily')"
+            ).fetchone()[0] == 0
+            if self._upgrade():
+                self.conn.execute(BACKFILL_SALE_COSTS)
+                backfill = True
+            self.conn.executescript(UPGRADE_INDEXES)
+            self.conn.executescript(ROLLUP_SCHEMA)
+            self.conn.executescript(VERSION_SCHEMA)
+        if backfill:
+            # Existing database from before the rollups (or their cost columns): fill them from history once
+            self.rebuild_sales_rollups()
+
+    def _upgrade(self):
+        """Add columns missing from an older database file; True if any were added"""
+        added = False
+        for table, column, declaration in UPGRADES:
+            columns = [row["name"] for row in self.conn.execute(f"PRAGMA table_info({table})")]
+            if columns and column not in columns:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+                added = True
+        return added
+
+    @contextmanager
+    def transaction(self):
+        """Run a block of statements atomically under the engine lock"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def _insert(self, table, columns, data):
+        row = {key: value for key, value in data.items() if key in columns}
+        names = ", ".join(row)
+        marks = ", ".join("?" for _ in row)
+        with self.transaction() as conn:
+            conn.execute(f"INSERT INTO {table} ({names}) VALUES ({marks})", tuple(row.values()))
+            return [dict(conn.execute(f"SELECT * FROM {table} WHERE id = ?", (row["id"],)).fetchone())]
+
+    def ping(self):
+        self._query("SELECT 1")
+
+    # PRODUCTS
+    def insert_product(self, product_data):
+        now = utc_now()
+        data = {"id": str(uuid.uuid4()), "created_at": now, "updated_at": now, **product_data}
+        try:
+            return self._insert("products", PRODUCT_COLUMNS, data)
+        except sqlite3.IntegrityError as e:
+            if "products.sku" in str(e):
+                raise DuplicateSKU(product_data.get("sku")) from e
+            raise
+
+    def list_products(self):
+        return self._query("SELECT * FROM products ORDER BY name, id")
+
+    def list_products_page(self, limit, after=None):
+        if after is None:
+            return self._query("SELECT * FROM products ORDER BY name, id LIMIT ?", (limit,))
+        return self._query(
+            "SELECT * FROM products WHERE (name, id) > (?, ?) ORDER BY name, id LIMIT ?",
+            (*after, limit),
+        )
+
+    def get_product(self, product_id):
+        rows = self._query("SELECT * FROM products WHERE id = ?", (str(product_id),))
+        return rows[0] if rows else None
+
+    def get_product_by_sku(self, sku):
+        rows = self._query("SELECT * FROM products WHERE sku = ?", (sku,))
+        return rows[0] if rows else None
+
+    def get_products_by_ids(self, product_ids):
+        product_ids = [str(product_id) for product_id in product_ids]
+        products = []
+        for start in range(0, len(product_ids), SQL_CHUNK):
+            chunk = product_ids[start:start + SQL_CHUNK]
+            marks = ", ".join("?" for _ in chunk)
+            products.extend(self._query(f"SELECT * FROM products WHERE id IN ({marks})", chunk))
+        return products
+
+    def update_product_stock(self, product_id, new_stock):
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE products SET stock_quantity = ?, updated_at = ? WHERE id = ?",
+                (new_stock, utc_now(), str(product_id)),
+            )
+            return [dict(row) for row in conn.execute("SELECT * FROM products WHERE id = ?", (str(product_id),))]
+
+    def update_product(self, product_id, fields):
+        unknown = set(fields) - set(PRODUCT_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot update: {', '.join(sorted(unknown))}")
+        assignments = ", ".join(f"{column} = ?" for column in (*fields, "updated_at"))
+        try:
+            with self.transaction() as conn:
+                conn.execute(
+                    f"UPDATE products SET {assignments} WHERE id = ?", (*fields.values(), utc_now(), str(product_id))
+                )
+                rows = [dict(row) for row in conn.execute("SELECT * FROM products WHERE id = ?", (str(product_id),))]
+        except sqlite3.IntegrityError as e:
+            if "products.sku" in str(e):
+                raise DuplicateSKU(fields.get("sku")) from e
+            raise
+        if not rows:
+            raise ProductNotFound(product_id)
+        return rows
+
+    def delete_product(self, product_id):
+        product_id = str(product_id)
+        with self.transaction() as conn:
+            rows = [dict(row) for row in conn.execute("SELECT * FROM products WHERE id = ?", (product_id,))]
+            if not rows:
+                raise ProductNotFound(product_id)
+            if conn.execute("SELECT 1 FROM sales WHERE product_id = ? LIMIT 1", (product_id,)).fetchone():
+                raise ProductInUse(product_id)
+            # Forecasts cascade, as on Postgres (0010_forecasts.sql)
+            conn.execute("DELETE FROM product_forecasts WHERE product_id = ?", (product_id,))
+            conn.execute("DELETE FROM products WHERE id = ?", (product_id,))
+        return rows
+
+    def adjust_product_stock(self, product_id, delta=None, new_stock=None, expected_updated_at=None):
+        value, params = ("stock_quantity + ?", [delta]) if new_stock is None else ("?", [new_stock])
+        sql = f"UPDATE products SET stock_quantity = {value}, updated_at = ? WHERE id = ? AND {value} >= 0"
+        params = [*params, utc_now(), str(product_id), *params]
+        if expected_updated_at is not None:
+            sql += " AND updated_at = ?"
+            params.append(str(expected_updated_at))
+        with self.transaction() as conn:
+            changed = conn.execute(sql, params).rowcount
+            rows = [dict(row) for row in conn.execute("SELECT * FROM products WHERE id = ?", (str(product_id),))]
+        if not rows:
+            raise ProductNotFound(product_id)
+        if not changed:
+            raise StockConflict(rows[0], expected_updated_at is not None and rows[0]["updated_at"] != str(expected_updated_at))
+        return rows
+
+    def upsert_products(self, rows, defaults=None):
+        if not rows:
+            return {"inserted": 0, "updated": 0, "products": []}
+        now = utc_now()
+        with self.transaction() as conn:
+            existing = set()
+            skus = [row["sku"] for row in rows]
+            for start in range(0, len(skus), SQL_CHUNK):
+                chunk = skus[start:start + SQL_CHUNK]
+                marks = ", ".join("?" for _ in chunk)
+                existing.update(r["sku"] for r in conn.execute(f"SELECT sku FROM products WHERE sku IN ({marks})", chunk))
+            # Existing products only get the columns their row carries, grouped so each shape is one statement
+            inserts, updates = [], {}
+            for row in rows:
+                row = {column: value for column, value in row.items() if column in PRODUCT_COLUMNS}
+                if row["sku"] in existing:
+                    columns = tuple(column for column in row if column not in ("id", "sku", "created_at"))
+                    updates.setdefault(columns, []).append(tuple(row[column] for column in columns) + (now, row["sku"]))
+                else:
+                    inserts.append({"id": str(uuid.uuid4()), "created_at": now, "updated_at": now, **(defaults or {}), **row})
+            for columns, values in updates.items():
+                assignments = ", ".join(f"{column} = ?" for column in columns + ("updated_at",))
+                conn.executemany(f"UPDATE products SET {assignments} WHERE sku = ?", values)
+            for row in inserts:
+                conn.execute(
+                    f"INSERT INTO products ({', '.join(row)}) VALUES ({', '.join('?' for _ in row)})", tuple(row.values())
+                )
+            products = []
+            for start in range(0, len(skus), SQL_CHUNK):
+                chunk = skus[start:start + SQL_CHUNK]
+                marks = ", ".join("?" for _ in chunk)
+                products.extend(dict(r) for r in conn.execute(f"SELECT * FROM products WHERE sku IN ({marks})", chunk))
+        return {"inserted": len(rows) - len(existing), "updated": len(existing), "products": products}
+
+    def list_low_stock(self):
+        # Same predicate as idx_products_low_stock, so only low rows are visited
+        return self._query("SELECT * FROM products WHERE stock_quantity < min_stock_level ORDER BY stock_quantity")
+
+    def iter_products(self, batch_size=1000):
+        last_id = ""
+        while True:
+            page = self._query("SELECT * FROM products WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size))
+            if not page:
+                return
+            yield page
+            last_id = page[-1]["id"]
+
+    # SALES
+    def insert_sale(self, sale_data):
+        data = {"id": str(uuid.uuid4()), "sale_date": utc_now(), **sale_data}
+        data["product_id"] = str(data["product_id"])
+        with self.lock:
+            if data.get("cost_price") is None:
+                # Stamp the product's current cost, like record_sale does
+                product = self.conn.execute(
+                    "SELECT cost_price FROM products WHERE id = ?", (data["product_id"],)
+                ).fetchone()
+                data["cost_price"] = product["cost_price"] if product else None
+            return self._insert("sales", SALE_COLUMNS, data)
+
+    def insert_sales(self, sales):
+        rows = [{**{column: sale.get(column) for column in SALE_COLUMNS}, "product_id": str(sale["product_id"])} for sale in sales]
+        statement = f"INSERT OR IGNORE INTO sales ({', '.join(SALE_COLUMNS)}) VALUES ({', '.join('?' for _ in SALE_COLUMNS)})"
+        inserted = []
+        with self.transaction() as conn:
+            for row in rows:
+                # Ignored when the id is already recorded (a resent batch)
+                if conn.execute(statement, tuple(row.values())).rowcount:
+                    inserted.append(row)
+        return inserted
+
+    def record_sale(self, product_id, quantity, sale_price=None, sale_date=None):
+        if quantity <= 0:
+            raise ValueError("Quantity must be greater than 0")
+        product_id = str(product_id)
+        with self.transaction() as conn:
+            updated = conn.execute(
+                "UPDATE products SET stock_quantity = stock_quantity - ?, updated_at = ? "
+                "WHERE id = ? AND stock_quantity >= ?",
+                (quantity, utc_now(), product_id, quantity),
+            )
+            product = conn.execute(
+                "SELECT stock_quantity, price, cost_price FROM products WHERE id = ?", (product_id,)
+            ).fetchone()
+            if product is None:
+                raise ProductNotFound(product_id)
+            if updated.rowcount == 0:
+                raise InsufficientStock(product["stock_quantity"], product_id)
+
+            sale = {
+                "id": str(uuid.uuid4()),
+                "product_id": product_id,
+                "quantity_sold": quantity,
+                "sale_price": sale_price if sale_price is not None else product["price"],
+                "cost_price": product["cost_price"],
+                "sale_date": sale_date or utc_now(),
+            }
+            conn.execute(
+                "INSERT INTO sales (id, product_id, quantity_sold, sale_price, cost_price, sale_date) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                tuple(sale.values()),
+            )
+        return {"sale": sale, "stock_quantity": product["stock_quantity"]}
+
+    def record_sales_batch(self, lines):
+        product_ids = sorted({str(line["product_id"]) for line in lines})
+        sale_ids = [str(line["id"]) for line in lines if line.get("id") is not None]
+        results = []
+        sales = []
+        with self.transaction() as conn:
+            stock = {}
+            for start in range(0, len(product_ids), SQL_CHUNK):
+                chunk = product_ids[start:start + SQL_CHUNK]
+                marks = ", ".join("?" for _ in chunk)
+                for row in conn.execute(f"SELECT id, stock_quantity, price, cost_price FROM products WHERE id IN ({marks})", chunk):
+                    stock[row["id"]] = row
+            # Sales already recorded under a client-supplied id (a resent batch) are not recorded again
+            known = set()
+            for start in range(0, len(sale_ids), SQL_CHUNK):
+                chunk = sale_ids[start:start + SQL_CHUNK]
+                marks = ", ".join("?" for _ in chunk)
+                known.update(row["id"] for row in conn.execute(f"SELECT id FROM sales WHERE id IN ({marks})", chunk))
+
+            running = {}
+            now = utc_now()
+            for index, line in enumerate(lines):
+                product_id = str(line["product_id"])
+                quantity = line["quantity"]
+                product = stock.get(product_id)
+                if line.get("id") is not None and str(line["id"]) in known:
+                    results.append({
+                        "index": index,
+                        "success": True,
+                        "duplicate": True,
+                        "sale": {
+                            "id": str(line["id"]),
+                            "product_id": product_id,
+                            "quantity_sold": quantity,
+                            "sale_price": line.get("sale_price"),
+                            "sale_date": line.get("sale_date"),
+                        },
+                        "stock_quantity": product["stock_quantity"] - running.get(product_id, 0) if product else None,
+                    })
+                    continue
+                if product is None:
+                    results.append({"index": index, "success": False, "error": "Product not found"})
+                    continue
+                if quantity <= 0:
+                    results.append({"index": index, "success": False, "error": "Quantity must be greater than 0"})
+                    continue
+                # Only accepted lines count against the stock left for the lines after them
+                available = product["stock_quantity"] - running.get(product_id, 0)
+                if quantity > available:
+                    results.append({
+                        "index": index,
+                        "success": False,
+                        "error": f"Not enough stock (Available: {max(available, 0)})",
+                        "available": max(available, 0),
+                    })
+                    continue
+                running[product_id] = running.get(product_id, 0) + quantity
+                sale = {
+                    "id": str(line["id"]) if line.get("id") is not None else str(uuid.uuid4()),
+                    "product_id": product_id,
+                    "quantity_sold": quantity,
+                    "sale_price": line.get("sale_price") if line.get("sale_price") is not None else product["price"],
+                    "cost_price": product["cost_price"],
+                    "sale_date": line.get("sale_date") or now,
+                }
+                sales.append(sale)
+                results.append({
+                    "index": index,
+                    "success": True,
+                    "sale": sale,
+                    "stock_quantity": product["stock_quantity"] - running[product_id],
+                })
+
+            conn.executemany(
+                "UPDATE products SET stock_quantity = stock_quantity - ?, updated_at = ? WHERE id = ?",
+                [(quantity, now, product_id) for product_id, quantity in running.items()],
+            )
+            conn.executemany(
+                "INSERT INTO sales (id, product_id, quantity_sold, sale_price, cost_price, sale_date) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [tuple(sale.values()) for sale in sales],
+            )
+        return results
+
+    def record_order(self, lines):
+        product_ids = sorted({str(line["product_id"]) for line in lines})
+        results = []
+        sales = []
+        with self.transaction() as conn:
+            stock = {}
+            for start in range(0, len(product_ids), SQL_CHUNK):
+                chunk = product_ids[start:start + SQL_CHUNK]
+                marks = ", ".join("?" for _ in chunk)
+                for row in conn.execute(f"SELECT id, stock_quantity, price, cost_price FROM products WHERE id IN ({marks})", chunk):
+                    stock[row["id"]] = row
+
+            order_id = str(uuid.uuid4())
+            now = utc_now()
+            running = {}
+            for index, line in enumerate(lines):
+                product_id = str(line["product_id"])
+                quantity = line["quantity"]
+                product = stock.get(product_id)
+                if product is None:
+                    results.append({"index": index, "success": False, "error": "Product not found"})
+                    continue
+                if quantity <= 0:
+                    results.append({"index": index, "success": False, "error": "Quantity must be greater than 0"})
+                    continue
+                # Only accepted lines count against the stock left for the lines after them
+                available = product["stock_quantity"] - running.get(product_id, 0)
+                if quantity > available:
+                    results.append({
+                        "index": index,
+                        "success": False,
+                        "error": f"Not enough stock (Available: {max(available, 0)})",
+                        "available": max(available, 0),
+                    })
+                    continue
+                running[product_id] = running.get(product_id, 0) + quantity
+                sale = {
+                    "id": str(uuid.uuid4()),
+                    "product_id": product_id,
+                    "quantity_sold": quantity,
+                    "sale_price": line.get("sale_price") if line.get("sale_price") is not None else product["price"],
+                    "cost_price": product["cost_price"],
+                    "sale_date": now,
+                    "order_id": order_id,
+                }
+                sales.append(sale)
+                results.append({
+                    "index": index,
+                    "success": True,
+                    "sale": sale,
+                    "stock_quantity": product["stock_quantity"] - running[product_id],
+                })
+
+            if len(sales) < len(lines):
+                # All or nothing: one refused line and the order writes nothing
+                return {"order": None, "lines": [
+                    result if not result["success"] else {"index": result["index"], "success": False, "error": ORDER_REFUSED}
+                    for result in results
+                ]}
+
+            order = {
+                "id": order_id,
+                "line_count": len(sales),
+                "units": sum(sale["quantity_sold"] for sale in sales),
+                "total": round(sum(sale["quantity_sold"] * sale["sale_price"] for sale in sales), 2),
+                "created_at": now,
+            }
+            conn.execute(
+                f"INSERT INTO orders ({', '.join(ORDER_COLUMNS)}) VALUES ({', '.join('?' for _ in ORDER_COLUMNS)})",
+                tuple(order.values()),
+            )
+            conn.executemany(
+                "UPDATE products SET stock_quantity = stock_quantity - ?, updated_at = ? WHERE id = ?",
+                [(quantity, now, product_id) for product_id, quantity in running.items()],
+            )
+            conn.executemany(
+                "INSERT INTO sales (id, product_id, quantity_sold, sale_price, cost_price, sale_date, order_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [tuple(sale.values()) for sale in sales],
+            )
+        return {"order": order, "lines": results}
+
+    def get_order(self, order_id):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM orders WHERE id = ?", (str(order_id),)).fetchone()
+            if row is None:
+                return None
+            sales = self._query(SALE_WITH_PRODUCT + " WHERE s.order_id = ? ORDER BY s.id", (str(order_id),))
+        return {**dict(row), "sales": [_sale_row(sale) for sale in sales]}
+
+    def list_sales(self, limit=None):
+        sql = SALE_WITH_PRODUCT + " ORDER BY s.sale_date DESC, s.id DESC"
+        params = ()
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = (limit,)
+        return [_sale_row(row) for row in self._query(sql, params)]
+
+    def list_sales_page(self, limit, before=None):
+        if before is None:
+            sql, params = SALE_WITH_PRODUCT, ()
+        else:
+            sql, params = SALE_WITH_PRODUCT + " WHERE (s.sale_date, s.id) < (?, ?)", tuple(before)
+        sql += " ORDER BY s.sale_date DESC, s.id DESC LIMIT ?"
+        return [_sale_row(row) for row in self._query(sql, (*params, limit))]
+
+    def iter_sales(self, start=None, end=None, batch_size=1000):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("sale_date >= ?")
+            params.append(str(start))
+        if end is not None:
+            clauses.append("sale_date < ?")
+            params.append(str(end))
+        after = None
+        while True:
+            where = clauses + (["(sale_date, id) > (?, ?)"] if after else [])
+            sql = f"SELECT {', '.join(SALE_COLUMNS)} FROM sales"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            page = self._query(sql + " ORDER BY sale_date, id LIMIT ?", (*params, *(after or ()), batch_size))
+            if not page:
+                return
+            yield page
+            after = (page[-1]["sale_date"], page[-1]["id"])
+
+    def get_sales_by_product(self, product_id):
+        return self._query("SELECT * FROM sales WHERE product_id = ?", (str(product_id),))
+
+    def table_versions(self):
+        return {row["name"]: row["version"] for row in self._query("SELECT name, version FROM table_versions")}
+
+    # ROLLUPS
+    @staticmethod
+    def _day_range(sql, since, until, params=()):
+        clauses, params = [], list(params)
+        if since is not None:
+            clauses.append("day >= ?")
+            params.append(str(since))
+        if until is not None:
+            clauses.append("day <= ?")
+            params.append(str(until))
+        if clauses:
+            sql += (" AND " if " WHERE " in sql else " WHERE ") + " AND ".join(clauses)
+        return sql + " ORDER BY day", params
+
+    def list_daily_sales(self, since=None, until=None):
+        return self._query(*self._day_range("SELECT * FROM sales_daily", since, until))
+
+    def list_daily_product_sales(self, since=None, until=None, product_id=None):
+        sql, params = "SELECT * FROM sales_daily_product", ()
+        if product_id is not None:
+            sql, params = sql + " WHERE product_id = ?", (str(product_id),)
+        return self._query(*self._day_range(sql, since, until, params))
+
+    def iter_daily_product_sales(self, since=None, until=None, batch_size=10000):
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("day >= ?")
+            params.append(str(since))
+        if until is not None:
+            clauses.append("day <= ?")
+            params.append(str(until))
+        after = None
+        while True:
+            where = clauses + (["(product_id, day) > (?, ?)"] if after else [])
+            # Left to itself the planner takes the (day, product_id) key for the day range and sorts every page
+            sql = "SELECT * FROM sales_daily_product INDEXED BY idx_sales_daily_product_product"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            page = self._query(sql + " ORDER BY product_id, day LIMIT ?", (*params, *(after or ()), batch_size))
+            if not page:
+                return
+            yield page
+            after = (page[-1]["product_id"], page[-1]["day"])
+
+    def dashboard_summary(self, since):
+        # A single statement reads one consistent snapshot
+        rows = self._query(
+            "SELECT (SELECT count(*) FROM products) AS total_products, "
+            "(SELECT count(*) FROM products WHERE stock_quantity < min_stock_level) AS low_stock_count, "
+            "coalesce(sum(sale_count), 0) AS sale_count, coalesce(sum(units), 0) AS units, "
+            "coalesce(sum(revenue), 0) AS revenue "
+            "FROM sales_daily WHERE day >= ?",
+            (str(since),),
+        )
+        return rows[0]
+
+    def rebuild_sales_rollups(self):
+        with self.transaction() as conn:
+            for statement in REBUILD_ROLLUPS.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            return conn.execute("SELECT count(*) FROM sales_daily").fetchone()[0]
+
+    # FORECASTS
+    def save_forecasts(self, forecasts, update_min_stock=True):
+        if not forecasts:
+            return {"saved": 0, "products": []}
+        now = utc_now()
+        updates = ", ".join(f"{column} = excluded.{column}" for column in FORECAST_COLUMNS[1:])
+        sql = (
+            f"INSERT INTO product_forecasts ({', '.join(FORECAST_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in FORECAST_COLUMNS)}) ON CONFLICT(product_id) DO UPDATE SET {updates}"
+        )
+        reorder = {str(forecast["product_id"]): forecast["reorder_point"] for forecast in forecasts}
+        with self.transaction() as conn:
+            levels = {}
+            ids = list(reorder)
+            for start in range(0, len(ids), SQL_CHUNK):
+                chunk = ids[start:start + SQL_CHUNK]
+                marks = ", ".join("?" for _ in chunk)
+                levels.update(conn.execute(f"SELECT id, min_stock_level FROM products WHERE id IN ({marks})", chunk))
+            conn.executemany(sql, [
+                tuple(
+                    json.dumps(forecast[column]) if column == "forecast"
+                    else now if column == "computed_at"
+                    else str(forecast[column]) if column == "product_id"
+                    else forecast.get(column)
+                    for column in FORECAST_COLUMNS
+                )
+                for forecast in forecasts if str(forecast["product_id"]) in levels
+            ])
+            changed = [
+                product_id for product_id, level in levels.items()
+                if update_min_stock and level != reorder[product_id]
+            ]
+            conn.executemany(
+                "UPDATE products SET min_stock_level = ?, updated_at = ? WHERE id = ?",
+                [(reorder[product_id], now, product_id) for product_id in changed],
+            )
+            products = []
+            for start in range(0, len(changed), SQL_CHUNK):
+                chunk = changed[start:start + SQL_CHUNK]
+                marks = ", ".join("?" for _ in chunk)
+                products.extend(dict(r) for r in conn.execute(f"SELECT * FROM products WHERE id IN ({marks})", chunk))
+        return {"saved": len(levels), "products": products}
+
+    def get_forecast(self, product_id):
+        rows = self._query("SELECT * FROM product_forecasts WHERE product_id = ?", (str(product_id),))
+        if not rows:
+            return None
+        return {**rows[0], "forecast": json.loads(rows[0]["forecast"])}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
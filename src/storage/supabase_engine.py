@@ -0,0 +1,388 @@
+import os
+
+from postgrest.exceptions import APIError
+from supabase import create_client
+
+from .base import PRODUCT_FIELDS, DuplicateSKU, InsufficientStock, ProductInUse, ProductNotFound, StockConflict, StorageEngine
+
+SALE_WITH_PRODUCT = "*, products(name, sku)"
+
+
+def _quote(value):
+    """Quote a value for a PostgREST or=() filter (commas, dots and parentheses are reserved)"""
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def _is_duplicate_sku(error):
+    """Postgres unique_violation on products.sku"""
+    return error.code == "23505" and "sku" in f"{error.message} {error.details}"
+
+
+def _is_referenced(error):
+    """Postgres foreign_key_violation, e.g. deleting a product that has sales"""
+    return error.code == "23503"
+
+
+def _product_fields(fields):
+    unknown = set(fields) - set(PRODUCT_FIELDS)
+    if unknown:
+        raise ValueError(f"Cannot update: {', '.join(sorted(unknown))}")
+    return dict(fields)
+
+
+def _batch_payload(lines):
+    """JSON-ready sale lines for the record_sales_batch function"""
+    return [
+        {
+            "id": str(line["id"]) if line.get("id") is not None else None,
+            "product_id": str(line["product_id"]),
+            "quantity": line["quantity"],
+            "sale_price": line.get("sale_price"),
+            "sale_date": line.get("sale_date"),
+        }
+        for line in lines
+    ]
+
+
+def _order_payload(lines):
+    """JSON-ready order lines for the record_order function"""
+    return [
+        {"product_id": str(line["product_id"]), "quantity": line["quantity"], "sale_price": line.get("sale_price")}
+        for line in lines
+    ]
+
+
+def _order_row(rows):
+    """An order fetched with its embedded sales, or None"""
+    if not rows:
+        return None
+    order = rows[0]
+    order["sales"] = sorted(order.get("sales") or [], key=lambda sale: sale["id"])
+    return order
+
+
+ORDER_WITH_SALES = "*, sales(*, products(name, sku))"
+
+SALE_FIELDS = "id,product_id,quantity_sold,sale_price,cost_price,sale_date"
+
+# Ids (or SKUs) per in.() filter, so the request URL stays well below proxy limits
+ID_CHUNK = 200
+
+
+def _id_chunks(product_ids):
+    product_ids = [str(product_id) for product_id in product_ids]
+    return [product_ids[start:start + ID_CHUNK] for start in range(0, len(product_ids), ID_CHUNK)]
+
+
+def _upsert_groups(rows, existing, defaults):
+    """
+    Split upsert rows into lists sharing the same columns. PostgREST writes
+    every column of the payload on conflict, so existing SKUs keep only their
+    own columns and new ones are completed with ``defaults``.
+    """
+    groups = {}
+    for row in rows:
+        if row["sku"] not in existing:
+            row = {**(defaults or {}), **row}
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    return list(groups.values())
+
+
+def _sales_range_query(query, start, end, after):
+    """Keyset page of raw sales in [start, end), oldest first"""
+    if start is not None:
+        query = query.gte("sale_date", str(start))
+    if end is not None:
+        query = query.lt("sale_date", str(end))
+    if after is not None:
+        sale_date, last_id = map(_quote, after)
+        query = query.or_(f"sale_date.gt.{sale_date},and(sale_date.eq.{sale_date},id.gt.{last_id})")
+    return query.order("sale_date").order("id")
+
+
+def _rollup_query(query, since, until):
+    if since is not None:
+        query = query.gte("day", str(since))
+    if until is not None:
+        query = query.lte("day", str(until))
+    return query.order("day")
+
+
+def _forecast_payload(forecasts):
+    """JSON-ready forecast rows for the save_forecasts function"""
+    return [{**forecast, "product_id": str(forecast["product_id"])} for forecast in forecasts]
+
+
+def _daily_product_page(query, since, until, after):
+    """Keyset page of sales_daily_product rows ordered by (product_id, day)"""
+    if since is not None:
+        query = query.gte("day", str(since))
+    if until is not None:
+        query = query.lte("day", str(until))
+    if after is not None:
+        product_id, day = map(_quote, after)
+        query = query.or_(f"product_id.gt.{product_id},and(product_id.eq.{product_id},day.gt.{day})")
+    return query.order("product_id").order("day")
+
+
+def _sale_result(result, product_id):
+    """Turn the JSON status returned by the record_sale function into a result or an exception"""
+    status = result.get("status")
+    if status == "not_found":
+        raise ProductNotFound(product_id)
+    if status == "insufficient_stock":
+        raise InsufficientStock(result["available"], product_id)
+    if status == "invalid_quantity":
+        raise ValueError("Quantity must be greater than 0")
+    return {"sale": result["sale"], "stock_quantity": result["stock_quantity"]}
+
+
+def _stock_payload(product_id, delta, new_stock, expected_updated_at):
+    """Arguments of the adjust_stock function"""
+    return {
+        "p_product_id": str(product_id),
+        "p_delta": delta,
+        "p_stock": new_stock,
+        "p_expected_updated_at": str(expected_updated_at) if expected_updated_at is not None else None,
+    }
+
+
+def _stock_result(result, product_id):
+    """Turn the JSON status returned by the adjust_stock function into updated rows or an exception"""
+    status = result.get("status")
+    if status == "not_found":
+        raise ProductNotFound(product_id)
+    if status in ("modified", "insufficient_stock"):
+        raise StockConflict(result["product"], status == "modified")
+    return [result["product"]]
+
+
+class SupabaseEngine(StorageEngine):
+    """Remote engine backed by the Supabase (PostgREST) client"""
+
+    name = "supabase"
+
+    def __init__(self, url=None, key=None):
+        url = url or os.getenv("SUPABASE_URL")
+        key = key or os.getenv("SUPABASE_KEY")
+        if not url or not key:
+            raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in .env file")
+        self.client = create_client(url, key)
+
+    def ping(self):
+        self.client.table("products").select("id").limit(1).execute()
+
+    # PRODUCTS
+    def insert_product(self, product_data):
+        try:
+            return self.client.table("products").insert(product_data).execute().data
+        except APIError as e:
+            if _is_duplicate_sku(e):
+                raise DuplicateSKU(product_data.get("sku")) from e
+            raise
+
+    def list_products(self):
+        return self.client.table("products").select("*").order("name").execute().data
+
+    def list_products_page(self, limit, after=None):
+        query = self.client.table("products").select("*").order("name").order("id").limit(limit)
+        if after is not None:
+            name, last_id = map(_quote, after)
+            query = query.or_(f"name.gt.{name},and(name.eq.{name},id.gt.{last_id})")
+        return query.execute().data
+
+    def get_product(self, product_id):
+        rows = self.client.table("products").select("*").eq("id", str(product_id)).execute().data
+        return rows[0] if rows else None
+
+    def get_product_by_sku(self, sku):
+        rows = self.client.table("products").select("*").eq("sku", sku).execute().data
+        return rows[0] if rows else None
+
+    def get_products_by_ids(self, product_ids):
+        products = []
+        for chunk in _id_chunks(product_ids):
+            products.extend(self.client.table("products").select("*").in_("id", chunk).execute().data)
+        return products
+
+    def update_product_stock(self, product_id, new_stock):
+        return (
+            self.client.table("products")
+            .update({"stock_quantity": new_stock})
+            .eq("id", str(product_id))
+            .execute()
+            .data
+        )
+
+    def update_product(self, product_id, fields):
+        # updated_at is moved by the products trigger (0012_stock_adjustments.sql)
+        query = self.client.table("products").update(_product_fields(fields)).eq("id", str(product_id))
+        try:
+            rows = query.execute().data
+        except APIError as e:
+            if _is_duplicate_sku(e):
+                raise DuplicateSKU(fields.get("sku")) from e
+            raise
+        if not rows:
+            raise ProductNotFound(product_id)
+        return rows
+
+    def delete_product(self, product_id):
+        try:
+            rows = self.client.table("products").delete().eq("id", str(product_id)).execute().data
+        except APIError as e:
+            if _is_referenced(e):
+                raise ProductInUse(product_id) from e
+            raise
+        if not rows:
+            raise ProductNotFound(product_id)
+        return rows
+
+    def adjust_product_stock(self, product_id, delta=None, new_stock=None, expected_updated_at=None):
+        # adjust_stock() (supabase/migrations/0012_stock_adjustments.sql) is one conditional UPDATE
+        payload = _stock_payload(product_id, delta, new_stock, expected_updated_at)
+        return _stock_result(self.client.rpc("adjust_stock", payload).execute().data, product_id)
+
+    def upsert_products(self, rows, defaults=None):
+        if not rows:
+            return {"inserted": 0, "updated": 0, "products": []}
+        existing = set()
+        for chunk in _id_chunks(row["sku"] for row in rows):
+            existing.update(r["sku"] for r in self.client.table("products").select("sku").in_("sku", chunk).execute().data)
+        products = []
+        for group in _upsert_groups(rows, existing, defaults):
+            products.extend(self.client.table("products").upsert(
+                group, on_conflict="sku", default_to_null=False
+            ).execute().data)
+        return {"inserted": len(rows) - len(existing), "updated": len(existing), "products": products}
+
+    def list_low_stock(self):
+        # low_stock_products is a view over a partial index (supabase/migrations/0006_low_stock.sql);
+        # PostgREST filters cannot compare two columns
+        return self.client.table("low_stock_products").select("*").order("stock_quantity").execute().data
+
+    def iter_products(self, batch_size=1000):
+        last_id = None
+        while True:
+            query = self.client.table("products").select("*").order("id").limit(batch_size)
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            page = query.execute().data
+            if not page:
+                return
+            yield page
+            if len(page) < batch_size:
+                return
+            last_id = page[-1]["id"]
+
+    # SALES
+    def insert_sale(self, sale_data):
+        return self.client.table("sales").insert(sale_data).execute().data
+
+    def record_sale(self, product_id, quantity, sale_price=None, sale_date=None):
+        # record_sale() is a Postgres function (supabase/migrations/0001_record_sale.sql, 0014_sale_quantity_guard.sql)
+        # that does the conditional decrement and the insert in one transaction
+        result = self.client.rpc("record_sale", {
+            "p_product_id": str(product_id),
+            "p_quantity": quantity,
+            "p_sale_price": sale_price,
+            "p_sale_date": sale_date,
+        }).execute().data
+        return _sale_result(result, product_id)
+
+    def record_sales_batch(self, lines):
+        # record_sales_batch() (supabase/migrations/0015_batch_running_total.sql) runs in one
+        # transaction: lock the products, check the lines in order, decrement once per product, bulk insert
+        return self.client.rpc("record_sales_batch", {"p_lines": _batch_payload(lines)}).execute().data
+
+    def insert_sales(self, sales):
+        # ON CONFLICT (id) DO NOTHING: a resent batch inserts only what is missing
+        return self.client.table("sales").upsert(sales, on_conflict="id", ignore_duplicates=True).execute().data
+
+    def record_order(self, lines):
+        # record_order() (supabase/migrations/0013_orders.sql, 0016_order_running_total.sql) checks every line against
+        # the locked products and writes the order, decrements and sales only if all fit
+        return self.client.rpc("record_order", {"p_lines": _order_payload(lines)}).execute().data
+
+    def get_order(self, order_id):
+        return _order_row(self.client.table("orders").select(ORDER_WITH_SALES).eq("id", str(order_id)).execute().data)
+
+    def list_sales(self, limit=None):
+        query = self.client.table("sales").select(SALE_WITH_PRODUCT).order("sale_date", desc=True)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.execute().data
+
+    def list_sales_page(self, limit, before=None):
+        query = (
+            self.client.table("sales").select(SALE_WITH_PRODUCT)
+            .order("sale_date", desc=True).order("id", desc=True).limit(limit)
+        )
+        if before is not None:
+            sale_date, last_id = map(_quote, before)
+            query = query.or_(f"sale_date.lt.{sale_date},and(sale_date.eq.{sale_date},id.lt.{last_id})")
+        return query.execute().data
+
+    def iter_sales(self, start=None, end=None, batch_size=1000):
+        after = None
+        while True:
+            query = _sales_range_query(self.client.table("sales").select(SALE_FIELDS), start, end, after)
+            page = query.limit(batch_size).execute().data
+            if not page:
+                return
+            yield page
+            if len(page) < batch_size:
+                return
+            after = (page[-1]["sale_date"], page[-1]["id"])
+
+    def get_sales_by_product(self, product_id):
+        return self.client.table("sales").select("*").eq("product_id", str(product_id)).execute().data
+
+    def table_versions(self):
+        # Counter rows bumped by statement triggers in the writing transaction (supabase/migrations/0017_table_version_counters.sql)
+        return self.client.rpc("table_versions").execute().data
+
+    # ROLLUPS
+    # Maintained by triggers on sales (supabase/migrations/0005_sales_rollups.sql)
+    def list_daily_sales(self, since=None, until=None):
+        return _rollup_query(self.client.table("sales_daily").select("*"), since, until).execute().data
+
+    def list_daily_product_sales(self, since=None, until=None, product_id=None):
+        query = self.client.table("sales_daily_product").select("*")
+        if product_id is not None:
+            query = query.eq("product_id", str(product_id))
+        return _rollup_query(query, since, until).execute().data
+
+    def iter_daily_product_sales(self, since=None, until=None, batch_size=10000):
+        after = None
+        while True:
+            query = _daily_product_page(self.client.table("sales_daily_product").select("*"), since, until, after)
+            page = query.limit(batch_size).execute().data
+            if not page:
+                return
+            yield page
+            if len(page) < batch_size:
+                return
+            after = (page[-1]["product_id"], page[-1]["day"])
+
+    def dashboard_summary(self, since):
+        # One SQL statement, one snapshot (supabase/migrations/0007_dashboard_summary.sql)
+        return self.client.rpc("dashboard_summary", {"p_since": str(since)}).execute().data
+
+    def rebuild_sales_rollups(self):
+        return self.client.rpc("rebuild_sales_rollups").execute().data
+
+    # FORECASTS
+    # product_forecasts and save_forecasts() are in supabase/migrations/0010_forecasts.sql
+    def save_forecasts(self, forecasts, update_min_stock=True):
+        if not forecasts:
+            return {"saved": 0, "products": []}
+        return self.client.rpc("save_forecasts", {
+            "p_rows": _forecast_payload(forecasts),
+            "p_update_min_stock": update_min_stock,
+        }).execute().data
+
+    def get_forecast(self, product_id):
+        rows = self.client.table("product_forecasts").select("*").eq("product_id", str(product_id)).execute().data
+        return rows[0] if rows else None
@@ -0,0 +1,40 @@
+-- Atomic sale recording: conditional stock decrement + sale insert in one call.
+-- Run in the Supabase SQL editor. Called as supabase.rpc("record_sale", ...).
+
+CREATE OR REPLACE FUNCTION record_sale(
+    p_product_id UUID,
+    p_quantity INTEGER,
+    p_sale_price DECIMAL(10,2) DEFAULT NULL,
+    p_sale_date TIMESTAMP DEFAULT NULL
+) RETURNS JSON
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_stock INTEGER;
+    v_price DECIMAL(10,2);
+    v_sale sales;
+BEGIN
+    -- The row lock taken by UPDATE serialises concurrent sales of the same product,
+    -- and the stock_quantity >= p_quantity guard makes overselling impossible.
+    UPDATE products
+       SET stock_quantity = stock_quantity - p_quantity,
+           updated_at = NOW()
+     WHERE id = p_product_id
+       AND stock_quantity >= p_quantity
+    RETURNING stock_quantity, price INTO v_stock, v_price;
+
+    IF NOT FOUND THEN
+        SELECT stock_quantity INTO v_stock FROM products WHERE id = p_product_id;
+        IF NOT FOUND THEN
+            RETURN json_build_object('status', 'not_found');
+        END IF;
+        RETURN json_build_object('status', 'insufficient_stock', 'available', v_stock);
+    END IF;
+
+    INSERT INTO sales (product_id, quantity_sold, sale_price, sale_date)
+    VALUES (p_product_id, p_quantity, COALESCE(p_sale_price, v_price), COALESCE(p_sale_date, NOW()))
+    RETURNING * INTO v_sale;
+
+    RETURN json_build_object('status', 'ok', 'sale', row_to_json(v_sale), 'stock_quantity', v_stock);
+END;
+$$;
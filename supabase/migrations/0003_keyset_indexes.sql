@@ -0,0 +1,5 @@
+-- Indexes backing keyset pagination (GET /products/, GET /sales/) and per-product lookups.
+
+CREATE INDEX IF NOT EXISTS products_name_id_idx ON products (name, id);
+CREATE INDEX IF NOT EXISTS sales_sale_date_id_idx ON sales (sale_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS sales_product_id_idx ON sales (product_id);
@@ -0,0 +1,74 @@
+-- record_sales_batch(): successful line results now also carry stock_quantity, the
+-- product's stock left after that line, so the API can keep in-process views
+-- (catalog cache, search index) current without re-reading the products.
+-- Otherwise identical to 0002_record_sales_batch.sql.
+
+CREATE OR REPLACE FUNCTION record_sales_batch(p_lines JSONB)
+RETURNS JSON
+LANGUAGE sql
+AS $$
+    WITH lines AS (
+        SELECT (t.ord - 1)::INTEGER AS idx,
+               (t.line->>'product_id')::UUID AS product_id,
+               (t.line->>'quantity')::INTEGER AS quantity,
+               (t.line->>'sale_price')::DECIMAL(10,2) AS sale_price,
+               (t.line->>'sale_date')::TIMESTAMP AS sale_date
+          FROM jsonb_array_elements(p_lines) WITH ORDINALITY AS t(line, ord)
+    ),
+    locked AS MATERIALIZED (
+        SELECT id, stock_quantity, price
+          FROM products
+         WHERE id IN (SELECT DISTINCT product_id FROM lines)
+         ORDER BY id
+           FOR UPDATE
+    ),
+    ranked AS MATERIALIZED (
+        SELECT l.*,
+               k.id IS NOT NULL AS found,
+               k.stock_quantity,
+               k.price,
+               SUM(CASE WHEN l.quantity > 0 THEN l.quantity ELSE 0 END)
+                   OVER (PARTITION BY l.product_id ORDER BY l.idx) AS running
+          FROM lines l
+          LEFT JOIN locked k ON k.id = l.product_id
+    ),
+    accepted AS MATERIALIZED (
+        SELECT idx, gen_random_uuid() AS id, product_id, quantity,
+               COALESCE(sale_price, price) AS sale_price,
+               COALESCE(sale_date, NOW()::TIMESTAMP) AS sale_date
+          FROM ranked
+         WHERE found AND quantity > 0 AND running <= stock_quantity
+    ),
+    decremented AS (
+        UPDATE products p
+           SET stock_quantity = p.stock_quantity - a.total,
+               updated_at = NOW()
+          FROM (SELECT product_id, SUM(quantity) AS total FROM accepted GROUP BY product_id) a
+         WHERE p.id = a.product_id
+    ),
+    -- data-modifying CTEs always run to completion, even though nothing reads them
+    inserted AS (
+        INSERT INTO sales (id, product_id, quantity_sold, sale_price, sale_date)
+        SELECT id, product_id, quantity, sale_price, sale_date FROM accepted
+    )
+    SELECT COALESCE(json_agg(
+        CASE
+            WHEN a.idx IS NOT NULL THEN json_build_object(
+                'index', r.idx, 'success', TRUE,
+                'stock_quantity', r.stock_quantity - r.running,
+                'sale', json_build_object('id', a.id, 'product_id', a.product_id,
+                                          'quantity_sold', a.quantity, 'sale_price', a.sale_price,
+                                          'sale_date', a.sale_date))
+            WHEN NOT r.found THEN json_build_object(
+                'index', r.idx, 'success', FALSE, 'error', 'Product not found')
+            WHEN r.quantity <= 0 THEN json_build_object(
+                'index', r.idx, 'success', FALSE, 'error', 'Quantity must be greater than 0')
+            ELSE json_build_object(
+                'index', r.idx, 'success', FALSE,
+                'error', format('Not enough stock (Available: %s)',
+                                GREATEST(r.stock_quantity - (r.running - r.quantity), 0)),
+                'available', GREATEST(r.stock_quantity - (r.running - r.quantity), 0))
+        END ORDER BY r.idx), '[]'::JSON)
+      FROM ranked r
+      LEFT JOIN accepted a ON a.idx = r.idx;
+$$;
@@ -0,0 +1,109 @@
+-- Daily sales rollups (count, units, revenue) per day and per product per day.
+-- Statement-level triggers aggregate each INSERT/DELETE on sales once, so a
+-- record_sales_batch call updates one rollup row per (day, product) instead of
+-- one per line. Reports read these tables in O(days).
+
+CREATE TABLE IF NOT EXISTS sales_daily (
+    day DATE PRIMARY KEY,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    units INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS sales_daily_product (
+    day DATE NOT NULL,
+    product_id UUID NOT NULL,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    units INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, product_id)
+);
+
+CREATE INDEX IF NOT EXISTS sales_daily_product_product_idx ON sales_daily_product (product_id, day);
+
+-- Adds the aggregated delta of a set of sales rows (sign +1 or -1) to both tables
+CREATE OR REPLACE FUNCTION apply_sales_rollup(p_rows JSON, p_sign INTEGER)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    WITH changed AS (
+        SELECT (r->>'sale_date')::DATE AS day,
+               (r->>'product_id')::UUID AS product_id,
+               (r->>'quantity_sold')::INTEGER AS quantity_sold,
+               (r->>'sale_price')::DECIMAL(10,2) AS sale_price
+        FROM json_array_elements(p_rows) AS r
+    ),
+    per_day AS (
+        INSERT INTO sales_daily AS d (day, sale_count, units, revenue)
+        SELECT day, p_sign * count(*), p_sign * sum(quantity_sold), p_sign * sum(quantity_sold * sale_price)
+        FROM changed GROUP BY day
+        ON CONFLICT (day) DO UPDATE SET
+            sale_count = d.sale_count + excluded.sale_count,
+            units = d.units + excluded.units,
+            revenue = d.revenue + excluded.revenue
+    )
+    INSERT INTO sales_daily_product AS p (day, product_id, sale_count, units, revenue)
+    SELECT day, product_id, p_sign * count(*), p_sign * sum(quantity_sold), p_sign * sum(quantity_sold * sale_price)
+    FROM changed GROUP BY day, product_id
+    ON CONFLICT (day, product_id) DO UPDATE SET
+        sale_count = p.sale_count + excluded.sale_count,
+        units = p.units + excluded.units,
+        revenue = p.revenue + excluded.revenue;
+$$;
+
+CREATE OR REPLACE FUNCTION sales_rollup_insert()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM apply_sales_rollup((SELECT json_agg(n) FROM new_sales n), 1);
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION sales_rollup_delete()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM apply_sales_rollup((SELECT json_agg(o) FROM old_sales o), -1);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS sales_rollup_insert ON sales;
+CREATE TRIGGER sales_rollup_insert
+    AFTER INSERT ON sales
+    REFERENCING NEW TABLE AS new_sales
+    FOR EACH STATEMENT EXECUTE FUNCTION sales_rollup_insert();
+
+DROP TRIGGER IF EXISTS sales_rollup_delete ON sales;
+CREATE TRIGGER sales_rollup_delete
+    AFTER DELETE ON sales
+    REFERENCING OLD TABLE AS old_sales
+    FOR EACH STATEMENT EXECUTE FUNCTION sales_rollup_delete();
+
+-- Recompute both tables from the full history (first install, or after manual fixes).
+-- Called as supabase.rpc("rebuild_sales_rollups"); returns the number of days.
+CREATE OR REPLACE FUNCTION rebuild_sales_rollups()
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_days INTEGER;
+BEGIN
+    LOCK TABLE sales IN SHARE MODE;  -- no sale may land between the scan and the swap
+    DELETE FROM sales_daily;
+    DELETE FROM sales_daily_product;
+    INSERT INTO sales_daily (day, sale_count, units, revenue)
+        SELECT sale_date::DATE, count(*), sum(quantity_sold), sum(quantity_sold * sale_price)
+        FROM sales GROUP BY 1;
+    INSERT INTO sales_daily_product (day, product_id, sale_count, units, revenue)
+        SELECT sale_date::DATE, product_id, count(*), sum(quantity_sold), sum(quantity_sold * sale_price)
+        FROM sales GROUP BY 1, 2;
+    SELECT count(*) INTO v_days FROM sales_daily;
+    RETURN v_days;
+END;
+$$;
+
+SELECT rebuild_sales_rollups();
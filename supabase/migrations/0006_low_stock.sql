@@ -0,0 +1,11 @@
+-- Low-stock lookups in O(result): a partial index holding only the products
+-- below their threshold, and a view PostgREST can query (its filters cannot
+-- compare two columns). Used by GET /products/low-stock and the CLI.
+
+CREATE INDEX IF NOT EXISTS products_low_stock_idx
+    ON products (stock_quantity)
+    WHERE stock_quantity < min_stock_level;
+
+CREATE OR REPLACE VIEW low_stock_products AS
+    SELECT * FROM products
+    WHERE stock_quantity < min_stock_level;
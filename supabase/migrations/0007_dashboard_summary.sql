@@ -0,0 +1,20 @@
+-- Dashboard counters in one statement, so they come from a single snapshot:
+-- product count, low-stock count (partial index from 0006) and sales totals
+-- since p_since from the daily rollups (0005).
+-- Called as supabase.rpc("dashboard_summary", {"p_since": "2024-01-01"}).
+
+CREATE OR REPLACE FUNCTION dashboard_summary(p_since DATE)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'total_products', (SELECT count(*) FROM products),
+        'low_stock_count', (SELECT count(*) FROM products WHERE stock_quantity < min_stock_level),
+        'sale_count', coalesce(sum(d.sale_count), 0),
+        'units', coalesce(sum(d.units), 0),
+        'revenue', coalesce(sum(d.revenue), 0)
+    )
+    FROM sales_daily d
+    WHERE d.day >= p_since;
+$$;
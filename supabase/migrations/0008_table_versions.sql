@@ -0,0 +1,40 @@
+-- Version counters for conditional GETs (ETag / If-None-Match).
+-- Every statement that writes products or sales bumps that table's sequence.
+-- Sequences never block concurrent writers, unlike a shared counter row.
+-- The API builds ETags from supabase.rpc("table_versions").
+
+CREATE SEQUENCE IF NOT EXISTS products_version_seq;
+CREATE SEQUENCE IF NOT EXISTS sales_version_seq;
+
+CREATE OR REPLACE FUNCTION bump_table_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM nextval(TG_ARGV[0]::regclass);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS products_version ON products;
+CREATE TRIGGER products_version
+    AFTER INSERT OR UPDATE OR DELETE ON products
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('products_version_seq');
+
+DROP TRIGGER IF EXISTS sales_version ON sales;
+CREATE TRIGGER sales_version
+    AFTER INSERT OR UPDATE OR DELETE ON sales
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('sales_version_seq');
+
+CREATE OR REPLACE FUNCTION table_versions()
+RETURNS JSON
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    SELECT json_build_object(
+        'products', (SELECT last_value FROM products_version_seq),
+        'sales', (SELECT last_value FROM sales_version_seq)
+    );
+$$;
@@ -0,0 +1,102 @@
+-- Cost of goods on every sale, and cost totals in the daily rollups, for
+-- gross profit, margin and ROI reports.
+--
+-- sales.cost_price is the product's cost_price when the sale was inserted, so
+-- later cost changes do not rewrite past profit. A BEFORE INSERT trigger stamps
+-- it for every writer (record_sale, record_sales_batch, direct inserts).
+-- The rollups gain cost and costed_revenue (revenue of the sales that have a
+-- cost), both maintained by the statement triggers from 0005_sales_rollups.sql.
+
+ALTER TABLE sales ADD COLUMN IF NOT EXISTS cost_price DECIMAL(10,2);
+
+CREATE OR REPLACE FUNCTION stamp_sale_cost()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.cost_price IS NULL THEN
+        SELECT cost_price INTO NEW.cost_price FROM products WHERE id = NEW.product_id;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS sales_stamp_cost ON sales;
+CREATE TRIGGER sales_stamp_cost
+    BEFORE INSERT ON sales
+    FOR EACH ROW EXECUTE FUNCTION stamp_sale_cost();
+
+-- Sales recorded before this migration take the product's current cost
+UPDATE sales s SET cost_price = p.cost_price
+  FROM products p
+ WHERE p.id = s.product_id AND s.cost_price IS NULL AND p.cost_price IS NOT NULL;
+
+ALTER TABLE sales_daily ADD COLUMN IF NOT EXISTS cost DECIMAL(14,2) NOT NULL DEFAULT 0;
+ALTER TABLE sales_daily ADD COLUMN IF NOT EXISTS costed_revenue DECIMAL(14,2) NOT NULL DEFAULT 0;
+ALTER TABLE sales_daily_product ADD COLUMN IF NOT EXISTS cost DECIMAL(14,2) NOT NULL DEFAULT 0;
+ALTER TABLE sales_daily_product ADD COLUMN IF NOT EXISTS costed_revenue DECIMAL(14,2) NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION apply_sales_rollup(p_rows JSON, p_sign INTEGER)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    WITH changed AS (
+        SELECT (r->>'sale_date')::DATE AS day,
+               (r->>'product_id')::UUID AS product_id,
+               (r->>'quantity_sold')::INTEGER AS quantity_sold,
+               (r->>'sale_price')::DECIMAL(10,2) AS sale_price,
+               (r->>'cost_price')::DECIMAL(10,2) AS cost_price
+        FROM json_array_elements(p_rows) AS r
+    ),
+    per_day AS (
+        INSERT INTO sales_daily AS d (day, sale_count, units, revenue, cost, costed_revenue)
+        SELECT day, p_sign * count(*), p_sign * sum(quantity_sold), p_sign * sum(quantity_sold * sale_price),
+               p_sign * COALESCE(sum(quantity_sold * cost_price), 0),
+               p_sign * COALESCE(sum(quantity_sold * sale_price) FILTER (WHERE cost_price IS NOT NULL), 0)
+        FROM changed GROUP BY day
+        ON CONFLICT (day) DO UPDATE SET
+            sale_count = d.sale_count + excluded.sale_count,
+            units = d.units + excluded.units,
+            revenue = d.revenue + excluded.revenue,
+            cost = d.cost + excluded.cost,
+            costed_revenue = d.costed_revenue + excluded.costed_revenue
+    )
+    INSERT INTO sales_daily_product AS p (day, product_id, sale_count, units, revenue, cost, costed_revenue)
+    SELECT day, product_id, p_sign * count(*), p_sign * sum(quantity_sold), p_sign * sum(quantity_sold * sale_price),
+           p_sign * COALESCE(sum(quantity_sold * cost_price), 0),
+           p_sign * COALESCE(sum(quantity_sold * sale_price) FILTER (WHERE cost_price IS NOT NULL), 0)
+    FROM changed GROUP BY day, product_id
+    ON CONFLICT (day, product_id) DO UPDATE SET
+        sale_count = p.sale_count + excluded.sale_count,
+        units = p.units + excluded.units,
+        revenue = p.revenue + excluded.revenue,
+        cost = p.cost + excluded.cost,
+        costed_revenue = p.costed_revenue + excluded.costed_revenue;
+$$;
+
+CREATE OR REPLACE FUNCTION rebuild_sales_rollups()
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_days INTEGER;
+BEGIN
+    LOCK TABLE sales IN SHARE MODE;  -- no sale may land between the scan and the swap
+    DELETE FROM sales_daily;
+    DELETE FROM sales_daily_product;
+    INSERT INTO sales_daily (day, sale_count, units, revenue, cost, costed_revenue)
+        SELECT sale_date::DATE, count(*), sum(quantity_sold), sum(quantity_sold * sale_price),
+               COALESCE(sum(quantity_sold * cost_price), 0),
+               COALESCE(sum(quantity_sold * sale_price) FILTER (WHERE cost_price IS NOT NULL), 0)
+        FROM sales GROUP BY 1;
+    INSERT INTO sales_daily_product (day, product_id, sale_count, units, revenue, cost, costed_revenue)
+        SELECT sale_date::DATE, product_id, count(*), sum(quantity_sold), sum(quantity_sold * sale_price),
+               COALESCE(sum(quantity_sold * cost_price), 0),
+               COALESCE(sum(quantity_sold * sale_price) FILTER (WHERE cost_price IS NOT NULL), 0)
+        FROM sales GROUP BY 1, 2;
+    SELECT count(*) INTO v_days FROM sales_daily;
+    RETURN v_days;
+END;
+$$;
+
+SELECT rebuild_sales_rollups();
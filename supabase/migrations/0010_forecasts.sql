@@ -0,0 +1,64 @@
+-- Demand forecasts written by the forecasting job (src/forecast.py).
+-- save_forecasts() upserts one batch of forecasts and, optionally, moves each
+-- product's min_stock_level to its reorder point, in one statement. It returns
+-- the products whose threshold changed so the caller can refresh its views.
+
+CREATE TABLE IF NOT EXISTS product_forecasts (
+    product_id UUID PRIMARY KEY REFERENCES products(id) ON DELETE CASCADE,
+    daily_demand DOUBLE PRECISION NOT NULL,
+    forecast JSONB NOT NULL,
+    lead_time_days INTEGER NOT NULL,
+    lead_time_demand DOUBLE PRECISION NOT NULL,
+    safety_stock DOUBLE PRECISION NOT NULL,
+    reorder_point INTEGER NOT NULL,
+    history_start DATE,
+    history_end DATE,
+    computed_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION save_forecasts(p_rows JSONB, p_update_min_stock BOOLEAN DEFAULT TRUE)
+RETURNS JSON
+LANGUAGE sql
+AS $$
+    WITH input AS (
+        SELECT r.*
+          FROM jsonb_to_recordset(p_rows) AS r(
+               product_id UUID, daily_demand DOUBLE PRECISION, forecast JSONB, lead_time_days INTEGER,
+               lead_time_demand DOUBLE PRECISION, safety_stock DOUBLE PRECISION, reorder_point INTEGER,
+               history_start DATE, history_end DATE)
+          JOIN products p ON p.id = r.product_id
+    ),
+    saved AS (
+        INSERT INTO product_forecasts AS f (
+            product_id, daily_demand, forecast, lead_time_days, lead_time_demand, safety_stock,
+            reorder_point, history_start, history_end, computed_at)
+        SELECT product_id, daily_demand, forecast, lead_time_days, lead_time_demand, safety_stock,
+               reorder_point, history_start, history_end, NOW()
+          FROM input
+        ON CONFLICT (product_id) DO UPDATE SET
+            daily_demand = excluded.daily_demand,
+            forecast = excluded.forecast,
+            lead_time_days = excluded.lead_time_days,
+            lead_time_demand = excluded.lead_time_demand,
+            safety_stock = excluded.safety_stock,
+            reorder_point = excluded.reorder_point,
+            history_start = excluded.history_start,
+            history_end = excluded.history_end,
+            computed_at = excluded.computed_at
+        RETURNING 1
+    ),
+    changed AS (
+        UPDATE products p
+           SET min_stock_level = i.reorder_point,
+               updated_at = NOW()
+          FROM input i
+         WHERE p_update_min_stock
+           AND p.id = i.product_id
+           AND p.min_stock_level IS DISTINCT FROM i.reorder_point
+        RETURNING p.*
+    )
+    SELECT json_build_object(
+        'saved', (SELECT count(*) FROM saved),
+        'products', COALESCE((SELECT json_agg(c) FROM changed c), '[]'::JSON)
+    );
+$$;
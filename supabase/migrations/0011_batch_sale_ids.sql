@@ -0,0 +1,88 @@
+-- record_sales_batch(): a line may carry its own sale "id". A line whose id is
+-- already in sales is reported as {"success": true, "duplicate": true} and
+-- changes nothing, so a batch can be resent after a crash or timeout without
+-- recording any sale twice (the write-behind journal in src/journal.py relies
+-- on this). Otherwise identical to 0004_batch_stock_left.sql.
+
+CREATE OR REPLACE FUNCTION record_sales_batch(p_lines JSONB)
+RETURNS JSON
+LANGUAGE sql
+AS $$
+    WITH lines AS (
+        SELECT (t.ord - 1)::INTEGER AS idx,
+               (t.line->>'id')::UUID AS sale_id,
+               (t.line->>'product_id')::UUID AS product_id,
+               (t.line->>'quantity')::INTEGER AS quantity,
+               (t.line->>'sale_price')::DECIMAL(10,2) AS sale_price,
+               (t.line->>'sale_date')::TIMESTAMP AS sale_date
+          FROM jsonb_array_elements(p_lines) WITH ORDINALITY AS t(line, ord)
+    ),
+    known AS MATERIALIZED (
+        SELECT id FROM sales WHERE id IN (SELECT sale_id FROM lines WHERE sale_id IS NOT NULL)
+    ),
+    locked AS MATERIALIZED (
+        SELECT id, stock_quantity, price
+          FROM products
+         WHERE id IN (SELECT DISTINCT product_id FROM lines)
+         ORDER BY id
+           FOR UPDATE
+    ),
+    ranked AS MATERIALIZED (
+        SELECT l.*,
+               k.id IS NOT NULL AS found,
+               d.id IS NOT NULL AS duplicate,
+               k.stock_quantity,
+               k.price,
+               SUM(CASE WHEN l.quantity > 0 AND d.id IS NULL THEN l.quantity ELSE 0 END)
+                   OVER (PARTITION BY l.product_id ORDER BY l.idx) AS running
+          FROM lines l
+          LEFT JOIN locked k ON k.id = l.product_id
+          LEFT JOIN known d ON d.id = l.sale_id
+    ),
+    accepted AS MATERIALIZED (
+        SELECT idx, COALESCE(sale_id, gen_random_uuid()) AS id, product_id, quantity,
+               COALESCE(sale_price, price) AS sale_price,
+               COALESCE(sale_date, NOW()::TIMESTAMP) AS sale_date
+          FROM ranked
+         WHERE found AND NOT duplicate AND quantity > 0 AND running <= stock_quantity
+    ),
+    decremented AS (
+        UPDATE products p
+           SET stock_quantity = p.stock_quantity - a.total,
+               updated_at = NOW()
+          FROM (SELECT product_id, SUM(quantity) AS total FROM accepted GROUP BY product_id) a
+         WHERE p.id = a.product_id
+    ),
+    -- data-modifying CTEs always run to completion, even though nothing reads them
+    inserted AS (
+        INSERT INTO sales (id, product_id, quantity_sold, sale_price, sale_date)
+        SELECT id, product_id, quantity, sale_price, sale_date FROM accepted
+    )
+    SELECT COALESCE(json_agg(
+        CASE
+            WHEN a.idx IS NOT NULL THEN json_build_object(
+                'index', r.idx, 'success', TRUE,
+                'stock_quantity', r.stock_quantity - r.running,
+                'sale', json_build_object('id', a.id, 'product_id', a.product_id,
+                                          'quantity_sold', a.quantity, 'sale_price', a.sale_price,
+                                          'sale_date', a.sale_date))
+            WHEN r.duplicate THEN json_build_object(
+                'index', r.idx, 'success', TRUE, 'duplicate', TRUE,
+                'stock_quantity', r.stock_quantity - r.running,
+                'sale', json_build_object('id', r.sale_id, 'product_id', r.product_id,
+                                          'quantity_sold', r.quantity,
+                                          'sale_price', COALESCE(r.sale_price, r.price),
+                                          'sale_date', r.sale_date))
+            WHEN NOT r.found THEN json_build_object(
+                'index', r.idx, 'success', FALSE, 'error', 'Product not found')
+            WHEN r.quantity <= 0 THEN json_build_object(
+                'index', r.idx, 'success', FALSE, 'error', 'Quantity must be greater than 0')
+            ELSE json_build_object(
+                'index', r.idx, 'success', FALSE,
+                'error', format('Not enough stock (Available: %s)',
+                                GREATEST(r.stock_quantity - (r.running - r.quantity), 0)),
+                'available', GREATEST(r.stock_quantity - (r.running - r.quantity), 0))
+        END ORDER BY r.idx), '[]'::JSON)
+      FROM ranked r
+      LEFT JOIN accepted a ON a.idx = r.idx;
+$$;
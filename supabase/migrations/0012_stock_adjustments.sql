@@ -0,0 +1,56 @@
+-- Relative and compare-and-set stock writes (PATCH /products/{id}/stock).
+--
+-- Every update of a product now moves updated_at, whoever makes it, so a
+-- client can send back the updated_at it read as a precondition: the write
+-- only happens if nobody has written the product since. adjust_stock() adds a
+-- delta (or sets an absolute value) in one conditional UPDATE; the row lock
+-- and the re-check of the WHERE clause under concurrent updates make it atomic
+-- without a read-modify-write round trip.
+
+CREATE OR REPLACE FUNCTION touch_product()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();  -- distinct even for two writes in one transaction
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS products_touch ON products;
+CREATE TRIGGER products_touch
+    BEFORE UPDATE ON products
+    FOR EACH ROW EXECUTE FUNCTION touch_product();
+
+CREATE OR REPLACE FUNCTION adjust_stock(
+    p_product_id UUID,
+    p_delta INTEGER DEFAULT NULL,
+    p_stock INTEGER DEFAULT NULL,
+    p_expected_updated_at TIMESTAMP DEFAULT NULL
+) RETURNS JSON
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_product products;
+BEGIN
+    UPDATE products
+       SET stock_quantity = COALESCE(p_stock, stock_quantity + p_delta)
+     WHERE id = p_product_id
+       AND COALESCE(p_stock, stock_quantity + p_delta) >= 0
+       AND (p_expected_updated_at IS NULL OR updated_at = p_expected_updated_at)
+    RETURNING * INTO v_product;
+
+    IF FOUND THEN
+        RETURN json_build_object('status', 'ok', 'product', row_to_json(v_product));
+    END IF;
+
+    SELECT * INTO v_product FROM products WHERE id = p_product_id;
+    IF NOT FOUND THEN
+        RETURN json_build_object('status', 'not_found');
+    END IF;
+    IF p_expected_updated_at IS NOT NULL AND v_product.updated_at IS DISTINCT FROM p_expected_updated_at THEN
+        RETURN json_build_object('status', 'modified', 'product', row_to_json(v_product));
+    END IF;
+    RETURN json_build_object('status', 'insufficient_stock', 'product', row_to_json(v_product));
+END;
+$$;
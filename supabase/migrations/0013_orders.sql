@@ -0,0 +1,112 @@
+-- Orders: several sale lines bought together and recorded all or nothing.
+-- Each line is an ordinary sales row carrying the order's id, so the rollups
+-- (0005), cost stamping (0009) and every report see order lines like any
+-- other sale.
+
+CREATE TABLE IF NOT EXISTS orders (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    line_count INTEGER NOT NULL,
+    units INTEGER NOT NULL,
+    total DECIMAL(12,2) NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+ALTER TABLE sales ADD COLUMN IF NOT EXISTS order_id UUID REFERENCES orders(id);
+
+CREATE INDEX IF NOT EXISTS sales_order_id_idx ON sales (order_id) WHERE order_id IS NOT NULL;
+
+-- record_order(): one statement, so one round trip and one transaction. The
+-- products are locked in id order, every line is checked against the running
+-- quantity for its product (as in record_sales_batch), and the order row, the
+-- decrements and the sales are written only if no line was refused. Returns
+-- {"order": row or null, "lines": per-line results}; when the order is
+-- refused, lines that would have fitted report that they were not recorded.
+CREATE OR REPLACE FUNCTION record_order(p_lines JSONB)
+RETURNS JSON
+LANGUAGE sql
+AS $$
+    WITH lines AS (
+        SELECT (t.ord - 1)::INTEGER AS idx,
+               (t.line->>'product_id')::UUID AS product_id,
+               (t.line->>'quantity')::INTEGER AS quantity,
+               (t.line->>'sale_price')::DECIMAL(10,2) AS sale_price
+          FROM jsonb_array_elements(p_lines) WITH ORDINALITY AS t(line, ord)
+    ),
+    locked AS MATERIALIZED (
+        SELECT id, stock_quantity, price
+          FROM products
+         WHERE id IN (SELECT DISTINCT product_id FROM lines)
+         ORDER BY id
+           FOR UPDATE
+    ),
+    ranked AS MATERIALIZED (
+        SELECT l.*,
+               k.id IS NOT NULL AS found,
+               k.stock_quantity,
+               k.price,
+               SUM(GREATEST(l.quantity, 0)) OVER (PARTITION BY l.product_id ORDER BY l.idx) AS running
+          FROM lines l
+          LEFT JOIN locked k ON k.id = l.product_id
+    ),
+    -- one row when every line fits, none otherwise: everything below hangs off it
+    placed AS MATERIALIZED (
+        SELECT gen_random_uuid() AS id, NOW()::TIMESTAMP AS created_at
+         WHERE NOT EXISTS (
+             SELECT 1 FROM ranked WHERE NOT found OR quantity <= 0 OR running > stock_quantity
+         )
+    ),
+    accepted AS MATERIALIZED (
+        SELECT r.idx, gen_random_uuid() AS id, r.product_id, r.quantity,
+               COALESCE(r.sale_price, r.price) AS sale_price,
+               p.id AS order_id, p.created_at AS sale_date
+          FROM ranked r
+         CROSS JOIN placed p
+    ),
+    ordered AS (
+        INSERT INTO orders (id, line_count, units, total, created_at)
+        SELECT p.id, COUNT(*), SUM(a.quantity), SUM(a.quantity * a.sale_price), p.created_at
+          FROM placed p
+          JOIN accepted a ON a.order_id = p.id
+         GROUP BY p.id, p.created_at
+        RETURNING *
+    ),
+    decremented AS (
+        UPDATE products p
+           SET stock_quantity = p.stock_quantity - a.total,
+               updated_at = NOW()
+          FROM (SELECT product_id, SUM(quantity) AS total FROM accepted GROUP BY product_id) a
+         WHERE p.id = a.product_id
+    ),
+    -- reads ordered, so the sales go in after their order row
+    inserted AS (
+        INSERT INTO sales (id, product_id, quantity_sold, sale_price, sale_date, order_id)
+        SELECT a.id, a.product_id, a.quantity, a.sale_price, a.sale_date, o.id
+          FROM accepted a
+          JOIN ordered o ON o.id = a.order_id
+    )
+    SELECT json_build_object(
+        'order', (SELECT row_to_json(o) FROM ordered o),
+        'lines', COALESCE(json_agg(
+            CASE
+                WHEN a.idx IS NOT NULL THEN json_build_object(
+                    'index', r.idx, 'success', TRUE,
+                    'stock_quantity', r.stock_quantity - r.running,
+                    'sale', json_build_object('id', a.id, 'product_id', a.product_id,
+                                              'quantity_sold', a.quantity, 'sale_price', a.sale_price,
+                                              'sale_date', a.sale_date, 'order_id', a.order_id))
+                WHEN NOT r.found THEN json_build_object(
+                    'index', r.idx, 'success', FALSE, 'error', 'Product not found')
+                WHEN r.quantity <= 0 THEN json_build_object(
+                    'index', r.idx, 'success', FALSE, 'error', 'Quantity must be greater than 0')
+                WHEN r.running > r.stock_quantity THEN json_build_object(
+                    'index', r.idx, 'success', FALSE,
+                    'error', format('Not enough stock (Available: %s)',
+                                    GREATEST(r.stock_quantity - (r.running - r.quantity), 0)),
+                    'available', GREATEST(r.stock_quantity - (r.running - r.quantity), 0))
+                ELSE json_build_object(
+                    'index', r.idx, 'success', FALSE,
+                    'error', 'Not recorded: another line of the order was refused')
+            END ORDER BY r.idx), '[]'::JSON))
+      FROM ranked r
+      LEFT JOIN accepted a ON a.idx = r.idx;
+$$;
@@ -0,0 +1,46 @@
+-- record_sale(): refuse a quantity below 1 with {"status": "invalid_quantity"}
+-- instead of adding it to stock and recording negative revenue. Otherwise
+-- identical to 0001_record_sale.sql.
+
+CREATE OR REPLACE FUNCTION record_sale(
+    p_product_id UUID,
+    p_quantity INTEGER,
+    p_sale_price DECIMAL(10,2) DEFAULT NULL,
+    p_sale_date TIMESTAMP DEFAULT NULL
+) RETURNS JSON
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_stock INTEGER;
+    v_price DECIMAL(10,2);
+    v_sale sales;
+BEGIN
+    -- A zero or negative quantity would add stock and record negative revenue
+    IF p_quantity IS NULL OR p_quantity <= 0 THEN
+        RETURN json_build_object('status', 'invalid_quantity');
+    END IF;
+
+    -- The row lock taken by UPDATE serialises concurrent sales of the same product,
+    -- and the stock_quantity >= p_quantity guard makes overselling impossible.
+    UPDATE products
+       SET stock_quantity = stock_quantity - p_quantity,
+           updated_at = NOW()
+     WHERE id = p_product_id
+       AND stock_quantity >= p_quantity
+    RETURNING stock_quantity, price INTO v_stock, v_price;
+
+    IF NOT FOUND THEN
+        SELECT stock_quantity INTO v_stock FROM products WHERE id = p_product_id;
+        IF NOT FOUND THEN
+            RETURN json_build_object('status', 'not_found');
+        END IF;
+        RETURN json_build_object('status', 'insufficient_stock', 'available', v_stock);
+    END IF;
+
+    INSERT INTO sales (product_id, quantity_sold, sale_price, sale_date)
+    VALUES (p_product_id, p_quantity, COALESCE(p_sale_price, v_price), COALESCE(p_sale_date, NOW()))
+    RETURNING * INTO v_sale;
+
+    RETURN json_build_object('status', 'ok', 'sale', row_to_json(v_sale), 'stock_quantity', v_stock);
+END;
+$$;
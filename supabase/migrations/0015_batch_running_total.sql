@@ -0,0 +1,106 @@
+-- record_sales_batch(): a refused line no longer counts against the stock left
+-- for the lines after it. The window SUM in 0011_batch_sale_ids.sql added every
+-- line's quantity to the running total, so with 5 in stock the batch [10, 1]
+-- refused the 1 as well ("Available: 0") and reported an understated
+-- stock_quantity. A running total over accepted lines only depends on which
+-- earlier lines were accepted, which a window function cannot express, so the
+-- lines are now checked in a plpgsql loop; the decrements and the sales are
+-- still written in one statement each. Otherwise identical to 0011.
+
+CREATE OR REPLACE FUNCTION record_sales_batch(p_lines JSONB)
+RETURNS JSON
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_line RECORD;
+    v_left JSONB;              -- product id -> {"stock": left after the accepted lines, "price": ...}
+    v_product JSONB;
+    v_known UUID[];
+    v_available INTEGER;
+    v_sale JSONB;
+    v_accepted JSONB := '[]';
+    v_results JSONB := '[]';
+BEGIN
+    WITH locked AS (
+        SELECT id, stock_quantity, price
+          FROM products
+         WHERE id IN (SELECT DISTINCT (l->>'product_id')::UUID FROM jsonb_array_elements(p_lines) AS l)
+         ORDER BY id
+           FOR UPDATE
+    )
+    SELECT COALESCE(jsonb_object_agg(id, jsonb_build_object('stock', stock_quantity, 'price', price)), '{}')
+      INTO v_left
+      FROM locked;
+
+    SELECT COALESCE(array_agg(id), '{}')
+      INTO v_known
+      FROM sales
+     WHERE id IN (SELECT (l->>'id')::UUID FROM jsonb_array_elements(p_lines) AS l WHERE l->>'id' IS NOT NULL);
+
+    FOR v_line IN
+        SELECT (t.ord - 1)::INTEGER AS idx,
+               (t.line->>'id')::UUID AS sale_id,
+               (t.line->>'product_id')::UUID AS product_id,
+               (t.line->>'quantity')::INTEGER AS quantity,
+               (t.line->>'sale_price')::DECIMAL(10,2) AS sale_price,
+               (t.line->>'sale_date')::TIMESTAMP AS sale_date
+          FROM jsonb_array_elements(p_lines) WITH ORDINALITY AS t(line, ord)
+         ORDER BY t.ord
+    LOOP
+        v_product := v_left -> v_line.product_id::TEXT;
+
+        IF v_line.sale_id = ANY(v_known) THEN
+            v_results := v_results || jsonb_build_object(
+                'index', v_line.idx, 'success', TRUE, 'duplicate', TRUE,
+                'stock_quantity', (v_product->>'stock')::INTEGER,
+                'sale', jsonb_build_object('id', v_line.sale_id, 'product_id', v_line.product_id,
+                                           'quantity_sold', v_line.quantity,
+                                           'sale_price', COALESCE(v_line.sale_price, (v_product->>'price')::DECIMAL(10,2)),
+                                           'sale_date', v_line.sale_date));
+        ELSIF v_product IS NULL THEN
+            v_results := v_results || jsonb_build_object(
+                'index', v_line.idx, 'success', FALSE, 'error', 'Product not found');
+        ELSIF v_line.quantity <= 0 THEN
+            v_results := v_results || jsonb_build_object(
+                'index', v_line.idx, 'success', FALSE, 'error', 'Quantity must be greater than 0');
+        ELSE
+            v_available := (v_product->>'stock')::INTEGER;
+            IF v_line.quantity > v_available THEN
+                v_results := v_results || jsonb_build_object(
+                    'index', v_line.idx, 'success', FALSE,
+                    'error', format('Not enough stock (Available: %s)', GREATEST(v_available, 0)),
+                    'available', GREATEST(v_available, 0));
+            ELSE
+                v_sale := jsonb_build_object(
+                    'id', COALESCE(v_line.sale_id, gen_random_uuid()),
+                    'product_id', v_line.product_id,
+                    'quantity_sold', v_line.quantity,
+                    'sale_price', COALESCE(v_line.sale_price, (v_product->>'price')::DECIMAL(10,2)),
+                    'sale_date', COALESCE(v_line.sale_date, NOW()::TIMESTAMP));
+                v_left := jsonb_set(v_left, ARRAY[v_line.product_id::TEXT, 'stock'],
+                                    to_jsonb(v_available - v_line.quantity));
+                v_accepted := v_accepted || v_sale;
+                v_results := v_results || jsonb_build_object(
+                    'index', v_line.idx, 'success', TRUE,
+                    'stock_quantity', v_available - v_line.quantity,
+                    'sale', v_sale);
+            END IF;
+        END IF;
+    END LOOP;
+
+    UPDATE products p
+       SET stock_quantity = p.stock_quantity - a.total,
+           updated_at = NOW()
+      FROM (SELECT product_id, SUM(quantity_sold) AS total
+              FROM jsonb_to_recordset(v_accepted) AS s(product_id UUID, quantity_sold INTEGER)
+             GROUP BY product_id) a
+     WHERE p.id = a.product_id;
+
+    INSERT INTO sales (id, product_id, quantity_sold, sale_price, sale_date)
+    SELECT id, product_id, quantity_sold, sale_price, sale_date
+      FROM jsonb_to_recordset(v_accepted)
+        AS s(id UUID, product_id UUID, quantity_sold INTEGER, sale_price DECIMAL(10,2), sale_date TIMESTAMP);
+
+    RETURN v_results::JSON;
+END;
+$$;
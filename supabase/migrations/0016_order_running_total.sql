@@ -0,0 +1,114 @@
+-- record_order(): a refused line no longer counts against the stock left for
+-- the lines after it, so their "available" is right. The order is still
+-- refused as a whole; this only corrects what the refusal reports. As in
+-- 0015_batch_running_total.sql, the lines are checked in a plpgsql loop
+-- instead of the window SUM from 0013_orders.sql. Otherwise identical to 0013.
+
+CREATE OR REPLACE FUNCTION record_order(p_lines JSONB)
+RETURNS JSON
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_line RECORD;
+    v_left JSONB;              -- product id -> {"stock": left after the accepted lines, "price": ...}
+    v_product JSONB;
+    v_available INTEGER;
+    v_order_id UUID := gen_random_uuid();
+    v_created TIMESTAMP := NOW()::TIMESTAMP;
+    v_order orders;
+    v_sale JSONB;
+    v_refused BOOLEAN := FALSE;
+    v_accepted JSONB := '[]';
+    v_results JSONB := '[]';
+BEGIN
+    WITH locked AS (
+        SELECT id, stock_quantity, price
+          FROM products
+         WHERE id IN (SELECT DISTINCT (l->>'product_id')::UUID FROM jsonb_array_elements(p_lines) AS l)
+         ORDER BY id
+           FOR UPDATE
+    )
+    SELECT COALESCE(jsonb_object_agg(id, jsonb_build_object('stock', stock_quantity, 'price', price)), '{}')
+      INTO v_left
+      FROM locked;
+
+    FOR v_line IN
+        SELECT (t.ord - 1)::INTEGER AS idx,
+               (t.line->>'product_id')::UUID AS product_id,
+               (t.line->>'quantity')::INTEGER AS quantity,
+               (t.line->>'sale_price')::DECIMAL(10,2) AS sale_price
+          FROM jsonb_array_elements(p_lines) WITH ORDINALITY AS t(line, ord)
+         ORDER BY t.ord
+    LOOP
+        v_product := v_left -> v_line.product_id::TEXT;
+
+        IF v_product IS NULL THEN
+            v_refused := TRUE;
+            v_results := v_results || jsonb_build_object(
+                'index', v_line.idx, 'success', FALSE, 'error', 'Product not found');
+        ELSIF v_line.quantity <= 0 THEN
+            v_refused := TRUE;
+            v_results := v_results || jsonb_build_object(
+                'index', v_line.idx, 'success', FALSE, 'error', 'Quantity must be greater than 0');
+        ELSE
+            v_available := (v_product->>'stock')::INTEGER;
+            IF v_line.quantity > v_available THEN
+                v_refused := TRUE;
+                v_results := v_results || jsonb_build_object(
+                    'index', v_line.idx, 'success', FALSE,
+                    'error', format('Not enough stock (Available: %s)', GREATEST(v_available, 0)),
+                    'available', GREATEST(v_available, 0));
+            ELSE
+                v_sale := jsonb_build_object(
+                    'id', gen_random_uuid(),
+                    'product_id', v_line.product_id,
+                    'quantity_sold', v_line.quantity,
+                    'sale_price', COALESCE(v_line.sale_price, (v_product->>'price')::DECIMAL(10,2)),
+                    'sale_date', v_created,
+                    'order_id', v_order_id);
+                v_left := jsonb_set(v_left, ARRAY[v_line.product_id::TEXT, 'stock'],
+                                    to_jsonb(v_available - v_line.quantity));
+                v_accepted := v_accepted || v_sale;
+                v_results := v_results || jsonb_build_object(
+                    'index', v_line.idx, 'success', TRUE,
+                    'stock_quantity', v_available - v_line.quantity,
+                    'sale', v_sale);
+            END IF;
+        END IF;
+    END LOOP;
+
+    IF v_refused OR jsonb_array_length(v_accepted) = 0 THEN
+        -- All or nothing: lines that would have fitted report that they were not recorded
+        RETURN json_build_object('order', NULL, 'lines', (
+            SELECT COALESCE(json_agg(
+                CASE WHEN (r->>'success')::BOOLEAN
+                     THEN jsonb_build_object('index', r->'index', 'success', FALSE,
+                                             'error', 'Not recorded: another line of the order was refused')
+                     ELSE r
+                END ORDER BY t.ord), '[]'::JSON)
+              FROM jsonb_array_elements(v_results) WITH ORDINALITY AS t(r, ord)
+        ));
+    END IF;
+
+    INSERT INTO orders (id, line_count, units, total, created_at)
+    SELECT v_order_id, COUNT(*), SUM(quantity_sold), SUM(quantity_sold * sale_price), v_created
+      FROM jsonb_to_recordset(v_accepted) AS s(quantity_sold INTEGER, sale_price DECIMAL(10,2))
+    RETURNING * INTO v_order;
+
+    UPDATE products p
+       SET stock_quantity = p.stock_quantity - a.total,
+           updated_at = NOW()
+      FROM (SELECT product_id, SUM(quantity_sold) AS total
+              FROM jsonb_to_recordset(v_accepted) AS s(product_id UUID, quantity_sold INTEGER)
+             GROUP BY product_id) a
+     WHERE p.id = a.product_id;
+
+    INSERT INTO sales (id, product_id, quantity_sold, sale_price, sale_date, order_id)
+    SELECT id, product_id, quantity_sold, sale_price, sale_date, order_id
+      FROM jsonb_to_recordset(v_accepted)
+        AS s(id UUID, product_id UUID, quantity_sold INTEGER, sale_price DECIMAL(10,2),
+             sale_date TIMESTAMP, order_id UUID);
+
+    RETURN json_build_object('order', row_to_json(v_order), 'lines', v_results);
+END;
+$$;
@@ -0,0 +1,58 @@
+-- Version counters for conditional GETs, take two: a counter row per table,
+-- bumped by the same statement triggers inside the writing transaction.
+--
+-- 0008_table_versions.sql bumped sequences, and nextval() is not
+-- transactional: a reader could see the new version while the write was still
+-- uncommitted, read the old rows, and hand out the new ETag with them. Once the
+-- write committed, that client's If-None-Match matched and it got 304s for
+-- stale data until the next write. A counter row only changes on commit, and
+-- the API reads it before the data, so an ETag can only be older than the data
+-- it is sent with (costing at most one extra download), never newer.
+--
+-- The row lock serialises writers of a table from their first write until
+-- commit; the app's writes are single-statement functions, so that is short.
+-- The counters start above the sequences' last values, so no ETag handed out
+-- before this migration can match again. Same layout as the SQLite engine.
+
+CREATE TABLE IF NOT EXISTS table_versions (
+    name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO table_versions (name, version)
+VALUES ('products', (SELECT last_value + 1 FROM products_version_seq)),
+       ('sales', (SELECT last_value + 1 FROM sales_version_seq))
+ON CONFLICT (name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_table_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = TG_ARGV[0];
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS products_version ON products;
+CREATE TRIGGER products_version
+    AFTER INSERT OR UPDATE OR DELETE ON products
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('products');
+
+DROP TRIGGER IF EXISTS sales_version ON sales;
+CREATE TRIGGER sales_version
+    AFTER INSERT OR UPDATE OR DELETE ON sales
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('sales');
+
+CREATE OR REPLACE FUNCTION table_versions()
+RETURNS JSON
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    SELECT json_object_agg(name, version) FROM table_versions;
+$$;
+
+DROP SEQUENCE IF EXISTS products_version_seq;
+DROP SEQUENCE IF EXISTS sales_version_seq;
@@ -0,0 +1,78 @@
+"""
+Shared fixtures: a fresh SQLiteEngine per test, and the API (API/main.py)
+served from its own SQLite file, either through TestClient or, for
+concurrent requests, an async client inside the app's lifespan.
+"""
+import asyncio
+import uuid
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from src.storage.sqlite_engine import SQLiteEngine
+
+# Optional modes the API picks up from the environment; tests turn on the ones they need
+OPTIONAL_ENV = ("SALES_JOURNAL", "SALES_SNAPSHOT_DIR", "SERVER_TIMING", "CATALOG_CACHE_SIZE", "CATALOG_CACHE_TTL",
+                "SEARCH_INDEX_REFRESH")
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = SQLiteEngine(str(tmp_path / "inventory.db"))
+    yield engine
+    engine.close()
+
+
+@pytest.fixture
+def add_product(engine):
+    """add_product(**fields) -> the inserted row, with a unique SKU and 10 units by default"""
+    def add(**fields):
+        sku = fields.pop("sku", None) or f"SKU-{uuid.uuid4().hex[:8]}"
+        data = {"name": f"Product {sku}", "sku": sku, "price": 10.0, "stock_quantity": 10, **fields}
+        return engine.insert_product(data)[0]
+
+    return add
+
+
+@pytest.fixture
+def api_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("STORAGE_ENGINE", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "api.db"))
+    for name in OPTIONAL_ENV:
+        monkeypatch.delenv(name, raising=False)
+    return tmp_path
+
+
+@pytest.fixture
+def client(api_env):
+    from API.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def serve(api_env):
+    """serve(scenario) runs ``await scenario(client, app)`` in the app's lifespan and returns its result"""
+    from API.main import app
+
+    def run(scenario):
+        async def main():
+            async with app.router.lifespan_context(app):
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    return await scenario(client, app)
+
+        return asyncio.run(main())
+
+    return run
+
+
+def create_product(client, **fields):
+    """POST /products/ and return the new row"""
+    sku = fields.pop("sku", None) or f"SKU-{uuid.uuid4().hex[:8]}"
+    body = {"name": f"Product {sku}", "sku": sku, "price": 10.0, "stock_quantity": 10, **fields}
+    response = client.post("/products/", json=body)
+    assert response.status_code == 200, response.text
+    return response.json()["data"][0]
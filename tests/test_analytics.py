@@ -0,0 +1,60 @@
+"""Vectorised analytics: bucketed revenue series and top-N rankings, on their own and through /analytics"""
+import pytest
+
+from src import analytics
+from tests.conftest import create_product
+
+
+def rollup(day, product_id, units, revenue):
+    return {"day": day, "product_id": product_id, "sale_count": 1, "units": units, "revenue": revenue,
+            "cost": None, "costed_revenue": None}
+
+
+ROWS = [rollup("2026-10-05", "a", 2, 20.0), rollup("2026-10-07", "b", 5, 10.0), rollup("2026-10-12", "a", 1, 10.0)]
+
+
+def test_daily_series_is_zero_filled():
+    series = analytics.revenue_series(analytics.rollup_frame(ROWS), "day", "2026-10-05", "2026-10-08")
+
+    # The end is exclusive; a bucket with sales outside the range is kept
+    assert [(point["bucket"][:10], point["revenue"]) for point in series] == [
+        ("2026-10-05", 20.0), ("2026-10-06", 0.0), ("2026-10-07", 10.0), ("2026-10-12", 10.0),
+    ]
+
+
+def test_weeks_start_on_monday():
+    series = analytics.revenue_series(analytics.rollup_frame(ROWS), "week")
+
+    # 2026-10-05 and 2026-10-12 are Mondays
+    assert [(point["bucket"][:10], point["units"]) for point in series] == [("2026-10-05", 7), ("2026-10-12", 1)]
+
+
+def test_top_products_by_revenue_or_units():
+    frame = analytics.rollup_frame(ROWS)
+
+    assert [p["product_id"] for p in analytics.top_products(frame, 2, "revenue")] == ["a", "b"]
+    assert [p["product_id"] for p in analytics.top_products(frame, 1, "units")] == ["b"]
+    with pytest.raises(ValueError):
+        analytics.top_products(frame, 1, "profit")
+
+
+def test_hourly_series_reads_raw_sales():
+    sales = [{"product_id": "a", "quantity_sold": 2, "sale_price": 5.0, "cost_price": None, "sale_date": f"2026-10-05T09:{m:02d}:00"}
+             for m in (10, 40)]
+
+    series = analytics.revenue_series(analytics.sales_frame([sales]), "hour")
+
+    assert series == [{"bucket": "2026-10-05T09:00:00", "sale_count": 2, "units": 4, "revenue": 20.0}]
+    with pytest.raises(ValueError):
+        analytics.window(analytics.MAX_HOURLY_DAYS + 1, "hour")
+
+
+def test_analytics_endpoints(client):
+    product = create_product(client, name="Lamp", stock_quantity=10)
+    client.post("/sales/", json={"product_id": product["id"], "quantity": 3, "sale_price": 10.0})
+
+    revenue = client.get("/analytics/revenue", params={"days": 7}).json()["data"]
+    top = client.get("/analytics/top-products", params={"days": 7}).json()["data"]
+
+    assert len(revenue) == 7 and sum(point["revenue"] for point in revenue) == 30.0
+    assert [(p["name"], p["units"]) for p in top] == [("Lamp", 3)]
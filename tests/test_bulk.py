@@ -0,0 +1,72 @@
+import io
+
+from src import bulk
+from src.storage import ObservedEngine
+
+
+def _import(engine, text, fmt="csv"):
+    return bulk.import_products(engine, io.StringIO(text), fmt)
+
+
+def test_import_inserts_new_products_with_defaults(engine):
+    summary = _import(engine, "sku,name,price\nA1,Apple,1.5\n")
+    assert (summary["inserted"], summary["updated"], summary["error_count"]) == (1, 0, 0)
+    product = engine.get_product_by_sku("A1")
+    assert product["stock_quantity"] == 0
+    assert product["min_stock_level"] == 5
+    assert product["category"] == "General"
+
+
+def test_import_updates_only_the_columns_it_sets(engine, add_product):
+    add_product(sku="A1", stock_quantity=50, min_stock_level=12, category="Fruit", description="Crisp")
+    summary = _import(engine, "sku,name,price\nA1,Green apple,2.0\n")
+    assert (summary["inserted"], summary["updated"]) == (0, 1)
+    product = engine.get_product_by_sku("A1")
+    assert (product["name"], product["price"]) == ("Green apple", 2.0)
+    assert product["stock_quantity"] == 50
+    assert product["min_stock_level"] == 12
+    assert (product["category"], product["description"]) == ("Fruit", "Crisp")
+
+
+def test_empty_cells_do_not_overwrite(engine, add_product):
+    add_product(sku="A1", stock_quantity=50, category="Fruit")
+    _import(engine, "sku,name,price,stock_quantity,category\nA1,Apple,2.0,,\nB2,Bread,3.0,7,\n")
+    assert engine.get_product_by_sku("A1")["stock_quantity"] == 50
+    assert engine.get_product_by_sku("A1")["category"] == "Fruit"
+    assert engine.get_product_by_sku("B2")["stock_quantity"] == 7
+
+
+def test_export_import_round_trip_keeps_nulls(engine, add_product):
+    observed = ObservedEngine(engine)
+    add_product(sku="A1", stock_quantity=3, category=None, description=None)
+    exported = "".join(bulk.export_products(observed, "ndjson"))
+    summary = _import(observed, exported, "ndjson")
+    assert summary["updated"] == 1
+    product = engine.get_product_by_sku("A1")
+    assert product["category"] is None
+    assert product["description"] is None
+    assert product["stock_quantity"] == 3
+
+
+def test_invalid_records_are_reported(engine):
+    summary = _import(engine, "sku,name,price,stock_quantity\nA1,Apple,0,1\nB2,Bread,2,-1\nC3,Cake,4,2\n")
+    assert summary["inserted"] == 1
+    assert [error["line"] for error in summary["errors"]] == [2, 3]
+
+
+def test_upsert_groups_keep_existing_columns():
+    from src.storage.supabase_engine import _upsert_groups
+
+    rows = [{"sku": "A", "name": "a", "price": 1.0}, {"sku": "B", "name": "b", "price": 2.0}]
+    groups = _upsert_groups(rows, {"A"}, {"stock_quantity": 0})
+    assert sorted(map(len, groups)) == [1, 1]
+    existing = next(group for group in groups if group[0]["sku"] == "A")
+    assert "stock_quantity" not in existing[0]
+
+
+def test_sku_lookups_are_chunked():
+    from src.storage.supabase_engine import ID_CHUNK, _id_chunks
+
+    chunks = _id_chunks(f"SKU-{i}" for i in range(bulk.CHUNK_SIZE))
+    assert max(map(len, chunks)) == ID_CHUNK
+    assert sum(map(len, chunks)) == bulk.CHUNK_SIZE
@@ -0,0 +1,37 @@
+"""CLI startup: no heavy imports or connection up front, and the saved dashboard for the first screen"""
+import os
+import subprocess
+import sys
+
+from src.reports import SavedSummary
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_cli_starts_without_pandas_or_a_connection(tmp_path):
+    db_path = tmp_path / "cli.db"
+    script = (
+        "import sys\n"
+        "import main\n"
+        "from database import Database\n"
+        "Database()\n"
+        "print(','.join(m for m in ('pandas', 'numpy', 'pyarrow') if m in sys.modules))\n"
+    )
+    env = {**os.environ, "STORAGE_ENGINE": "sqlite", "SQLITE_PATH": str(db_path),
+           "PYTHONPATH": os.pathsep.join([ROOT, os.path.join(ROOT, "Backend")])}
+
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == ""
+    assert not db_path.exists()
+
+
+def test_saved_summary_is_only_shown_for_its_own_database(tmp_path):
+    path = str(tmp_path / "dashboard.json")
+    SavedSummary(path, "sqlite:/a.db").save({"total_products": 3})
+
+    summary, saved_at = SavedSummary(path, "sqlite:/a.db").load()
+
+    assert summary == {"total_products": 3} and saved_at
+    assert SavedSummary(path, "sqlite:/b.db").load() == (None, None)
+    assert SavedSummary("", "sqlite:/a.db").load() == (None, None)
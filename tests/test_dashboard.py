@@ -0,0 +1,29 @@
+"""Dashboard summary: one-snapshot counters, cached until a write"""
+from src.reports import SummaryCache
+from tests.conftest import create_product
+
+
+def test_summary_counts_and_refreshes_after_a_write(client):
+    product = create_product(client, stock_quantity=10)
+    create_product(client, stock_quantity=2)
+    client.post("/sales/", json={"product_id": product["id"], "quantity": 3, "sale_price": 10.0})
+
+    first = client.get("/dashboard/summary").json()["data"]
+    client.post("/sales/", json={"product_id": product["id"], "quantity": 6, "sale_price": 10.0})
+    second = client.get("/dashboard/summary").json()["data"]
+
+    assert (first["total_products"], first["low_stock_count"]) == (2, 1)
+    assert (first["recent_sales"], first["recent_items_sold"], first["recent_revenue"]) == (1, 3, 30.0)
+    # The sale cleared the cached summary and took the first product below its level too
+    assert (second["recent_sales"], second["low_stock_count"]) == (2, 2)
+
+
+def test_summary_cache_refuses_a_summary_read_before_a_write():
+    cache = SummaryCache(ttl=60)
+    generation = cache.generation
+    cache.sales_recorded([])
+
+    cache.put({"recent_sales": 1}, generation)
+    assert cache.get() is None
+    cache.put({"recent_sales": 2}, cache.generation)
+    assert cache.get() == {"recent_sales": 2}
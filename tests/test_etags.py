@@ -0,0 +1,35 @@
+"""Conditional GETs: ETags built from the table write counters, and 304 revalidation"""
+from src.storage.sqlite_engine import SQLiteEngine
+from tests.conftest import create_product
+
+
+def test_etag_revalidation(client):
+    product = create_product(client)
+
+    first = client.get("/products/")
+    etag = first.headers["ETag"]
+    unchanged = client.get("/products/", headers={"If-None-Match": etag})
+    client.patch(f"/products/{product['id']}/stock", json={"delta": 1})
+    changed = client.get("/products/", headers={"If-None-Match": etag})
+
+    assert unchanged.status_code == 304 and unchanged.headers["ETag"] == etag
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    # A sale moves the sales tag, not the catalog's (the product row is written too)
+    sales_etag = client.get("/sales/").headers["ETag"]
+    client.post("/sales/", json={"product_id": product["id"], "quantity": 1, "sale_price": 10.0})
+    assert client.get("/sales/", headers={"If-None-Match": sales_etag}).status_code == 200
+
+
+def test_versions_move_only_when_the_write_commits(engine, add_product, tmp_path):
+    # A reader on another connection must not see a version for rows it cannot see yet
+    product = add_product()
+    reader = SQLiteEngine(str(tmp_path / "inventory.db"))
+    before = reader.table_versions()["products"]
+
+    with engine.transaction() as conn:
+        conn.execute("UPDATE products SET stock_quantity = 7 WHERE id = ?", (product["id"],))
+        assert reader.table_versions()["products"] == before
+        assert reader.get_product(product["id"])["stock_quantity"] != 7
+
+    assert reader.table_versions()["products"] > before
+    reader.close()
@@ -0,0 +1,113 @@
+"""Flash-sale counters, and how batches that fail to store are retried or refused"""
+import asyncio
+import sqlite3
+
+import pytest
+
+from src import flash_sale
+from src.flash_sale import FlashSales, is_transient
+from src.storage import InsufficientStock
+from src.storage.async_engines import ThreadedEngine
+
+
+class FlakyEngine(ThreadedEngine):
+    """insert_sales raises the queued errors first, and always refuses sales of ``poison`` units"""
+
+    def __init__(self, engine, errors=(), poison=None):
+        super().__init__(engine)
+        self.errors = list(errors)
+        self.poison = poison
+        self.calls = 0
+
+    async def insert_sales(self, sales):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        if any(sale["quantity_sold"] == self.poison for sale in sales):
+            raise sqlite3.IntegrityError("CHECK constraint failed: quantity_sold")
+        return await asyncio.to_thread(self.engine.insert_sales, sales)
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(flash_sale, "RETRY_DELAY", 0.001)
+
+
+def run(engine, scenario):
+    async def main():
+        sales = FlashSales(engine)
+        try:
+            return await scenario(sales)
+        finally:
+            await sales.stop()
+
+    return asyncio.run(main())
+
+
+def test_counter_sells_held_units_and_returns_the_rest(engine, add_product):
+    product = add_product(stock_quantity=10)
+
+    async def scenario(sales):
+        await sales.start(product["id"], units=6)
+        assert engine.get_product(product["id"])["stock_quantity"] == 4
+        results = await asyncio.gather(*(sales.record(product["id"], 1) for _ in range(5)))
+        assert [result["stock_quantity"] for result in results] == [5, 4, 3, 2, 1]
+        with pytest.raises(InsufficientStock):
+            await sales.record(product["id"], 2)
+        assert sales.get(product["id"]).stats()["refused"] == 1
+        return await sales.end(product["id"])
+
+    stats = run(ThreadedEngine(engine), scenario)
+
+    assert (stats["sold"], stats["returned"]) == (5, 1)
+    assert engine.get_product(product["id"])["stock_quantity"] == 5
+    assert sum(sale["quantity_sold"] for sale in engine.list_sales()) == 5
+
+
+def test_transient_errors_are_retried(engine, add_product):
+    product = add_product(stock_quantity=10)
+    flaky = FlakyEngine(engine, errors=[sqlite3.OperationalError("database is locked"), ConnectionError("reset")])
+
+    async def scenario(sales):
+        await sales.start(product["id"])
+        await sales.record(product["id"], 3)
+        return sales.stats()
+
+    stats = run(flaky, scenario)
+
+    assert flaky.calls == 3
+    assert (stats["failed"], stats["last_error"], stats["waiting"]) == (0, None, 0)
+    assert len(engine.list_sales()) == 1
+
+
+def test_refused_sale_fails_alone_and_gives_units_back(engine, add_product):
+    product = add_product(stock_quantity=20)
+    flaky = FlakyEngine(engine, poison=7)
+
+    async def scenario(sales):
+        await sales.start(product["id"])
+        results = await sales.record_batch([
+            {"product_id": product["id"], "quantity": 2},
+            {"product_id": product["id"], "quantity": 7},
+            {"product_id": product["id"], "quantity": 1},
+        ])
+        with pytest.raises(sqlite3.IntegrityError):
+            await sales.record(product["id"], 7)
+        return results, sales.get(product["id"]).stats(), sales.stats()
+
+    results, counter, stats = run(flaky, scenario)
+
+    assert [result["success"] for result in results] == [True, False, True]
+    assert "CHECK constraint" in results[1]["error"]
+    assert (counter["remaining"], counter["sold"]) == (17, 3)
+    assert stats["failed"] == 2 and stats["waiting"] == 0 and "CHECK" in stats["last_error"]
+    # Stopping returned the 17 unsold units; only the stored sales left the row
+    assert engine.get_product(product["id"])["stock_quantity"] == 17
+    assert sorted(sale["quantity_sold"] for sale in engine.list_sales()) == [1, 2]
+
+
+def test_error_classification():
+    assert is_transient(sqlite3.OperationalError("database is locked"))
+    assert is_transient(ConnectionResetError())
+    assert not is_transient(sqlite3.IntegrityError("FOREIGN KEY constraint failed"))
+    assert not is_transient(ValueError("bad row"))
@@ -0,0 +1,42 @@
+"""The forecasting job: a real run stores forecasts and moves reorder points, a dry run writes nothing"""
+from datetime import date, timedelta
+
+from src import forecast
+
+TODAY = date(2026, 10, 17)
+
+
+def seed_sales(engine, product, days=28, units=4):
+    engine.insert_sales([
+        {
+            "id": f"{product['id']}-{day}", "product_id": product["id"], "quantity_sold": units,
+            "sale_price": 10.0, "cost_price": None,
+            "sale_date": f"{(TODAY - timedelta(days=day)).isoformat()}T12:00:00",
+        }
+        for day in range(1, days + 1)
+    ])
+
+
+def test_run_saves_forecasts_and_reorder_points(engine, add_product):
+    product = add_product(min_stock_level=5)
+    seed_sales(engine, product)
+
+    stats = forecast.run(engine, workers=1, today=TODAY)
+
+    stored = engine.get_forecast(product["id"])
+    assert stats["products"] == 1 and "forecasts" not in stats
+    assert engine.get_product(product["id"])["min_stock_level"] == stored["reorder_point"] != 5
+
+
+def test_dry_run_writes_nothing(engine, add_product):
+    product = add_product(min_stock_level=5)
+    seed_sales(engine, product)
+    before = engine.get_product(product["id"])
+
+    stats = forecast.run(engine, workers=1, today=TODAY, dry_run=True)
+
+    assert engine.get_forecast(product["id"]) is None
+    assert engine.get_product(product["id"]) == before
+    item, = stats["forecasts"]
+    assert (item["sku"], item["min_stock_level"]) == (product["sku"], 5)
+    assert stats["thresholds_changed"] == 1
@@ -0,0 +1,80 @@
+"""Idempotency-Key store, on its own and on POST /sales/"""
+import asyncio
+import uuid
+
+import pytest
+
+from src.idempotency import IdempotencyStore, KeyReused
+from tests.conftest import create_product
+
+
+def counting(result):
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return result
+
+    return call, calls
+
+
+def test_repeat_is_replayed_and_concurrent_retry_waits():
+    store = IdempotencyStore()
+    call, calls = counting({"success": True, "data": 1})
+
+    async def scenario():
+        first, retry = await asyncio.gather(store.run("POST /sales/", "k", "body", call), store.run("POST /sales/", "k", "body", call))
+        later = await store.run("POST /sales/", "k", "body", call)
+        other_scope = await store.run("POST /orders/", "k", "body", call)
+        return first, retry, later, other_scope
+
+    first, retry, later, other_scope = asyncio.run(scenario())
+
+    assert first == ({"success": True, "data": 1}, False)
+    assert retry[1] and later[1] and not other_scope[1]
+    assert len(calls) == 2
+    assert (store.hits, store.misses) == (2, 2)
+
+
+def test_key_reused_for_another_body():
+    store = IdempotencyStore()
+    call, _ = counting({"success": True})
+
+    async def scenario():
+        await store.run("POST /sales/", "k", "body", call)
+        with pytest.raises(KeyReused):
+            await store.run("POST /sales/", "k", "other body", call)
+
+    asyncio.run(scenario())
+
+
+def test_failures_are_forgotten_and_size_is_bounded():
+    store = IdempotencyStore(max_size=2)
+    failed, failed_calls = counting({"success": False, "error": "database down"})
+
+    async def scenario():
+        await store.run("s", "k", "body", failed)
+        await store.run("s", "k", "body", failed)
+        for key in ("a", "b", "c"):
+            await store.run("s", key, "body", counting({"success": True})[0])
+
+    asyncio.run(scenario())
+
+    assert len(failed_calls) == 2
+    assert (store.stats()["size"], store.evictions) == (2, 1)
+
+
+def test_sale_retry_is_recorded_once(client):
+    product = create_product(client, stock_quantity=5)
+    body = {"product_id": product["id"], "quantity": 2, "sale_price": 10.0}
+    key = {"Idempotency-Key": str(uuid.uuid4())}
+
+    first = client.post("/sales/", json=body, headers=key)
+    retry = client.post("/sales/", json=body, headers=key)
+    reused = client.post("/sales/", json={**body, "quantity": 1}, headers=key)
+
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert reused.status_code == 422
+    assert client.get(f"/products/{product['id']}").json()["data"]["stock_quantity"] == 3
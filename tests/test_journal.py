@@ -0,0 +1,135 @@
+"""Write-behind sales: the journal file, the stock view and flushing to the database"""
+import asyncio
+
+import pytest
+
+from src.journal import SaleJournal, WriteBehindSales
+from src.storage import AsyncObservedEngine, InsufficientStock
+from src.storage.async_engines import ThreadedEngine
+
+
+def sale(product_id, quantity=1):
+    return {"id": f"sale-{product_id}-{quantity}", "product_id": product_id, "quantity": quantity,
+            "sale_price": 10.0, "sale_date": "2026-10-17T12:00:00"}
+
+
+def test_journal_replays_unflushed_entries_and_drops_torn_writes(tmp_path):
+    path = str(tmp_path / "sales.journal")
+    journal = SaleJournal(path)
+    journal.append([sale("a"), sale("b")])
+    journal.commit(1)
+    journal.append([sale("c")])
+    journal.close()
+    with open(path, "ab") as f:
+        f.write(b'{"seq": 4, "id": "torn"')
+
+    reopened = SaleJournal(path)
+
+    assert [entry["seq"] for entry in reopened.pending] == [2, 3]
+    assert reopened.last_seq == 3
+    reopened.close()
+
+
+def write_behind(engine, tmp_path):
+    observed = AsyncObservedEngine(ThreadedEngine(engine))
+    return WriteBehindSales(observed, SaleJournal(str(tmp_path / "sales.journal")), interval=0.01)
+
+
+def test_sales_are_acknowledged_from_the_view_then_flushed(engine, add_product, tmp_path):
+    product = add_product(stock_quantity=3)
+    sales = write_behind(engine, tmp_path)
+
+    async def scenario():
+        first = await sales.record(product["id"], 2)
+        with pytest.raises(InsufficientStock):
+            await sales.record(product["id"], 2)
+        # Not in the database yet
+        assert engine.get_product(product["id"])["stock_quantity"] == 3
+        await sales.flush()
+        return first
+
+    first = asyncio.run(scenario())
+
+    assert first["stock_quantity"] == 1
+    assert engine.get_product(product["id"])["stock_quantity"] == 1
+    assert [s["id"] for s in engine.get_sales_by_product(product["id"])] == [first["sale"]["id"]]
+    assert sales.stats()["pending"] == 0 and sales.stats()["flushed"] == 1
+    sales.journal.close()
+
+
+def test_replay_after_crash_records_each_sale_once(engine, add_product, tmp_path):
+    product = add_product(stock_quantity=5)
+    sales = write_behind(engine, tmp_path)
+    asyncio.run(sales.record(product["id"], 2))
+    asyncio.run(sales.flush())
+    sales.journal.close()
+    # Crash after the batch reached the database but before the checkpoint moved
+    with open(str(tmp_path / "sales.journal.checkpoint"), "w") as f:
+        f.write("0")
+
+    restarted = write_behind(engine, tmp_path)
+    assert restarted.stats()["pending"] == 1
+    asyncio.run(restarted.flush())
+
+    assert len(engine.get_sales_by_product(product["id"])) == 1
+    assert engine.get_product(product["id"])["stock_quantity"] == 3
+    restarted.journal.close()
+
+
+def test_sale_refused_on_flush_is_set_aside(engine, add_product, tmp_path):
+    product = add_product(stock_quantity=2)
+    sales = write_behind(engine, tmp_path)
+
+    async def scenario():
+        await sales.record(product["id"], 2)
+        engine.update_product_stock(product["id"], 1)  # behind the stock view's back
+        await sales.flush()
+
+    asyncio.run(scenario())
+
+    assert sales.stats()["rejected"] == 1
+    with open(sales.journal.rejected_path) as f:
+        assert "Not enough stock" in f.read()
+    sales.journal.close()
+
+
+def test_refused_sale_does_not_reject_the_next_one(engine, add_product, tmp_path):
+    product = add_product(stock_quantity=3)
+    sales = write_behind(engine, tmp_path)
+
+    async def scenario():
+        await sales.record(product["id"], 2)
+        fits = await sales.record(product["id"], 1)
+        engine.update_product_stock(product["id"], 1)
+        await sales.flush()
+        return fits
+
+    fits = asyncio.run(scenario())
+
+    # Both sales go out in one batch: the 2 no longer fits, the 1 after it still does
+    assert sales.stats()["rejected"] == 1 and sales.stats()["flushed"] == 1
+    assert [s["id"] for s in engine.get_sales_by_product(product["id"])] == [fits["sale"]["id"]]
+    assert engine.get_product(product["id"])["stock_quantity"] == 0
+    sales.journal.close()
+
+
+def test_api_queues_sales(api_env, monkeypatch, serve):
+    monkeypatch.setenv("SALES_JOURNAL", str(api_env / "api.journal"))
+
+    async def scenario(client, app):
+        product = (await client.post("/products/", json={
+            "name": "Lamp", "sku": "LMP-1", "price": 20.0, "stock_quantity": 3,
+        })).json()["data"][0]
+        queued = (await client.post("/sales/", json={"product_id": product["id"], "quantity": 3, "sale_price": 20.0})).json()
+        refused = (await client.post("/sales/", json={"product_id": product["id"], "quantity": 1, "sale_price": 20.0})).json()
+        await app.state.db.write_behind.flush()
+        journal = (await client.get("/sales/journal")).json()
+        stock = (await client.get(f"/products/{product['id']}")).json()["data"]["stock_quantity"]
+        return queued, refused, journal, stock
+
+    queued, refused, journal, stock = serve(scenario)
+
+    assert queued["queued"] and queued["stock_quantity"] == 0
+    assert not refused["success"]
+    assert journal["data"]["pending"] == 0
+    assert stock == 0
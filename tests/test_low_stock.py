@@ -0,0 +1,43 @@
+"""Maintained low-stock set: threshold crossings from engine events, and GET /products/low-stock"""
+from src.low_stock import LowStockMonitor
+from src.storage import ObservedEngine
+from tests.conftest import create_product
+
+
+def test_alert_fires_once_per_crossing(engine, add_product):
+    observed = ObservedEngine(engine)
+    monitor = observed.subscribe(LowStockMonitor(lookup=engine.get_product).seed(engine.list_low_stock()))
+    calls = []
+    monitor.on_low_stock(lambda *args: calls.append(args))
+    product = add_product(stock_quantity=8, min_stock_level=5)
+
+    observed.record_sale(product["id"], 4)   # 4 < 5: crosses
+    observed.record_sale(product["id"], 1)   # still low, no second alert
+    assert calls == [(product["id"], 4, 5)]
+    assert product["id"] in monitor and monitor.low_stock() == [(product["id"], 3, 5)]
+
+    observed.update_product_stock(product["id"], 5)   # restocked to the level: re-armed
+    assert product["id"] not in monitor
+    observed.record_sale(product["id"], 1)
+    assert len(calls) == 2
+
+
+def test_removed_product_leaves_the_set(engine, add_product):
+    observed = ObservedEngine(engine)
+    product = add_product(stock_quantity=1)
+    monitor = observed.subscribe(LowStockMonitor().load(engine.iter_products()))
+    assert len(monitor) == 1
+
+    observed.delete_product(product["id"])
+
+    assert len(monitor) == 0
+
+
+def test_low_stock_endpoint_lists_lowest_first(client):
+    create_product(client, stock_quantity=10)
+    low = create_product(client, stock_quantity=3)
+    lower = create_product(client, stock_quantity=1)
+
+    rows = client.get("/products/low-stock").json()["data"]
+
+    assert [row["id"] for row in rows] == [lower["id"], low["id"]]
@@ -0,0 +1,36 @@
+"""Prometheus exposition: histograms, scrape-time gauges and per-route request metrics"""
+import uuid
+
+from src.metrics import Registry
+
+
+def test_histogram_buckets_are_cumulative_and_gauges_collected():
+    registry = Registry()
+    latency = registry.histogram("op_seconds", "Time per op", ("op",), buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 5.0):
+        latency.observe(seconds, "read")
+    remove = registry.collector(lambda: [("queue_depth", "Items waiting", {}, 3)])
+
+    text = registry.render()
+    remove()
+
+    assert 'op_seconds_bucket{op="read",le="0.1"} 1' in text
+    assert 'op_seconds_bucket{op="read",le="1.0"} 2' in text
+    assert 'op_seconds_bucket{op="read",le="+Inf"} 3' in text
+    assert 'op_seconds_count{op="read"} 3' in text
+    assert "queue_depth 3" in text
+    assert "queue_depth" not in registry.render()
+
+
+def test_requests_are_labelled_by_route_template(client):
+    missing = str(uuid.uuid4())
+    client.get(f"/products/{missing}")
+
+    text = client.get("/metrics").text
+
+    assert missing not in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/products/{product_id}",status="200"}' in text
+    # {"success": false} answers and the engine call behind them are counted too
+    assert 'http_app_errors_total{route="/products/{product_id}"}' in text
+    assert 'db_call_duration_seconds_count{method="get_product"}' in text
+    assert "search_index_ready" in text
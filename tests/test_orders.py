@@ -0,0 +1,81 @@
+"""Multi-line orders: recorded all or nothing, through the engine and POST /orders/"""
+import pytest
+
+from src.storage import ORDER_REFUSED
+from tests.conftest import create_product
+
+
+def test_order_records_every_line(engine, add_product):
+    first, second = add_product(stock_quantity=5), add_product(stock_quantity=5, price=3.0)
+
+    result = engine.record_order([
+        {"product_id": first["id"], "quantity": 2},
+        {"product_id": second["id"], "quantity": 1, "sale_price": 2.5},
+        {"product_id": first["id"], "quantity": 3},
+    ])
+
+    order = result["order"]
+    assert (order["line_count"], order["units"], order["total"]) == (3, 6, 52.5)
+    assert [line["stock_quantity"] for line in result["lines"]] == [3, 4, 0]
+    assert engine.get_product(first["id"])["stock_quantity"] == 0
+    stored = engine.get_order(order["id"])
+    assert sorted(sale["quantity_sold"] for sale in stored["sales"]) == [1, 2, 3]
+
+
+def test_refused_order_changes_nothing(engine, add_product):
+    first, second = add_product(stock_quantity=5), add_product(stock_quantity=1)
+
+    result = engine.record_order([
+        {"product_id": first["id"], "quantity": 2},
+        {"product_id": second["id"], "quantity": 2},
+        {"product_id": "no-such-product", "quantity": 1},
+    ])
+
+    assert result["order"] is None
+    assert result["lines"][0]["error"] == ORDER_REFUSED
+    assert result["lines"][1]["available"] == 1
+    assert result["lines"][2]["error"] == "Product not found"
+    assert engine.get_product(first["id"])["stock_quantity"] == 5
+    assert engine.get_sales_by_product(first["id"]) == []
+
+
+def test_refused_line_leaves_stock_for_later_lines(engine, add_product):
+    product = add_product(stock_quantity=5)
+
+    result = engine.record_order([
+        {"product_id": product["id"], "quantity": 10},
+        {"product_id": product["id"], "quantity": 1},
+        {"product_id": product["id"], "quantity": 5},
+    ])
+
+    assert result["order"] is None
+    assert result["lines"][0]["available"] == 5
+    assert result["lines"][1]["error"] == ORDER_REFUSED
+    # Only the 1 counts against the stock left for the last line
+    assert result["lines"][2]["available"] == 4
+    assert engine.get_product(product["id"])["stock_quantity"] == 5
+
+
+def test_order_endpoint(client):
+    product = create_product(client, stock_quantity=4)
+
+    placed = client.post("/orders/", json={"lines": [{"product_id": product["id"], "quantity": 3}]}).json()
+    refused = client.post("/orders/", json={"lines": [{"product_id": product["id"], "quantity": 3}]}).json()
+
+    assert placed["success"] and placed["data"]["units"] == 3
+    assert not refused["success"] and refused["lines"][0]["available"] == 1
+    assert len(client.get(f"/orders/{placed['data']['id']}").json()["data"]["sales"]) == 1
+
+
+@pytest.mark.parametrize("quantity", [0, -1])
+def test_order_line_quantity_must_be_positive(client, quantity):
+    product = create_product(client, stock_quantity=4)
+    other = create_product(client, stock_quantity=4)
+
+    response = client.post("/orders/", json={"lines": [
+        {"product_id": other["id"], "quantity": 5},
+        {"product_id": product["id"], "quantity": quantity},
+    ]})
+
+    assert response.status_code == 422
+    assert client.get(f"/products/{product['id']}").json()["data"]["stock_quantity"] == 4
@@ -0,0 +1,53 @@
+"""Keyset cursors on GET /products/ and GET /sales/"""
+import pytest
+
+from src.pagination import decode_cursor, encode_cursor
+from tests.conftest import create_product
+
+
+def walk(client, path, limit):
+    rows, cursor = [], None
+    while True:
+        page = client.get(path, params={"limit": limit, **({"cursor": cursor} if cursor else {})}).json()
+        assert page["success"], page
+        rows.extend(page["data"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return rows
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    cursor = encode_cursor(["Hammer", "id-1"])
+    assert decode_cursor(cursor) == ("Hammer", "id-1")
+    assert decode_cursor(None) is None
+    for bad in ("not a cursor", encode_cursor(["only one"])):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+
+def test_product_pages_cover_the_catalog_once(client):
+    # Duplicate names, so the id breaks ties in the key
+    for i in range(11):
+        create_product(client, name=f"Item {i % 4}")
+
+    products = walk(client, "/products/", limit=3)
+
+    assert len({p["id"] for p in products}) == 11
+    assert [(p["name"], p["id"]) for p in products] == sorted((p["name"], p["id"]) for p in products)
+
+
+def test_sale_pages_are_newest_first(client):
+    product = create_product(client, stock_quantity=20)
+    for _ in range(7):
+        client.post("/sales/", json={"product_id": product["id"], "quantity": 1, "sale_price": 10.0})
+
+    sales = walk(client, "/sales/", limit=2)
+
+    assert len({s["id"] for s in sales}) == 7
+    keys = [(s["sale_date"], s["id"]) for s in sales]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_invalid_cursor_is_an_error(client):
+    page = client.get("/products/", params={"cursor": "garbage"}).json()
+    assert not page["success"] and page["error"] == "Invalid cursor"
@@ -0,0 +1,78 @@
+"""Product edits and deletion through the engine, the observed wrapper and FlashInventory"""
+import pytest
+
+from src.cache import CatalogCache
+from src.db import SupabaseDB
+from src.logic import FlashInventory
+from src.storage import DuplicateSKU, ObservedEngine, ProductInUse, ProductNotFound
+
+
+@pytest.fixture
+def inventory(engine):
+    return FlashInventory(SupabaseDB(ObservedEngine(engine, CatalogCache())))
+
+
+def test_update_writes_only_given_fields(engine, add_product):
+    product = add_product(category="Tools", description="Hammer")
+
+    row = engine.update_product(product["id"], {"name": "Claw hammer", "price": 12.5})[0]
+
+    assert (row["name"], row["price"], row["category"], row["description"]) == ("Claw hammer", 12.5, "Tools", "Hammer")
+    assert row["updated_at"] > product["updated_at"]
+
+
+def test_update_refusals(engine, add_product):
+    product, other = add_product(), add_product()
+
+    with pytest.raises(ValueError):
+        engine.update_product(product["id"], {"created_at": "2020-01-01"})
+    with pytest.raises(DuplicateSKU):
+        engine.update_product(product["id"], {"sku": other["sku"]})
+    with pytest.raises(ProductNotFound):
+        engine.update_product("missing", {"name": "x"})
+
+
+def test_delete_product_and_its_forecast(engine, add_product):
+    product = add_product()
+    engine.save_forecasts([{
+        "product_id": product["id"], "daily_demand": 1.0, "forecast": [1.0], "lead_time_days": 7,
+        "lead_time_demand": 7.0, "safety_stock": 2.0, "reorder_point": 9,
+    }])
+
+    assert engine.delete_product(product["id"])[0]["id"] == product["id"]
+    assert engine.get_product(product["id"]) is None
+    assert engine.get_forecast(product["id"]) is None
+    with pytest.raises(ProductNotFound):
+        engine.delete_product(product["id"])
+
+
+def test_product_with_sales_is_kept(engine, add_product):
+    product = add_product()
+    engine.record_sale(product["id"], 1)
+
+    with pytest.raises(ProductInUse):
+        engine.delete_product(product["id"])
+    assert engine.get_product(product["id"]) is not None
+
+
+def test_flash_inventory_update_and_delete(inventory):
+    product = inventory.add_product("Drill", "DRL-1", 80.0, 3)["data"][0]
+    inventory.get_product_by_id(product["id"])  # now cached
+
+    updated = inventory.update_product(product["id"], name="Cordless drill", sku="DRL-2", stock_quantity=5)
+    assert updated["success"]
+    assert inventory.get_product_by_id(product["id"])["data"]["name"] == "Cordless drill"
+    assert inventory.db.get_product_by_sku("DRL-1")["not_found"]
+
+    assert inventory.delete_product(product["id"])["success"]
+    assert inventory.get_product_by_id(product["id"])["not_found"]
+    assert inventory.delete_product(product["id"])["not_found"]
+
+
+def test_flash_inventory_update_validation(inventory):
+    product = inventory.add_product("Saw", "SAW-1", 20.0, 3)["data"][0]
+
+    assert inventory.update_product(product["id"])["error"] == "No data to update"
+    assert inventory.update_product(product["id"], price=0)["error"] == "Price must be > 0"
+    assert inventory.update_product(product["id"], stock_quantity=-1)["error"] == "Invalid stock"
+    assert inventory.update_product(product["id"], id="other")["invalid"]
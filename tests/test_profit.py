@@ -0,0 +1,36 @@
+"""Gross profit, margin and ROI from the cost-aware rollups"""
+import pytest
+
+from src import analytics, profit
+from tests.conftest import create_product
+
+
+def test_profit_totals_rest_on_the_costed_revenue(client):
+    costed = create_product(client, stock_quantity=10, cost_price=4.0)
+    uncosted = create_product(client, stock_quantity=10)
+    client.post("/sales/", json={"product_id": costed["id"], "quantity": 2, "sale_price": 10.0})
+    client.post("/sales/", json={"product_id": uncosted["id"], "quantity": 1, "sale_price": 10.0})
+
+    report = client.get("/analytics/profit", params={"days": 1, "by": "margin"}).json()["data"]
+
+    totals = report["totals"]
+    assert (totals["revenue"], totals["costed_revenue"], totals["cost"], totals["gross_profit"]) == (30.0, 20.0, 8.0, 12.0)
+    assert (totals["margin"], totals["roi"], totals["cost_coverage"]) == (0.6, 1.5, 0.6667)
+    # A product without a cost has no margin and ranks last
+    assert [row["product_id"] for row in report["rows"]] == [costed["id"], uncosted["id"]]
+    assert report["rows"][1]["margin"] is None
+
+
+def test_cost_is_stamped_at_sale_time_and_grouped_by_category(engine, add_product):
+    tools = add_product(stock_quantity=10, cost_price=6.0, category="Tools")
+    other = add_product(stock_quantity=10, cost_price=1.0)
+    engine.record_sale(tools["id"], 1)
+    engine.record_sale(other["id"], 2)
+    engine.update_product(tools["id"], {"cost_price": 9.0})   # later cost changes leave past profit alone
+
+    frame = analytics.rollup_frame(engine.list_daily_product_sales())
+    rows = profit.by_category(frame, engine.list_products())
+
+    assert [(row["category"], row["gross_profit"]) for row in rows] == [(profit.UNCATEGORISED, 18.0), ("Tools", 4.0)]
+    with pytest.raises(ValueError):
+        profit.source("year")
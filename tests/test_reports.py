@@ -0,0 +1,31 @@
+"""Daily sales rollups: maintained by every write path, and the report built from them"""
+from tests.conftest import create_product
+
+
+def test_rollups_follow_every_write_path(engine, add_product):
+    first, second = add_product(stock_quantity=20), add_product(stock_quantity=20, price=4.0)
+    engine.record_sale(first["id"], 2)
+    engine.record_sales_batch([{"product_id": second["id"], "quantity": 3}, {"product_id": first["id"], "quantity": 50}])
+    engine.record_order([{"product_id": first["id"], "quantity": 1}, {"product_id": second["id"], "quantity": 1}])
+    engine.insert_sale({"product_id": second["id"], "quantity_sold": 1, "sale_price": 4.0})
+
+    maintained = engine.list_daily_sales()
+    per_product = sorted(engine.list_daily_product_sales(), key=lambda row: row["product_id"])
+    engine.rebuild_sales_rollups()
+
+    assert [(row["sale_count"], row["units"], row["revenue"]) for row in maintained] == [(5, 8, 50.0)]
+    assert maintained == engine.list_daily_sales()
+    assert per_product == sorted(engine.list_daily_product_sales(), key=lambda row: row["product_id"])
+
+
+def test_sales_report_reads_the_rollups(client):
+    product = create_product(client, stock_quantity=10, cost_price=4.0)
+    for quantity in (2, 1):
+        client.post("/sales/", json={"product_id": product["id"], "quantity": quantity, "sale_price": 10.0})
+
+    report = client.get("/sales/report", params={"days": 1, "top": 5}).json()["data"]
+
+    assert (report["total_sales"], report["total_items_sold"], report["total_revenue"]) == (2, 3, 30.0)
+    assert report["average_sale_value"] == 15.0
+    assert report["top_products"][0]["product_id"] == product["id"]
+    assert [day["units"] for day in report["daily"]] == [3]
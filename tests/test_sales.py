@@ -0,0 +1,134 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.storage import InsufficientStock, ProductNotFound
+from src.storage.sqlite_engine import SQLiteEngine
+from tests.conftest import create_product
+
+
+def test_record_sale_decrements_stock_and_stamps_cost(engine, add_product):
+    product = add_product(stock_quantity=5, cost_price=4.0)
+    result = engine.record_sale(product["id"], 2)
+    assert result["stock_quantity"] == 3
+    assert result["sale"]["sale_price"] == 10.0
+    assert result["sale"]["cost_price"] == 4.0
+    assert engine.get_product(product["id"])["stock_quantity"] == 3
+
+
+@pytest.mark.parametrize("quantity", [0, -100])
+def test_record_sale_refuses_non_positive_quantity(engine, add_product, quantity):
+    product = add_product(stock_quantity=5)
+    with pytest.raises(ValueError):
+        engine.record_sale(product["id"], quantity)
+    assert engine.get_product(product["id"])["stock_quantity"] == 5
+    assert engine.get_sales_by_product(product["id"]) == []
+
+
+def test_record_sale_refusals_change_nothing(engine, add_product):
+    product = add_product(stock_quantity=1)
+    with pytest.raises(InsufficientStock) as refused:
+        engine.record_sale(product["id"], 2)
+    assert refused.value.available == 1
+    with pytest.raises(ProductNotFound):
+        engine.record_sale("no-such-product", 1)
+    assert engine.get_product(product["id"])["stock_quantity"] == 1
+
+
+def test_parallel_sales_never_oversell(tmp_path):
+    # Separate connections to one file, as several API workers or CLI instances would have
+    path = str(tmp_path / "shared.db")
+    engines = [SQLiteEngine(path) for _ in range(4)]
+    product = engines[0].insert_product({"name": "Drop", "sku": "DROP", "price": 5.0, "stock_quantity": 500})[0]
+
+    def sell(i):
+        try:
+            return engines[i % len(engines)].record_sale(product["id"], 1 + i % 3)["sale"]["quantity_sold"]
+        except InsufficientStock as e:
+            assert e.available >= 0
+            return 0
+
+    try:
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            sold = list(pool.map(sell, range(2000)))
+        stock = engines[0].get_product(product["id"])["stock_quantity"]
+        sales = engines[0].get_sales_by_product(product["id"])
+        assert stock >= 0
+        assert sum(sold) == 500 - stock
+        assert sum(sale["quantity_sold"] for sale in sales) == sum(sold)
+        assert stock < 3  # sales kept going until no quantity could fit
+    finally:
+        for engine in engines:
+            engine.close()
+
+
+def test_parallel_sale_requests_never_oversell(serve):
+    async def scenario(client, app):
+        product = (await client.post("/products/", json={
+            "name": "Drop", "sku": "DROP", "price": 5.0, "stock_quantity": 100,
+        })).json()["data"][0]
+        responses = await asyncio.gather(*(
+            client.post("/sales/", json={"product_id": product["id"], "quantity": 1, "sale_price": 5.0})
+            for _ in range(1000)
+        ))
+        stock = (await client.get(f"/products/{product['id']}")).json()["data"]["stock_quantity"]
+        report = (await client.get("/sales/report", params={"days": 1})).json()["data"]
+        return [r.json() for r in responses], stock, report
+
+    results, stock, report = serve(scenario)
+    accepted = [r for r in results if r["success"]]
+    assert len(accepted) == 100
+    assert stock == 0
+    assert min(r["stock_quantity"] for r in accepted) == 0
+    assert report["total_items_sold"] == 100
+    assert all("Not enough stock" in r["error"] for r in results if not r["success"])
+
+
+@pytest.mark.parametrize("quantity", [0, -100])
+def test_post_sale_rejects_non_positive_quantity(client, quantity):
+    product = create_product(client, stock_quantity=5)
+    response = client.post("/sales/", json={"product_id": product["id"], "quantity": quantity, "sale_price": 10.0})
+    assert response.status_code == 422
+    assert client.get(f"/products/{product['id']}").json()["data"]["stock_quantity"] == 5
+    assert client.get("/sales/report", params={"days": 1}).json()["data"]["total_revenue"] == 0
+
+
+def test_data_layer_flags_invalid_quantity(engine, add_product):
+    from src.db import SupabaseDB
+    from src.storage import ObservedEngine
+
+    product = add_product(stock_quantity=5)
+    result = SupabaseDB(ObservedEngine(engine)).create_sale(product["id"], -1, None)
+    assert result["success"] is False
+    assert result["invalid"] is True
+
+
+def test_batch_refused_line_leaves_stock_for_later_lines(engine, add_product):
+    product = add_product(stock_quantity=5)
+
+    results = engine.record_sales_batch([
+        {"product_id": product["id"], "quantity": 10},
+        {"product_id": product["id"], "quantity": 1},
+        {"product_id": product["id"], "quantity": 3},
+        {"product_id": product["id"], "quantity": 2},
+    ])
+
+    assert [r["success"] for r in results] == [False, True, True, False]
+    assert results[0]["available"] == 5
+    assert [results[1]["stock_quantity"], results[2]["stock_quantity"]] == [4, 1]
+    assert results[3]["available"] == 1
+    assert engine.get_product(product["id"])["stock_quantity"] == 1
+    assert sorted(s["quantity_sold"] for s in engine.get_sales_by_product(product["id"])) == [1, 3]
+
+
+def test_post_sales_batch_records_the_lines_that_fit(client):
+    product = create_product(client, stock_quantity=5)
+
+    batch = client.post("/sales/batch", json={"sales": [
+        {"product_id": product["id"], "quantity": quantity, "sale_price": 10.0} for quantity in (10, 1)
+    ]}).json()
+
+    assert (batch["accepted"], batch["rejected"]) == (1, 1)
+    assert batch["data"][1]["stock_quantity"] == 4
+    assert client.get(f"/products/{product['id']}").json()["data"]["stock_quantity"] == 4
@@ -0,0 +1,69 @@
+"""Product search index: ranking basics, and catching up with writes made by other processes"""
+import asyncio
+
+from src.search import ProductSearchIndex
+from src.storage.sqlite_engine import SQLiteEngine
+
+
+def product(product_id, name, sku, stock=5):
+    return {"id": product_id, "name": name, "sku": sku, "stock_quantity": stock}
+
+
+def test_search_matches_prefixes_and_typos():
+    index = ProductSearchIndex(refresh_interval=0).load([[
+        product("1", "Wireless Mouse", "WM-1"), product("2", "Wired Keyboard", "WK-2"),
+    ]])
+
+    assert [p["id"] for p in index.search("wirel")] == ["1"]
+    assert [p["id"] for p in index.search("keybaord")] == ["2"]
+    assert index.search("wk-2")[0]["id"] == "2"
+
+
+def test_reload_drops_removed_products_and_keeps_new_ones():
+    index = ProductSearchIndex(refresh_interval=0).load([[product("1", "Lamp", "L-1"), product("2", "Desk", "D-1")]], version=1)
+
+    def pages():
+        # A product written through this process while the scan runs
+        index.products_changed([product("3", "Chair", "C-1")])
+        yield [product("1", "Lamp", "L-1", stock=2)]
+
+    index.load(pages(), version=2)
+
+    assert index.search("desk") == []
+    assert index.search("chair")[0]["id"] == "3"
+    assert index.search("lamp")[0]["stock_quantity"] == 2
+    assert (index.version, index.loads) == (2, 2)
+
+
+def test_stale_once_the_table_moved_and_the_interval_passed():
+    index = ProductSearchIndex(refresh_interval=60).load([[product("1", "Lamp", "L-1")]], version=1)
+
+    assert not index.stale(2)  # too soon
+    index.loaded_at -= 61
+    assert not index.stale(1)
+    assert index.stale(2) and index.stale(None)
+    assert not ProductSearchIndex(refresh_interval=0).load([], version=1).stale(2)
+
+
+def test_api_picks_up_products_written_by_another_process(api_env, monkeypatch, serve):
+    monkeypatch.setenv("SEARCH_INDEX_REFRESH", "0.05")
+
+    async def scenario(client, app):
+        index = app.state.db.search_index
+        while not index.ready:
+            await asyncio.sleep(0.01)
+        other = SQLiteEngine(str(api_env / "api.db"))   # the CLI or an import
+        other.insert_product({"name": "Standing Desk", "sku": "SD-1", "price": 300.0, "stock_quantity": 2})
+        other.close()
+        loads = index.loads
+        while index.loads == loads:
+            await asyncio.sleep(0.01)
+        found = (await client.get("/products/search", params={"q": "standing"})).json()
+        stats = (await client.get("/cache/stats")).json()
+        return found, stats
+
+    found, stats = serve(scenario)
+
+    assert [p["sku"] for p in found["data"]] == ["SD-1"]
+    assert stats["data"]["search_index"]["age_seconds"] is not None
+    assert stats["data"]["search_index"]["loads"] >= 2
@@ -0,0 +1,73 @@
+"""SalesSnapshot: incremental appends, and sales that commit behind the last appended key"""
+import asyncio
+import uuid
+
+import numpy as np
+
+from src.snapshot import SalesSnapshot
+from src.storage.async_engines import ThreadedEngine
+
+
+def sale(product, sale_date, quantity=1, price=10.0):
+    return {
+        "id": str(uuid.uuid4()), "product_id": product["id"], "quantity_sold": quantity,
+        "sale_price": price, "cost_price": None, "sale_date": sale_date,
+    }
+
+
+def test_append_pulls_only_new_sales(engine, add_product, tmp_path):
+    product = add_product()
+    engine.insert_sales([sale(product, "2026-10-01T09:00:00"), sale(product, "2026-10-02T09:00:00")])
+    snapshot = SalesSnapshot(str(tmp_path / "snapshot"))
+
+    assert snapshot.append(engine) == 2
+    engine.insert_sales([sale(product, "2026-10-03T09:00:00")])
+    assert snapshot.append(engine) == 1
+    assert snapshot.append(engine) == 0
+    assert snapshot.rows == 3
+
+
+def test_late_earlier_dated_sale_is_reconciled(engine, add_product, tmp_path):
+    product = add_product()
+    engine.insert_sales([
+        sale(product, "2026-09-30T09:00:00"), sale(product, "2026-10-01T09:00:00"), sale(product, "2026-10-02T12:00:00"),
+    ])
+    snapshot = SalesSnapshot(str(tmp_path / "snapshot"))
+    snapshot.append(engine)
+
+    # A journal flush or flash-sale batch committing behind the last appended sale
+    engine.insert_sales([sale(product, "2026-10-02T08:00:00", quantity=3), sale(product, "2026-10-01T10:00:00")])
+    assert snapshot.append(engine) == 4  # pulled again from the first drifting day, 2026-10-01
+
+    assert snapshot.rows == 5
+    assert snapshot.day_counts() == {"2026-09-30": 1, "2026-10-01": 2, "2026-10-02": 2}
+    ts = snapshot.columns()["ts"]
+    assert np.all(np.diff(ts) >= 0)
+    assert snapshot.columns()["quantity"].sum() == 7
+
+
+def test_reconciled_snapshot_survives_reload(engine, add_product, tmp_path):
+    product = add_product()
+    engine.insert_sales([sale(product, "2026-10-02T12:00:00"), sale(product, "2026-10-03T12:00:00")])
+    snapshot = SalesSnapshot(str(tmp_path / "snapshot"))
+    snapshot.append(engine)
+    engine.insert_sales([sale(product, "2026-10-01T12:00:00")])
+    snapshot.append(engine)
+
+    reopened = SalesSnapshot(str(tmp_path / "snapshot"))
+    assert reopened.rows == 3
+    assert reopened.stats()["first_sale"].startswith("2026-10-01")
+    assert reopened.append(engine) == 0
+
+
+def test_async_append_reconciles(engine, add_product, tmp_path):
+    product = add_product()
+    engine.insert_sales([sale(product, "2026-10-02T12:00:00")])
+    snapshot = SalesSnapshot(str(tmp_path / "snapshot"))
+    async_engine = ThreadedEngine(engine)
+
+    asyncio.run(snapshot.append_async(async_engine))
+    engine.insert_sales([sale(product, "2026-10-02T06:00:00")])
+    asyncio.run(snapshot.append_async(async_engine))
+
+    assert snapshot.day_counts() == {"2026-10-02": 2}
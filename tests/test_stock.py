@@ -0,0 +1,97 @@
+import asyncio
+
+from src.cache import CatalogCache
+from src.storage import AsyncObservedEngine
+from tests.conftest import create_product
+
+
+def _patch(client, product_id, **change):
+    return client.patch(f"/products/{product_id}/stock", json=change)
+
+
+def test_delta_applies_on_top_of_sales(client):
+    product = create_product(client, stock_quantity=10)
+    client.post("/sales/", json={"product_id": product["id"], "quantity": 3, "sale_price": 10.0})
+    response = _patch(client, product["id"], delta=5)
+    assert response.status_code == 200
+    assert response.json()["data"][0]["stock_quantity"] == 12
+
+
+def test_delta_below_zero_is_a_conflict(client):
+    product = create_product(client, stock_quantity=2)
+    response = _patch(client, product["id"], delta=-3)
+    assert response.status_code == 409
+    assert response.json()["data"][0]["stock_quantity"] == 2
+
+
+def test_compare_and_set_after_a_sale(client):
+    # The row read after a sale must carry the updated_at that sale wrote
+    product = create_product(client, stock_quantity=10)
+    client.get(f"/products/{product['id']}")  # cached
+    client.post("/sales/", json={"product_id": product["id"], "quantity": 1, "sale_price": 10.0})
+    current = client.get(f"/products/{product['id']}").json()["data"]
+    assert current["stock_quantity"] == 9
+    response = _patch(client, product["id"], stock_quantity=20, expected_updated_at=current["updated_at"])
+    assert response.status_code == 200, response.json()
+    assert response.json()["data"][0]["stock_quantity"] == 20
+
+
+def test_compare_and_set_refuses_a_stale_token(client):
+    product = create_product(client, stock_quantity=10)
+    stale = client.get(f"/products/{product['id']}").json()["data"]["updated_at"]
+    assert _patch(client, product["id"], delta=1).status_code == 200
+    response = _patch(client, product["id"], stock_quantity=3, expected_updated_at=stale)
+    assert response.status_code == 409
+    assert response.json()["data"][0]["stock_quantity"] == 11
+
+
+def test_cache_drops_a_product_whose_stock_changed():
+    cache = CatalogCache(10, 60)
+    cache.put({"id": "p1", "sku": "A1", "stock_quantity": 5, "updated_at": "t0"})
+    cache.stock_changed("p1", 4)
+    assert cache.get("p1") is None
+    assert cache.get_by_sku("A1") is None
+
+
+class _SaleDuringRead:
+    """Async engine whose product read returns the row as it was before a sale made mid-read"""
+    name = "fake"
+
+    def __init__(self, cache, row):
+        self.cache = cache
+        self.row = row
+
+    async def get_product(self, product_id):
+        row = dict(self.row)
+        await asyncio.sleep(0)
+        self.cache.stock_changed(product_id, row["stock_quantity"] - 1)
+        return row
+
+    get_product_by_sku = get_product
+
+
+def test_cache_refuses_a_row_read_before_a_write():
+    cache = CatalogCache(10, 60)
+    observed = AsyncObservedEngine(_SaleDuringRead(cache, {"id": "p1", "sku": "A1", "stock_quantity": 5}), cache)
+
+    read = asyncio.run(observed.get_product("p1"))
+
+    assert read["stock_quantity"] == 5
+    assert cache.get("p1") is None and cache.stats()["stale_puts"] == 1
+    # A later put of the same read is refused too, a fresh read is kept
+    cache.put(read, 0)
+    assert cache.get("p1") is None
+    cache.put({**read, "stock_quantity": 4}, cache.generation)
+    assert cache.get("p1")["stock_quantity"] == 4
+
+
+def test_cache_forgets_old_writes_without_accepting_older_reads():
+    cache = CatalogCache(2, 60)
+    before = cache.generation
+    for product_id in ("p1", "p2", "p3"):
+        cache.invalidate(product_id)
+
+    cache.put({"id": "p4", "stock_quantity": 1}, before)
+    assert cache.get("p4") is None
+    cache.put({"id": "p4", "stock_quantity": 1}, cache.generation)
+    assert cache.get("p4") is not None